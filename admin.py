@@ -0,0 +1,91 @@
+import hmac
+from flask import Blueprint, Response, abort, current_app, jsonify, request
+from extractors import parse_trace
+
+admin = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+@admin.before_request
+def require_admin_token():
+    token = current_app.config.get('ADMIN_TOKEN')
+    # Without a configured token the admin endpoints do not exist
+    if not token:
+        abort(404)
+    # Header only: a query string ends up in access logs and browser history
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        abort(403)
+
+
+@admin.route('/profile', methods=['POST'])
+def arm_profiler():
+    """Profile the next ``requests`` uploads, sampling every ``interval`` seconds"""
+    requests = request.args.get('requests', 1, type=int)
+    interval = request.args.get('interval', 0.005, type=float)
+    if requests < 0 or not 0.0005 <= interval <= 1:
+        return jsonify({'error': 'requests must be >= 0 and interval between 0.0005 and 1'}), 400
+    profiler = current_app.extensions['profiler']
+    if request.args.get('clear') == '1':
+        profiler.clear()
+    profiler.arm(requests, interval)
+    return jsonify(profiler.snapshot())
+
+
+@admin.route('/profile', methods=['GET'])
+def profile_output():
+    """Folded stacks of the profiled uploads (``?format=json`` for a summary)"""
+    profiler = current_app.extensions['profiler']
+    if request.args.get('format') == 'json':
+        return jsonify(profiler.snapshot())
+    return Response(profiler.folded(), mimetype='text/plain')
+
+
+@admin.route('/profile', methods=['DELETE'])
+def clear_profile():
+    current_app.extensions['profiler'].clear()
+    return jsonify(current_app.extensions['profiler'].snapshot())
+
+
+@admin.route('/memory/start', methods=['POST'])
+def start_memory_tracing():
+    current_app.extensions['memory'].start(request.args.get('frames', 25, type=int))
+    return jsonify({'tracing': True})
+
+
+@admin.route('/memory/stop', methods=['POST'])
+def stop_memory_tracing():
+    current_app.extensions['memory'].stop()
+    return jsonify({'tracing': False})
+
+
+@admin.route('/memory/snapshot', methods=['POST'])
+def memory_snapshot():
+    """Top allocation sites now, and the change since the previous snapshot"""
+    key = request.args.get('key', 'lineno')
+    if key not in ('lineno', 'filename', 'traceback'):
+        return jsonify({'error': 'key must be lineno, filename or traceback'}), 400
+    report = current_app.extensions['memory'].snapshot(key, request.args.get('top', 20, type=int))
+    if report is None:
+        return jsonify({'error': 'Memory tracing is not running; POST /admin/memory/start first'}), 409
+    return jsonify(report)
+
+
+@admin.route('/traces', methods=['POST'])
+def toggle_parse_trace():
+    """Turn per-line parse tracing on (``enabled=1``) or off for later documents"""
+    parse_trace.enabled = request.args.get('enabled', '1') == '1'
+    return jsonify({'enabled': parse_trace.enabled})
+
+
+@admin.route('/traces', methods=['GET'])
+def list_parse_traces():
+    return jsonify({'enabled': parse_trace.enabled, 'traces': parse_trace.trace_buffer.summary()})
+
+
+@admin.route('/traces/<document>', methods=['GET'])
+def get_parse_trace(document):
+    """Full trace of one document, by the SHA-256 of its bytes"""
+    trace = parse_trace.trace_buffer.get(document)
+    if trace is None:
+        return jsonify({'error': 'No trace kept for this document'}), 404
+    return jsonify(trace)
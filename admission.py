@@ -0,0 +1,95 @@
+import threading
+from flask import current_app, g
+
+
+class Overloaded(Exception):
+    """Raised when a request must be turned away; carries the HTTP status"""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    def __init__(self, client, nbytes):
+        self.client = client
+        self.nbytes = nbytes
+        self.files = 0
+
+
+class AdmissionController:
+    """Bounds the work a server process accepts before it reads request bodies
+
+    A request is refused with 503 when the verification queue is too deep,
+    every worker is busy with a backlog, or the bytes of admitted requests
+    would exceed the in-flight limit; and with 429 when its client already
+    has too many PDFs in flight.
+    """
+
+    def __init__(self, max_queue_depth, max_inflight_bytes, max_files_per_client, retry_after):
+        self.max_queue_depth = max_queue_depth
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_files_per_client = max_files_per_client
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.inflight_bytes = 0
+        self.client_files = {}
+        self.rejected = {413: 0, 429: 0, 503: 0}
+
+    def _reject(self, status, reason):
+        self.rejected[status] += 1
+        raise Overloaded(status, reason, self.retry_after)
+
+    def admit(self, client, nbytes, scheduler_state):
+        """Admit a request of nbytes or raise Overloaded"""
+        queued = scheduler_state['interactive']['queued'] + scheduler_state['bulk']['queued']
+        running = scheduler_state['interactive']['running'] + scheduler_state['bulk']['running']
+        with self.lock:
+            if queued >= self.max_queue_depth:
+                self._reject(503, 'Verification queue is full')
+            if running >= scheduler_state['workers'] and queued >= scheduler_state['workers']:
+                self._reject(503, 'All verification workers are busy')
+            if self.inflight_bytes and self.inflight_bytes + nbytes > self.max_inflight_bytes:
+                self._reject(503, 'Too much upload data in flight')
+            if self.client_files.get(client, 0) >= self.max_files_per_client:
+                self._reject(429, 'Too many files in flight for this client')
+            self.inflight_bytes += nbytes
+            return AdmissionTicket(client, nbytes)
+
+    def add_files(self, ticket, count):
+        """Account the PDFs of an admitted request once they are known"""
+        with self.lock:
+            if count > self.max_files_per_client:
+                self._reject(413, f'At most {self.max_files_per_client} files per request')
+            current = self.client_files.get(ticket.client, 0)
+            if current + count > self.max_files_per_client:
+                self._reject(429, 'Too many files in flight for this client')
+            self.client_files[ticket.client] = current + count
+            ticket.files += count
+
+    def release(self, ticket):
+        with self.lock:
+            self.inflight_bytes -= ticket.nbytes
+            remaining = self.client_files.get(ticket.client, 0) - ticket.files
+            if remaining > 0:
+                self.client_files[ticket.client] = remaining
+            else:
+                self.client_files.pop(ticket.client, None)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'inflight_bytes': self.inflight_bytes,
+                'clients': len(self.client_files),
+                'inflight_files': sum(self.client_files.values()),
+                'rejected': dict(self.rejected)
+            }
+
+
+def admit_files(count):
+    """Account the PDFs of the current request against its admission ticket"""
+    ticket = g.get('admission')
+    if ticket is not None:
+        current_app.extensions['admission'].add_files(ticket, count)
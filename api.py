@@ -0,0 +1,212 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from flask import Blueprint, Response, current_app, request
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+from admission import admit_files
+from extractors import course_catalog
+from extractors.base_extractor import extraction_stats
+from extractors.parse_trace import keep_trace
+from extractors.pdf_buffer import SharedPDF, shared_memory_available
+from isolation import RESOURCE_LIMIT, TIMEOUT
+from job_queue import get_node_queue
+from pipeline import pipeline_stats
+from scheduler import LANE_BULK, LANE_INTERACTIVE, get_scheduler, submit_isolated
+from verification import verify_pdf
+
+API_VERSION = '1'
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+def json_response(payload, status=200):
+    """JSON response, gzip-compressed when the client accepts it"""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+
+    accepts_gzip = 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+    if accepts_gzip and len(body) >= current_app.config['API_GZIP_MIN_SIZE']:
+        response.set_data(gzip.compress(body, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def error_response(message, status):
+    return json_response({'api_version': API_VERSION, 'error': message}, status)
+
+
+class UploadRejected(Exception):
+    def __init__(self, message, status=413):
+        super().__init__(message)
+        self.status = status
+
+
+class DocumentBudget:
+    """Counts the PDFs of a request against the file and unpacked size limits"""
+
+    def __init__(self, max_files, max_bytes):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.files = 0
+        self.bytes = 0
+
+    def take(self, files, size):
+        self.files += files
+        self.bytes += size
+        if self.files > self.max_files:
+            raise UploadRejected(f'Too many files (limit {self.max_files})')
+        if self.bytes > self.max_bytes:
+            raise UploadRejected(f'Uploaded PDFs too large when unpacked (limit {self.max_bytes // (1024 * 1024)} MB)')
+
+
+def expand_upload(filename, data, budget):
+    """Yield (filename, pdf_bytes) for a PDF, or every PDF inside a ZIP
+
+    A ZIP's member count and declared sizes are checked against the budget
+    before any member is decompressed; zipfile stops a member that inflates
+    past its declared size.
+    """
+    if filename.lower().endswith('.zip') or data[:4] == b'PK\x03\x04':
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                members = [info for info in archive.infolist()
+                           if not info.is_dir() and info.filename.lower().endswith('.pdf')]
+                budget.take(len(members), sum(info.file_size for info in members))
+                for info in members:
+                    yield os.path.basename(info.filename), archive.read(info)
+        except zipfile.BadZipFile as e:
+            raise UploadRejected(f'Invalid ZIP file {filename}: {e}', 400)
+    else:
+        budget.take(1, len(data))
+        yield filename, data
+
+
+def collect_documents():
+    """Gather the PDFs of a request, from multipart fields or the raw body"""
+    budget = DocumentBudget(current_app.config['API_MAX_FILES'], current_app.config['API_MAX_UNPACKED_SIZE'])
+    documents = []
+    if request.files:
+        for field in ('files', 'file'):
+            for uploaded_file in request.files.getlist(field):
+                if uploaded_file.filename:
+                    documents.extend(expand_upload(uploaded_file.filename, uploaded_file.read(), budget))
+    else:
+        data = request.get_data(cache=False)
+        if data:
+            filename = request.headers.get('X-Filename') or request.args.get('filename') or 'document.pdf'
+            documents.extend(expand_upload(filename, data, budget))
+    return documents
+
+
+def result_record(filename, outcome):
+    """API result record for one verified (or failed) document"""
+    record = {'filename': filename}
+    if not outcome.ok:
+        record.update({'verified': False, 'status': '❌ Processing Error', 'error': outcome.message})
+        if outcome.failure == TIMEOUT:
+            record['status'] = '❌ Timeout'
+        elif outcome.failure == RESOURCE_LIMIT:
+            record['status'] = '❌ Resource limit'
+        return record
+
+    extractor, result = outcome.value
+    # Ladder and catalog counters were kept in the worker process, count them here
+    extraction_stats.record(result.get('extraction'))
+    trace_id = keep_trace(result, filename)
+    record.update(result)
+    if trace_id:
+        record['parse_trace_id'] = trace_id
+    record.setdefault('student_type', extractor.student_type)
+    record['verified'] = str(result.get('status', '')).startswith('✅')
+    return record
+
+
+@api.before_request
+def allow_larger_batches():
+    request.max_content_length = current_app.config['API_MAX_CONTENT_LENGTH']
+
+
+@api.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return error_response('Request body too large', 413)
+
+
+@api.route('/verify', methods=['POST'])
+def verify():
+    """Verify one or many marksheets and return the extractor output as JSON
+
+    Accepts multipart uploads in the ``file``/``files`` fields, or a raw PDF
+    or ZIP request body (filename taken from ``X-Filename`` or ``?filename=``).
+    """
+    try:
+        documents = collect_documents()
+    except UploadRejected as e:
+        return error_response(str(e), e.status)
+    if not documents:
+        return error_response('No PDF files found in request', 400)
+    admit_files(len(documents))
+
+    # A single document is interactive work; batches share the bulk lane fairly
+    if len(documents) == 1:
+        lane, batch = LANE_INTERACTIVE, None
+    else:
+        lane, batch = LANE_BULK, get_scheduler(current_app.config['WORKERS']).new_batch()
+
+    sources = []
+    spill_dir = None
+    try:
+        if shared_memory_available(sum(len(data) for _, data in documents)):
+            # Workers parse the PDFs from shared memory; nothing is written to disk
+            for _, data in documents:
+                sources.append(SharedPDF.from_bytes(data))
+        else:
+            # /dev/shm is too small (64 MB in many containers); use temp files
+            spill_dir = tempfile.mkdtemp(prefix='api-verify-')
+            for position, (_, data) in enumerate(documents):
+                path = os.path.join(spill_dir, f'{position}.pdf')
+                with open(path, 'wb') as f:
+                    f.write(data)
+                sources.append(path)
+        futures = [submit_isolated(current_app.config, lane, verify_pdf, source, batch=batch) for source in sources]
+        results = [result_record(secure_filename(name) or 'document.pdf', future.result())
+                   for (name, _), future in zip(documents, futures)]
+    finally:
+        # Also frees the segments already made when a later one failed
+        for source in sources:
+            if isinstance(source, SharedPDF):
+                source.release()
+        if spill_dir:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+    return json_response({
+        'api_version': API_VERSION,
+        'summary': {
+            'total': len(results),
+            'verified': sum(1 for r in results if r['verified']),
+            'failed': sum(1 for r in results if not r['verified'] and not r.get('error')),
+            'errors': sum(1 for r in results if r.get('error'))
+        },
+        'results': results
+    })
+
+
+@api.route('/metrics', methods=['GET'])
+def metrics():
+    """Extraction ladder counters, scheduler lanes and bulk pipeline stages for this server process"""
+    metrics = {
+        'api_version': API_VERSION,
+        'extraction': extraction_stats.snapshot(),
+        'scheduler': get_scheduler(current_app.config['WORKERS']).snapshot(),
+        'admission': current_app.extensions['admission'].snapshot(),
+        'bulk_pipeline': pipeline_stats.snapshot(),
+        'course_catalog': {'courses': len(course_catalog.catalog) if course_catalog.catalog is not None else None}
+    }
+    if current_app.config.get('JOB_QUEUE_DB'):
+        metrics['job_queue'] = get_node_queue(current_app.config).counts()
+    return json_response(metrics)
@@ -1,10 +1,34 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, send_from_directory, g, jsonify
 import os
+import csv
+import io
 import zipfile
 import tempfile
-import PyPDF2
+from urllib.parse import unquote
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.exceptions import NotFound
 from werkzeug.utils import secure_filename
-from extractor_factory import ExtractorFactory
+from extractors.non_nep_double_extractor import NonNEPDoubleExtractor
+from verification import build_bulk_entry, verify_pdf
+from extractors.base_extractor import extraction_stats
+from extractors.parse_trace import keep_trace
+from scheduler import LANE_INTERACTIVE, get_scheduler, submit_isolated
+from dedup import DuplicateDetector, duplicate_entry
+from api import api
+from admission import AdmissionController, Overloaded, admit_files
+from batch_store import BatchStore
+from batch_analytics import BatchAnalytics
+from bulk_pipeline import DUPLICATE, FAILED, UNREADABLE, BulkRun
+from pipeline import pipeline_stats
+from print_bundle import stream_bundle
+from cgpa_ledger import CGPALedger, check_cumulative, record_results
+from thumbnails import ThumbnailCache, ThumbnailService
+from result_cache import ResultCache, extraction_version, is_cacheable, render_fragment, same_check, template_version
+from cold_storage import ColdStore, ensure_archiver
+from job_queue import get_node_queue
+from reconcile import Roster, RosterError, reconcile, report_csv
+from admin import admin
+from profiler import MemoryTracker, RequestProfiler
 import re 
 import math
 
@@ -12,34 +36,148 @@ app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# JSON API accepts larger batches (many PDFs or a ZIP per call)
+app.config['API_MAX_CONTENT_LENGTH'] = 256 * 1024 * 1024
+app.config['API_MAX_FILES'] = 500
+# Summed size of the PDFs once ZIPs are unpacked, checked before decompressing
+app.config['API_MAX_UNPACKED_SIZE'] = int(os.environ.get('API_MAX_UNPACKED_MB', 512)) * 1024 * 1024
+app.config['API_GZIP_MIN_SIZE'] = 1024
+# Verification worker slots shared by single and bulk uploads (per server
+# process), and the budget each file runs under in its own process. The
+# BULK_* names from before these applied to every upload still work.
+app.config['WORKERS'] = int(os.environ.get('WORKERS', os.environ.get('BULK_WORKERS', os.cpu_count() or 1)))
+app.config['FILE_TIMEOUT'] = float(os.environ.get('FILE_TIMEOUT', os.environ.get('BULK_FILE_TIMEOUT', 60)))
+app.config['FILE_MEMORY_LIMIT'] = int(os.environ.get('FILE_MEMORY_MB', os.environ.get('BULK_FILE_MEMORY_MB', 1536))) * 1024 * 1024
+# Shared job queue on the shared volume; when set, bulk files are verified by
+# whichever node has a free worker
+app.config['JOB_QUEUE_DB'] = os.environ.get('JOB_QUEUE_DB')
+app.config['JOB_QUEUE_LEASE'] = float(os.environ.get('JOB_QUEUE_LEASE', 60))
+# Finished jobs are deleted after this many seconds (0 keeps them)
+app.config['JOB_QUEUE_RETENTION'] = float(os.environ.get('JOB_QUEUE_RETENTION', 86400))
+# Bulk uploads are verified from memory; set PERSIST_UPLOADS=0 to never write
+# them to the upload folder (the report then has no PDF links)
+app.config['PERSIST_UPLOADS'] = os.environ.get('PERSIST_UPLOADS', '1') != '0'
+# Bulk files move through pipeline stages (see bulk_pipeline.py); threads of
+# the disk stages and the files a stage may hold waiting for the next one
+app.config['BULK_IO_THREADS'] = int(os.environ.get('BULK_IO_THREADS', 4))
+app.config['BULK_PIPELINE_QUEUE'] = int(os.environ.get('BULK_PIPELINE_QUEUE', 2 * app.config['WORKERS']))
+# With JOB_QUEUE_DB, files of one upload the verify stage keeps queued at once;
+# any node may run them, so this is not capped by this server's WORKERS
+app.config['BULK_QUEUE_IN_FLIGHT'] = int(os.environ.get('BULK_QUEUE_IN_FLIGHT', 32))
+# How long a queued bulk file may take before it is reported as timed out:
+# every attempt's budget plus a lease expiry, and the queue ahead of it
+app.config['JOB_QUEUE_WAIT'] = float(os.environ.get('JOB_QUEUE_WAIT', (
+    3 * (app.config['FILE_TIMEOUT'] + app.config['JOB_QUEUE_LEASE'])
+    + app.config['BULK_QUEUE_IN_FLIGHT'] / app.config['WORKERS'] * app.config['FILE_TIMEOUT']
+)))
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Bulk result rows, kept so a batch can be printed after its report is shown
+app.config['BATCH_FOLDER'] = os.environ.get('BATCH_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'batches'))
+app.extensions['batches'] = BatchStore(app.config['BATCH_FOLDER'])
+# Per-student semester totals for cumulative CGPA checks (empty disables them)
+app.config['CGPA_LEDGER_DB'] = os.environ.get('CGPA_LEDGER_DB', os.path.join(app.config['UPLOAD_FOLDER'], 'cgpa_ledger.db'))
+app.extensions['cgpa_ledger'] = CGPALedger(app.config['CGPA_LEDGER_DB']) if app.config['CGPA_LEDGER_DB'] else None
+# First-page previews of bulk uploads, rendered in the background
+app.config['THUMBNAIL_FOLDER'] = os.environ.get('THUMBNAIL_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'thumbnails'))
+app.config['THUMBNAIL_MAX_BYTES'] = int(os.environ.get('THUMBNAIL_MAX_MB', 100)) * 1024 * 1024
+app.config['THUMBNAIL_WIDTH'] = int(os.environ.get('THUMBNAIL_WIDTH', 240))
+app.config['THUMBNAIL_WORKERS'] = int(os.environ.get('THUMBNAIL_WORKERS', 1))
+# How long a thumbnail request waits for a render still in progress
+app.config['THUMBNAIL_WAIT'] = float(os.environ.get('THUMBNAIL_WAIT', 2))
+app.extensions['thumbnails'] = ThumbnailService(
+    ThumbnailCache(app.config['THUMBNAIL_FOLDER'], app.config['THUMBNAIL_MAX_BYTES']),
+    app.config['THUMBNAIL_WIDTH'], app.config['THUMBNAIL_WORKERS']
+)
 
-class MarksheetVerifier:
-    def __init__(self):
-        self.grade_points = {
-            'A+': 10, 'A': 9, 'B+': 8, 'B': 7, 'C+': 6,
-            'C': 5, 'D': 4, 'F': 0, 'FF': 0, 'P': 5, 'PP': 5, 'PASS': 5, 'COMP': 5
-        }
-
-    def calculate_egp(self, courses):
-        egp = 0
-        for course in courses:
-            grade = course['grade'].upper()
-            earned = course['earned']
-            point = self.grade_points.get(grade, 0)
-            egp += point * earned
-        return egp
-
-    def calculate_total_credits(self, courses):
-        return sum(course['earned'] for course in courses)
-
-    def calculate_sgpa(self, courses):
-        total_credits = self.calculate_total_credits(courses)
-        if total_credits == 0:
-            return 0
-        egp = self.calculate_egp(courses)
-        return round(egp / total_credits, 2)
+# Rendered single-upload results by PDF hash; RESULT_CACHE_MAX_MB=0 disables
+app.config['RESULT_CACHE_FOLDER'] = os.environ.get('RESULT_CACHE_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'result_cache'))
+app.config['RESULT_CACHE_MAX_BYTES'] = int(os.environ.get('RESULT_CACHE_MAX_MB', 50)) * 1024 * 1024
+app.extensions['result_cache'] = ResultCache(
+    app.config['RESULT_CACHE_FOLDER'], app.config['RESULT_CACHE_MAX_BYTES'],
+    f"{template_version(app.jinja_env)}-{extraction_version()}"
+) if app.config['RESULT_CACHE_MAX_BYTES'] else None
+
+# Uploads not modified for ARCHIVE_AFTER_DAYS move into compressed bundles (off by default)
+app.config['ARCHIVE_FOLDER'] = os.environ.get('ARCHIVE_FOLDER', os.path.join(app.config['UPLOAD_FOLDER'], 'archive'))
+app.config['ARCHIVE_AFTER_DAYS'] = float(os.environ.get('ARCHIVE_AFTER_DAYS', 0))
+app.config['ARCHIVE_INTERVAL'] = float(os.environ.get('ARCHIVE_INTERVAL', 3600))
+app.config['ARCHIVE_COMPRESSION'] = os.environ.get('ARCHIVE_COMPRESSION', 'deflated')
+app.config['ARCHIVE_BUNDLE_FILES'] = int(os.environ.get('ARCHIVE_BUNDLE_FILES', 500))
+app.extensions['cold_store'] = ColdStore(
+    app.config['UPLOAD_FOLDER'], app.config['ARCHIVE_FOLDER'],
+    app.config['ARCHIVE_COMPRESSION'], app.config['ARCHIVE_BUNDLE_FILES']
+)
+
+# Admission control for the upload endpoints, checked before bodies are read
+app.config['ADMISSION_MAX_QUEUE_DEPTH'] = int(os.environ.get('ADMISSION_MAX_QUEUE_DEPTH', 1000))
+app.config['ADMISSION_MAX_INFLIGHT_BYTES'] = int(os.environ.get('ADMISSION_MAX_INFLIGHT_MB', 512)) * 1024 * 1024
+app.config['ADMISSION_MAX_FILES_PER_CLIENT'] = int(os.environ.get('ADMISSION_MAX_FILES_PER_CLIENT', 500))
+app.config['ADMISSION_RETRY_AFTER'] = int(os.environ.get('ADMISSION_RETRY_AFTER', 10))
+# Reverse proxies in front of the app; their X-Forwarded-For entries are
+# trusted so each client is counted by its own address, not the proxy's
+app.config['PROXY_HOPS'] = int(os.environ.get('PROXY_HOPS', 0))
+if app.config['PROXY_HOPS']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_HOPS'], x_proto=app.config['PROXY_HOPS'])
+
+app.register_blueprint(api)
+
+app.extensions['admission'] = AdmissionController(
+    app.config['ADMISSION_MAX_QUEUE_DEPTH'],
+    app.config['ADMISSION_MAX_INFLIGHT_BYTES'],
+    app.config['ADMISSION_MAX_FILES_PER_CLIENT'],
+    app.config['ADMISSION_RETRY_AFTER']
+)
+ADMITTED_ENDPOINTS = {'upload_file', 'upload_bulk', 'api_v1.verify'}
+
+# Admin-only profiling of the next N uploads and tracemalloc snapshots;
+# the /admin endpoints are disabled unless ADMIN_TOKEN is set
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+app.register_blueprint(admin)
+app.extensions['profiler'] = RequestProfiler()
+app.extensions['memory'] = MemoryTracker()
+PROFILED_ENDPOINTS = {'upload_file', 'upload_bulk'}
+
+@app.before_request
+def admit_upload():
+    if request.endpoint in ADMITTED_ENDPOINTS:
+        state = get_scheduler(app.config['WORKERS']).snapshot()
+        g.admission = app.extensions['admission'].admit(request.remote_addr, request.content_length or 0, state)
+
+@app.before_request
+def claim_profile():
+    if request.endpoint in PROFILED_ENDPOINTS:
+        g.profile = app.extensions['profiler'].claim()
+
+@app.before_request
+def start_archiver():
+    # Started on the first request so every forked server process runs its own
+    ensure_archiver(app.extensions['cold_store'], app.config)
+
+@app.before_request
+def start_queue_worker():
+    # Lease shared queue jobs whatever this server is asked to do; under
+    # gunicorn post_worker_init has started it already
+    if app.config['JOB_QUEUE_DB']:
+        get_node_queue(app.config)
+
+@app.teardown_request
+def release_upload(exc):
+    ticket = g.pop('admission', None)
+    if ticket is not None:
+        app.extensions['admission'].release(ticket)
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    message = e.reason if e.status == 413 else f'{e.reason}. Please try again in {e.retry_after} seconds.'
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': message})
+    else:
+        response = app.response_class(message + '\n', mimetype='text/plain')
+    response.status_code = e.status
+    if e.status != 413:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ['pdf', 'zip']
@@ -50,16 +188,50 @@ def index():
 
 @app.route('/uploads/<filename>')
 def serve_uploaded_file(filename):
-    """Serve uploaded files directly"""
+    """Serve uploaded files directly, streaming archived ones from their bundle"""
     try:
         return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
-    except FileNotFoundError:
-        flash('File not found', 'error')
-        return redirect(url_for('index'))
+    except NotFound:
+        store = app.extensions['cold_store']
+        archived = store.lookup(secure_filename(filename))
+        if archived is None:
+            flash('File not found', 'error')
+            return redirect(url_for('index'))
+        response = app.response_class(store.stream(archived), mimetype='application/pdf')
+        response.content_length = archived.size
+        return response
+
+@app.route('/thumbnail/<digest>/<filename>')
+def thumbnail(digest, filename):
+    """First-page JPEG of an uploaded PDF, addressed by the PDF's SHA-256
+
+    Rendered on demand from the upload if the background render has not
+    produced it yet. The content never changes for a digest, so it is
+    cached by browsers for a year.
+    """
+    path = None
+    if re.fullmatch(r'[0-9a-f]{64}', digest):
+        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
+        thumbnails = app.extensions['thumbnails']
+        if not os.path.exists(pdf_path) and app.extensions['cold_store'].lookup(secure_filename(filename)):
+            # Archived uploads are only served from the cache, never rendered again
+            path = thumbnails.cache.get(digest)
+        else:
+            path = thumbnails.wait(digest, pdf_path, app.config['THUMBNAIL_WAIT'])
+    if path is None:
+        response = app.response_class('Thumbnail not available', status=404, mimetype='text/plain')
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    response = send_file(path, mimetype='image/jpeg', max_age=31536000, conditional=True)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/pdf/<filename>')
 def serve_pdf(filename):
-    """Serve the uploaded PDF file with proper headers"""
+    """Serve the uploaded PDF file with proper headers
+
+    Archived uploads are decompressed from their bundle while they are sent.
+    """
     try:
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
         if os.path.exists(file_path):
@@ -69,12 +241,17 @@ def serve_pdf(filename):
                 as_attachment=False,
                 mimetype='application/pdf'
             )
-            response.headers['Content-Type'] = 'application/pdf'
-            response.headers['Content-Disposition'] = f'inline; filename="{filename}"'
-            return response
         else:
-            flash('File not found', 'error')
-            return redirect(url_for('index'))
+            store = app.extensions['cold_store']
+            archived = store.lookup(secure_filename(filename))
+            if archived is None:
+                flash('File not found', 'error')
+                return redirect(url_for('index'))
+            response = app.response_class(store.stream(archived), mimetype='application/pdf')
+            response.content_length = archived.size
+        response.headers['Content-Type'] = 'application/pdf'
+        response.headers['Content-Disposition'] = f'inline; filename="{filename}"'
+        return response
     except Exception as e:
         flash(f'Error serving PDF: {str(e)}', 'error')
         return redirect(url_for('index'))
@@ -98,87 +275,50 @@ def upload_file():
         return redirect(url_for('index'))
 
     if file and allowed_file(file.filename):
+        # The same PDF verified before is shown from the result cache, unread
+        result_cache = app.extensions['result_cache']
+        digest = DuplicateDetector.hash_stream(file.stream)
+        cached = result_cache.load(digest) if result_cache is not None and not g.get('profile') else None
+        if cached is not None:
+            # Saved again, as a later upload may have reused the cached filename
+            file_path, filename = save_uploaded_file(file)
+            return render_cached_result(digest, refresh_cumulative(digest, cached, filename))
+
+        admit_files(1)
         file_path, filename = save_uploaded_file(file)
 
         try:
-            # First, detect if it's a double semester marksheet
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                first_page_text = pdf_reader.pages[0].extract_text()
-            
-            # Check for double semester pattern
-            if 'Previous Semester Performance' in first_page_text and 'Current Semester Performance' in first_page_text:
-                from non_nep_double_extractor import NonNEPDoubleExtractor
-                extractor = NonNEPDoubleExtractor()
-                result = extractor.process_pdf(file_path)
-                
-                # Add PDF URL for viewing - use direct file serving
-                result['pdf_url'] = url_for('serve_pdf', filename=filename)
-                
-                return render_template('double_semester_results.html', 
-                                     result=result,
-                                     filename=filename)
+            # Single uploads use the interactive lane, ahead of any bulk work
+            profiler = app.extensions['profiler']
+            func = profiler.wrap(verify_pdf) if g.get('profile') else verify_pdf
+            outcome = submit_isolated(app.config, LANE_INTERACTIVE, func, file_path).result()
+            if not outcome.ok:
+                flash(f'Error processing file: {outcome.message}', 'error')
+                return redirect(url_for('index'))
+            if g.get('profile'):
+                (extractor, result), stacks = outcome.value
+                profiler.record(filename, result.get('student_type', extractor.student_type), stacks)
+            else:
+                extractor, result = outcome.value
+            extraction_stats.record(result.get('extraction'))
+            keep_trace(result, filename)
+            result['cumulative_check'] = check_upload_cumulative(filename, result)
+
+            result.setdefault('student_type', extractor.student_type)
+
+            if isinstance(extractor, NonNEPDoubleExtractor):
+                template = 'double_semester_results.html'
+            elif 'verification' not in result:
+                flash('No courses data extracted from the PDF.', 'error')
+                return redirect(url_for('index'))
             else:
-                # Use factory for single semester marksheets
-                extractor = ExtractorFactory.get_extractor("")
-                text = extractor.extract_text_from_pdf(file_path)
-                extractor = ExtractorFactory.get_extractor(text)
-                
-                result = extractor.process_pdf(file_path)
-                
-                # Handle single semester formats
-                if isinstance(result, dict) and 'verification' in result:
-                    # New format with verification data
-                    courses = result.get('all_courses', [])
-                    student_type = result.get('student_type', 'Unknown')
-                    verification = result.get('verification', {})
-                    status = result.get('status', 'Unknown')
-                    
-                    # Add PDF URL for viewing - use direct file serving
-                    pdf_url = url_for('serve_pdf', filename=filename)
-                    
-                    return render_template('results.html', 
-                                         courses=courses, 
-                                         verification=verification,
-                                         status=status,
-                                         filename=filename,
-                                         student_type=student_type,
-                                         total_courses=len(courses),
-                                         pdf_url=pdf_url)
-                else:
-                    # Old format (backward compatibility)
-                    courses = result if isinstance(result, list) else []
-                    student_type = extractor.student_type
-                    
-                    if not courses:
-                        flash('No courses data extracted from the PDF.', 'error')
-                        return redirect(url_for('index'))
-
-                    # Calculate verification for old format
-                    verifier = MarksheetVerifier()
-                    calc_egp = verifier.calculate_egp(courses)
-                    calc_cred = verifier.calculate_total_credits(courses)
-                    calc_sgpa = verifier.calculate_sgpa(courses)
-
-                    verification = {
-                        'egp': {'calculated': calc_egp, 'reported': calc_egp, 'match': True, 'difference': 0},
-                        'credits': {'calculated': calc_cred, 'reported': calc_cred, 'match': True, 'difference': 0},
-                        'sgpa': {'calculated': calc_sgpa, 'reported': calc_sgpa, 'match': True, 'difference': 0}
-                    }
-
-                    status = "✅ All Values Match"
-
-                    # Add PDF URL for viewing - use direct file serving
-                    pdf_url = url_for('serve_pdf', filename=filename)
-
-                    return render_template('results.html', 
-                                         courses=courses, 
-                                         verification=verification,
-                                         status=status,
-                                         filename=filename,
-                                         student_type=student_type,
-                                         total_courses=len(courses),
-                                         pdf_url=pdf_url)
+                template = 'results.html'
+            context = result_context(template, result, filename)
+
+            if result_cache is None or not is_cacheable(result):
+                return render_template(template, **context)
+            fragment = render_fragment(app, template, **context)
+            return render_cached_result(digest, result_cache.store(digest, filename, template, fragment, result))
 
         except Exception as e:
             flash(f'Error processing file: {str(e)}', 'error')
@@ -187,176 +327,113 @@ def upload_file():
     flash('Invalid file type.', 'error')
     return redirect(url_for('index'))
 
-def is_values_match(calculated, reported, value_type='general'):
-    """Check if calculated and reported values match within tolerance"""
-    if calculated == 0 and reported == 0:
-        return False  # Both zero means no data
-    
-    # Handle floating point precision issues
-    difference = abs(calculated - reported)
-    
-    # Set tolerance based on value type
-    if value_type == 'sgpa':
-        tolerance = 0.01  # Tighter tolerance for SGPA
-    else:
-        tolerance = 0.1   # Regular tolerance for credits and EGP
-    
-    return difference < tolerance
+def result_context(template, result, filename):
+    """Template context of a single upload's result page"""
+    # Add PDF URL for viewing - use direct file serving
+    pdf_url = url_for('serve_pdf', filename=filename)
+    if template == 'double_semester_results.html':
+        result['pdf_url'] = pdf_url
+        return {'result': result, 'filename': filename}
+    courses = result.get('all_courses', [])
+    return {
+        'courses': courses,
+        'verification': result.get('verification', {}),
+        'status': result.get('status', 'Unknown'),
+        'filename': filename,
+        'student_type': result.get('student_type'),
+        'total_courses': len(courses),
+        'cumulative_check': result.get('cumulative_check'),
+        'pdf_url': pdf_url
+    }
 
-def process_bulk_upload(uploaded_files):
-    """Process multiple PDF files for bulk verification"""
-    results = []
-    
-    for uploaded_file in uploaded_files:
-        try:
-            filename = uploaded_file.filename
-            
-            # Save the file permanently first
-            permanent_path, saved_filename = save_uploaded_file(uploaded_file)
-            pdf_url = url_for('serve_pdf', filename=saved_filename)
-            
-            # Determine student type and use appropriate extractor
-            result_data = None
-            
-            # Read first few lines to determine type
-            try:
-                with open(permanent_path, 'rb') as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    first_page_text = pdf_reader.pages[0].extract_text()
-                    
-                if 'Previous Semester Performance' in first_page_text and 'Current Semester Performance' in first_page_text:
-                    # Non-NEP Double Semester
-                    try:
-                        from non_nep_double_extractor import NonNEPDoubleExtractor
-                        extractor = NonNEPDoubleExtractor()
-                        result_data = extractor.get_bulk_data(permanent_path)
-                    except ImportError as e:
-                        result_data = {
-                            'reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'status': f"❌ Import Error: {str(e)}",
-                            'student_type': 'Non-NEP Student (Double Semester)',
-                            'error': str(e)
-                        }
-                    except Exception as e:
-                        result_data = {
-                            'reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'status': f"❌ Processing Error",
-                            'student_type': 'Non-NEP Student (Double Semester)',
-                            'error': str(e)
-                        }
-                else:
-                    # For other types, use the factory
-                    try:
-                        extractor = ExtractorFactory.get_extractor("")
-                        text = extractor.extract_text_from_pdf(permanent_path)
-                        extractor = ExtractorFactory.get_extractor(text)
-                        
-                        # Process and create result data for bulk display
-                        full_result = extractor.process_pdf(permanent_path)
-                        
-                        if isinstance(full_result, dict) and 'verification' in full_result:
-                            # New format with verification
-                            verification = full_result.get('verification', {})
-                            result_data = {
-                                'reported': {
-                                    'egp': verification.get('egp', {}).get('reported', 0),
-                                    'credits': verification.get('credits', {}).get('reported', 0),
-                                    'sgpa': verification.get('sgpa', {}).get('reported', 0)
-                                },
-                                'calculated': {
-                                    'egp': verification.get('egp', {}).get('calculated', 0),
-                                    'credits': verification.get('credits', {}).get('calculated', 0),
-                                    'sgpa': verification.get('sgpa', {}).get('calculated', 0)
-                                },
-                                'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                                'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                                'status': "✅ Correct" if full_result.get('status', '').startswith('✅') else "❌ Wrong",
-                                'student_type': full_result.get('student_type', extractor.student_type)
-                            }
-                        else:
-                            # Old format - calculate manually
-                            courses = full_result if isinstance(full_result, list) else []
-                            verifier = MarksheetVerifier()
-                            calc_egp = verifier.calculate_egp(courses)
-                            calc_cred = verifier.calculate_total_credits(courses)
-                            calc_sgpa = verifier.calculate_sgpa(courses)
-                            
-                            result_data = {
-                                'reported': {'egp': calc_egp, 'credits': calc_cred, 'sgpa': calc_sgpa},
-                                'calculated': {'egp': calc_egp, 'credits': calc_cred, 'sgpa': calc_sgpa},
-                                'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                                'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                                'status': "✅ Correct",
-                                'student_type': extractor.student_type
-                            }
-                    except Exception as e:
-                        result_data = {
-                            'reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                            'status': f"❌ Processing Error",
-                            'student_type': 'Unknown',
-                            'error': str(e)
-                        }
-            except Exception as e:
-                result_data = {
-                    'reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                    'calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                    'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                    'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                    'status': f"❌ PDF Read Error",
-                    'student_type': 'Unknown',
-                    'error': str(e)
-                }
-            
-            # Calculate match status for both semesters with better debugging
-            if result_data: 
-                # Previous semester match
-                prev_credits_match = is_values_match(result_data['previous_calculated']['credits'], result_data['previous_reported']['credits'], 'credits')
-                prev_egp_match = is_values_match(result_data['previous_calculated']['egp'], result_data['previous_reported']['egp'], 'egp')
-                prev_sgpa_match = is_values_match(result_data['previous_calculated']['sgpa'], result_data['previous_reported']['sgpa'], 'sgpa')
-
-                prev_match = prev_credits_match and prev_egp_match and prev_sgpa_match
-                
-                # Current semester match
-                curr_credits_match = is_values_match(result_data['calculated']['credits'], result_data['reported']['credits'], 'credits')
-                curr_egp_match = is_values_match(result_data['calculated']['egp'], result_data['reported']['egp'], 'egp')
-                curr_sgpa_match = is_values_match(result_data['calculated']['sgpa'], result_data['reported']['sgpa'], 'sgpa')
-
-                curr_match = curr_credits_match and curr_egp_match and curr_sgpa_match
-                                
-                # Determine overall status
-                if result_data.get('status') in ['✅ Correct', '❌ Wrong']:
-                    # Use the status from the extractor if available
-                    status = result_data['status']
-                else:
-                    # Determine status based on matches
-                    status = "✅ Correct" if (prev_match and curr_match) else "❌ Wrong"
-                
-                result_entry = {
-                    'filename': filename,
-                    'student_type': result_data.get('student_type', 'Unknown'),
-                    'calculated': result_data.get('calculated', {'egp': 0, 'credits': 0, 'sgpa': 0}),
-                    'reported': result_data.get('reported', {'egp': 0, 'credits': 0, 'sgpa': 0}),
-                    'previous_calculated': result_data.get('previous_calculated', {'egp': 0, 'credits': 0, 'sgpa': 0}),
-                    'previous_reported': result_data.get('previous_reported', {'egp': 0, 'credits': 0, 'sgpa': 0}),
-                    'previous_match': prev_match,
-                    'current_match': curr_match,
-                    'status': status,
-                    'error': result_data.get('error'),
-                    'pdf_url': pdf_url  # Always include PDF URL
-                }
-                results.append(result_entry)
-            else:
-                results.append({
-                    'filename': filename,
+def refresh_cumulative(digest, entry, filename=None, record=True):
+    """Re-run a cached result's cumulative check against the ledger as it is now
+
+    Other semesters may have been uploaded since the entry was stored; the
+    fragment is re-rendered (and re-stored) only when the check or the
+    filename its PDF link points at changed. With ``record`` False the
+    ledger is only read, as for a GET of the result.
+    """
+    payload = entry['payload']
+    filename = filename or entry['filename']
+    check = check_upload_cumulative(filename, payload, record)
+    unchanged = same_check(check, payload.get('cumulative_check')) and filename == entry['filename']
+    if unchanged or not entry.get('template'):
+        return entry
+    payload['cumulative_check'] = check
+    context = result_context(entry['template'], payload, filename)
+    fragment = render_fragment(app, entry['template'], **context)
+    return app.extensions['result_cache'].store(digest, filename, entry['template'], fragment, payload)
+
+def render_cached_result(digest, entry):
+    """Page around a rendered result fragment, with a link to share it"""
+    return render_template('cached_result.html', fragment=entry['fragment'], filename=entry['filename'],
+                           result_url=url_for('cached_result', digest=digest, _external=True))
+
+@app.route('/result/<digest>')
+def cached_result(digest):
+    """A marksheet's verification result from the cache, by the PDF's SHA-256
+
+    ``format=json`` returns the extractor output instead of the page.
+    """
+    result_cache = app.extensions['result_cache']
+    entry = None
+    if result_cache is not None and re.fullmatch(r'[0-9a-f]{64}', digest):
+        entry = result_cache.load(digest)
+        if entry is not None:
+            entry = refresh_cumulative(digest, entry, record=False)
+    if request.args.get('format') == 'json':
+        if entry is None:
+            return jsonify({'error': 'Result not cached'}), 404
+        return jsonify(entry['payload'])
+    if entry is None:
+        flash('This result is no longer cached; please upload the marksheet again', 'error')
+        return redirect(url_for('index'))
+    return render_cached_result(digest, entry)
+
+def check_upload_cumulative(filename, result, record=True):
+    """Record a single upload's semesters and check its cumulative figures
+
+    With ``record`` False the semesters are not recorded, only checked.
+    """
+    ledger = app.extensions['cgpa_ledger']
+    if ledger is None or result.get('error'):
+        return None
+    performance = result.get('performance_data') or {}
+    result_data = {
+        'filename': filename,
+        'student_info': result.get('student_info'),
+        'cumulative': result.get('cumulative'),
+        # Double semester results report both semesters, the others only one
+        'reported': performance.get('current', performance),
+        'previous_reported': performance.get('previous', {})
+    }
+    if not record:
+        return check_cumulative(ledger, result_data)
+    return record_results(ledger, [result_data])[0]
+
+def process_bulk_upload(uploaded_files, analytics=None):
+    """Process multiple PDF files for bulk verification
+
+    Files go through the stages in bulk_pipeline, so one file is saved while
+    another is verified. Each finished file is also folded into
+    ``analytics`` (a BatchAnalytics) when one is given.
+    """
+    results = [None] * len(uploaded_files)
+    duplicates = []  # (index, index of the original, kind)
+    run = BulkRun(app.config, app.extensions, g.get('profile', False))
+
+    items = run.run(uploaded_files)
+    try:
+        for item in items:
+            index = item.index
+            if item.state == DUPLICATE:
+                results[index] = {'filename': item.filename}
+                duplicates.append((index, *item.duplicate))
+                continue
+            if item.state == FAILED:
+                results[index] = {
+                    'filename': item.filename,
                     'student_type': 'Unknown',
                     'calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
                     'reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
@@ -364,26 +441,41 @@ def process_bulk_upload(uploaded_files):
                     'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
                     'previous_match': False,
                     'current_match': False,
-                    'status': '❌ No result data',
-                    'error': 'No data returned from processor',
-                    'pdf_url': pdf_url  # Always include PDF URL even if processing failed
-                })
-            
-        except Exception as e:
-                
-            results.append({
-                'filename': uploaded_file.filename,
-                'student_type': 'Unknown',
-                'calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                'reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
-                'previous_match': False,
-                'current_match': False,
-                'status': f'❌ Error',
-                'error': str(e),
-                'pdf_url': ''  # No PDF URL available due to error
-            })
+                    'status': f'❌ Error',
+                    'error': item.error,
+                    'pdf_url': ''  # No PDF URL available due to error
+                }
+                if analytics is not None:
+                    analytics.add(results[index])
+                continue
+
+            result_data = item.result_data
+            # Ladder metrics were recorded in the worker process, count them here
+            extraction_stats.record(result_data.get('extraction'))
+            keep_trace(result_data, item.filename)
+            if item.stacks is not None:
+                app.extensions['profiler'].record(item.filename, result_data.get('student_type'), item.stacks)
+            pdf_url = url_for('serve_pdf', filename=item.saved_filename) if item.saved_filename else ''
+            results[index] = build_bulk_entry(item.filename, result_data, pdf_url)
+            if pdf_url and item.state != UNREADABLE:
+                results[index]['thumbnail_url'] = url_for('thumbnail', digest=item.content_hash, filename=item.saved_filename)
+            if analytics is not None:
+                analytics.add(results[index], result_data.get('courses', ()))
+    finally:
+        # After an error the rest of the run is cancelled and its buffers freed
+        items.close()
+
+    pipeline_stats.record(run.stats)
+    if analytics is not None:
+        analytics.pipeline = run.stats
+
+    for index, original_index, kind in duplicates:
+        results[index] = duplicate_entry(results[index]['filename'], results[original_index], original_index, kind)
+
+    ledger = app.extensions['cgpa_ledger']
+    if ledger is not None:
+        for entry, report in zip(results, record_results(ledger, results)):
+            entry['cumulative_check'] = report
     
     return results
 
@@ -399,9 +491,101 @@ def upload_bulk():
         return redirect(url_for('index'))
 
     
+    admit_files(sum(1 for file in files if file.filename))
+
     # Use the new process_bulk_upload function
-    results = process_bulk_upload(files)
+    analytics = BatchAnalytics()
+    results = process_bulk_upload(files, analytics)
+    batch_id = app.extensions['batches'].save(results, analytics.summary())
         
-    return render_template('bulk_results.html', results=results)
+    return render_template('bulk_results.html', results=results, batch_id=batch_id)
+
+@app.route('/bulk/<batch_id>/print')
+def print_bundle(batch_id):
+    """One merged PDF of a batch's marksheets, streamed while it is built
+
+    ``status`` picks the rows: ``wrong`` (default), ``failed`` (anything not
+    verified), ``all``, or ``selected`` for the row indexes given in ``rows``.
+    ``cover=0`` leaves out the summary cover page.
+    """
+    results = app.extensions['batches'].load(batch_id)
+    if results is None:
+        flash('Bulk results not found', 'error')
+        return redirect(url_for('index'))
+
+    status = request.args.get('status', 'wrong')
+    if status == 'selected':
+        selected = [results[i] for i in request.args.getlist('rows', type=int) if 0 <= i < len(results)]
+    else:
+        # Copies point at their original's PDF, which is printed once
+        selected = [r for r in results if not r.get('duplicate_of') and (
+            status == 'all' or
+            (status == 'failed' and r.get('status') != '✅ Correct') or
+            r.get('status') == '❌ Wrong'
+        )]
+
+    entries = []
+    for r in selected:
+        if r.get('pdf_url'):
+            filename = secure_filename(unquote(r['pdf_url'].rsplit('/', 1)[-1]))
+            entries.append((os.path.join(app.config['UPLOAD_FOLDER'], filename), r))
+    if not entries:
+        flash('No marksheets to print for this selection', 'error')
+        return redirect(url_for('index'))
+
+    response = app.response_class(
+        stream_bundle(entries, cover=request.args.get('cover', '1') != '0',
+                      open_file=app.extensions['cold_store'].open_upload),
+        mimetype='application/pdf'
+    )
+    response.headers['Content-Disposition'] = f'inline; filename="marksheets-{batch_id[:8]}.pdf"'
+    return response
+
+@app.route('/bulk/<batch_id>/analytics')
+def batch_analytics(batch_id):
+    """Grade distributions per course and where a batch's mismatches come from
+
+    ``format=json`` returns the summary itself.
+    """
+    summary = app.extensions['batches'].load_analytics(batch_id)
+    if summary is None:
+        flash('Analytics not found for this batch', 'error')
+        return redirect(url_for('index'))
+    if request.args.get('format') == 'json':
+        return jsonify(summary)
+    return render_template('bulk_analytics.html', summary=summary, batch_id=batch_id)
+
+@app.route('/bulk/<batch_id>/reconcile', methods=['POST'])
+def reconcile_batch(batch_id):
+    """CSV report of a batch's disagreements with an uploaded roster
+
+    The roster is a CSV with a roll number or PRN column and SGPA and/or
+    credits columns (semester and name are optional). ``matches=1`` also
+    lists the marksheets that agree; ``missing=0`` leaves out roster rows
+    without a marksheet.
+    """
+    results = app.extensions['batches'].load(batch_id)
+    if results is None:
+        flash('Bulk results not found', 'error')
+        return redirect(url_for('index'))
+
+    file = request.files.get('roster')
+    if not file or not file.filename:
+        flash('No roster file selected', 'error')
+        return redirect(url_for('index'))
+    try:
+        roster = Roster.from_csv(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''))
+    except (RosterError, UnicodeDecodeError, csv.Error) as e:
+        flash(f'Could not read the roster: {e}', 'error')
+        return redirect(url_for('index'))
+
+    rows = reconcile(
+        roster, results,
+        include_matches=request.form.get('matches') == '1',
+        report_missing=request.form.get('missing', '1') != '0'
+    )
+    response = app.response_class(report_csv(rows), mimetype='text/csv')
+    response.headers['Content-Disposition'] = f'attachment; filename="reconcile-{batch_id[:8]}.csv"'
+    return response
 
     
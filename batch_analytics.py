@@ -0,0 +1,88 @@
+"""Running totals of a bulk batch: grade distributions and where mismatches come from.
+
+Each verified file is folded in as soon as its result comes back and its
+course list is dropped, so memory grows with the number of distinct courses,
+semesters and formats, not with the number of files.
+"""
+from verification import is_values_match
+
+METRICS = ('egp', 'credits', 'sgpa')
+VERIFIED = '✅ Correct'
+
+
+class BatchAnalytics:
+    def __init__(self):
+        self.files = 0
+        self.courses = {}        # course code -> {'grades': {grade: n}, 'files': n, 'mismatched': n}
+        self.metrics = {}        # 'current sgpa' / 'previous egp' ... -> mismatches
+        self.semesters = {}      # semester -> {'files': n, 'mismatched': n, 'metrics': {metric: n}}
+        self.student_types = {}  # student type -> {'files': n, 'failed': n, 'errors': n}
+        self.pipeline = None     # stage counters of the bulk pipeline run, once it is done
+
+    def add(self, entry, courses=()):
+        """Fold in one bulk report row and the [code, grade] pairs of its courses"""
+        self.files += 1
+        failed = entry.get('status') != VERIFIED
+        counts = self.student_types.setdefault(entry.get('student_type') or 'Unknown',
+                                               {'files': 0, 'failed': 0, 'errors': 0})
+        counts['files'] += 1
+        counts['failed'] += failed
+        if entry.get('error'):
+            counts['errors'] += 1
+            return
+
+        mismatched = entry.get('status') == '❌ Wrong'
+        seen = set()
+        for code, grade in courses:
+            course = self.courses.get(code)
+            if course is None:
+                course = self.courses[code] = {'grades': {}, 'files': 0, 'mismatched': 0}
+            course['grades'][grade] = course['grades'].get(grade, 0) + 1
+            if code not in seen:
+                seen.add(code)
+                course['files'] += 1
+                course['mismatched'] += mismatched
+
+        semester = (entry.get('student_info') or {}).get('semester')
+        self._add_semester(semester, entry.get('reported'), entry.get('calculated'), 'current')
+        if semester and (entry.get('previous_reported') or {}).get('credits'):
+            # A double semester marksheet also reports the semester before
+            self._add_semester(semester - 1, entry.get('previous_reported'), entry.get('previous_calculated'), 'previous')
+
+    def _add_semester(self, semester, reported, calculated, block):
+        reported, calculated = reported or {}, calculated or {}
+        wrong = [metric for metric in METRICS
+                 if reported.get(metric) and not is_values_match(calculated.get(metric, 0), reported[metric], metric)]
+        for metric in wrong:
+            key = f'{block} {metric}'
+            self.metrics[key] = self.metrics.get(key, 0) + 1
+        if semester is None:
+            return
+        counts = self.semesters.get(semester)
+        if counts is None:
+            counts = self.semesters[semester] = {'files': 0, 'mismatched': 0, 'metrics': {}}
+        counts['files'] += 1
+        counts['mismatched'] += bool(wrong)
+        for metric in wrong:
+            counts['metrics'][metric] = counts['metrics'].get(metric, 0) + 1
+
+    def summary(self):
+        """JSON-ready view of the totals, hotspots first"""
+        courses = [
+            {'course_code': code, 'files': course['files'], 'mismatched': course['mismatched'],
+             'mismatch_rate': round(course['mismatched'] / course['files'], 3),
+             'grades': dict(sorted(course['grades'].items(), key=lambda item: -item[1]))}
+            for code, course in self.courses.items()
+        ]
+        courses.sort(key=lambda course: (-course['mismatched'], -course['mismatch_rate'], course['course_code']))
+        return {
+            'files': self.files,
+            'courses': courses,
+            'metrics': dict(sorted(self.metrics.items(), key=lambda item: -item[1])),
+            'semesters': [dict(counts, semester=semester) for semester, counts in sorted(self.semesters.items())],
+            'student_types': [
+                dict(counts, student_type=student_type, failure_rate=round(counts['failed'] / counts['files'], 3))
+                for student_type, counts in sorted(self.student_types.items())
+            ],
+            'pipeline': self.pipeline
+        }
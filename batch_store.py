@@ -0,0 +1,48 @@
+import json
+import os
+import re
+import uuid
+
+BATCH_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class BatchStore:
+    """Bulk verification results kept on disk so later requests can refer to a batch"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, batch_id, kind=''):
+        return os.path.join(self.directory, f'{batch_id}{kind}.json')
+
+    def _write(self, path, payload):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _read(self, batch_id, kind=''):
+        if not BATCH_ID_PATTERN.match(batch_id):
+            return None
+        try:
+            with open(self._path(batch_id, kind), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, results, analytics=None):
+        """Store a batch's result rows (and its analytics summary) and return its id"""
+        batch_id = uuid.uuid4().hex
+        os.makedirs(self.directory, exist_ok=True)
+        if analytics is not None:
+            self._write(self._path(batch_id, '.analytics'), analytics)
+        self._write(self._path(batch_id), results)
+        return batch_id
+
+    def load(self, batch_id):
+        """Result rows of a batch, or None for an unknown id"""
+        return self._read(batch_id)
+
+    def load_analytics(self, batch_id):
+        """Analytics summary of a batch, or None if it has none"""
+        return self._read(batch_id, '.analytics')
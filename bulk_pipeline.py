@@ -0,0 +1,201 @@
+"""Stages of a bulk upload, run as a pipeline so disk and CPU work overlap.
+
+    read    hash the upload (and copy it to shared memory)       1 thread, keeps order
+    detect  drop duplicates, read the first page for the format  1 thread, keeps order
+    save    write the upload to the shared volume                BULK_IO_THREADS threads
+    verify  extraction and parsing in an isolated process        WORKERS threads
+            (job queue: BULK_QUEUE_IN_FLIGHT threads, each waiting on a queued job)
+    persist write in-memory uploads to disk, free the buffer     BULK_IO_THREADS threads
+
+Duplicate detection needs the files in upload order, so the stages before it
+have one thread each. Files from the job queue are verified wherever a node
+is free; in-memory files are saved after verification, as before.
+"""
+import os
+from werkzeug.utils import secure_filename
+from dedup import DuplicateDetector
+from extractors.pdf_buffer import SharedPDF
+from isolation import TIMEOUT, IsolatedOutcome
+from job_queue import DONE, get_node_queue
+from pipeline import Pipeline, Stage
+from scheduler import LANE_BULK, get_scheduler, submit_isolated
+from verification import empty_bulk_result, isolation_failure_result, read_first_page_text, verify_bulk_file
+
+DUPLICATE = 'duplicate'
+FAILED = 'failed'
+UNREADABLE = 'unreadable'
+
+
+class BulkFile:
+    """One uploaded file on its way through the stages"""
+
+    def __init__(self, index, upload):
+        self.index = index
+        self.upload = upload
+        self.filename = upload.filename
+        self.source = None           # saved path or SharedPDF
+        self.content_hash = None
+        self.saved_filename = None   # set once the file is (or will be) in the upload folder
+        self.first_page_text = None
+        self.state = None            # DUPLICATE, FAILED, UNREADABLE, or None while it is fine
+        self.duplicate = None        # (index of the original, kind)
+        self.result_data = None
+        self.stacks = None
+        self.error = None
+
+
+class BulkRun:
+    def __init__(self, config, extensions, profile=False):
+        self.config = config
+        self.extensions = extensions
+        self.profile = profile
+        self.detector = DuplicateDetector()
+        # Queued files may be verified on another node, so they go to the shared volume
+        self.in_memory = not config['JOB_QUEUE_DB']
+        if self.in_memory:
+            self.batch = get_scheduler(config['WORKERS']).new_batch()
+        self.verify_func = extensions['profiler'].wrap(verify_bulk_file) if profile else verify_bulk_file
+        self.stats = None
+
+    def pipeline(self):
+        io_threads = self.config['BULK_IO_THREADS']
+        return Pipeline([
+            Stage('read', self.read),
+            Stage('detect', self.detect),
+            Stage('save', self.save, 1 if self.in_memory else io_threads),
+            Stage('verify', self.verify,
+                  self.config['WORKERS'] if self.in_memory else self.config['BULK_QUEUE_IN_FLIGHT']),
+            Stage('persist', self.persist, io_threads if self.in_memory else 1)
+        ], self.config['BULK_PIPELINE_QUEUE'], on_error=self.failed, on_discard=self.discard)
+
+    def failed(self, item, exc):
+        item.state = FAILED
+        item.error = str(exc)
+        return item
+
+    def discard(self, item):
+        """Free the buffer of a file left behind by a cancelled run"""
+        if isinstance(item.source, SharedPDF):
+            item.source.release()
+            item.source = None
+
+    def read(self, item):
+        if self.in_memory:
+            # Parsed straight from shared memory; written to disk after verification
+            item.source = SharedPDF.from_stream(item.upload.stream)
+            item.content_hash = self.detector.hash_stream(item.source.open())
+        else:
+            item.content_hash = self.detector.hash_stream(item.upload.stream)
+        return item
+
+    def detect(self, item):
+        if item.state:
+            return item
+        # Identical bytes were already seen in this batch - link, don't reprocess
+        original_index = self.detector.find_exact(item.content_hash)
+        if original_index is not None:
+            item.state, item.duplicate = DUPLICATE, (original_index, 'exact')
+            return item
+
+        # Read first page to determine type
+        try:
+            item.first_page_text = read_first_page_text(item.source if self.in_memory else item.upload.stream)
+        except Exception as e:
+            self.detector.register(item.index, item.content_hash)
+            item.state = UNREADABLE
+            item.result_data = empty_bulk_result("❌ PDF Read Error", error=str(e))
+            return item
+
+        # Same marksheet re-exported under a different name
+        fingerprint = self.detector.text_fingerprint(item.first_page_text)
+        original_index = self.detector.find_similar(fingerprint)
+        if original_index is not None:
+            self.detector.register(original_index, item.content_hash)
+            item.state, item.duplicate = DUPLICATE, (original_index, 'text')
+            return item
+
+        self.detector.register(item.index, item.content_hash, fingerprint)
+        return item
+
+    def save(self, item):
+        if item.state in (DUPLICATE, FAILED):
+            return item
+        filename = secure_filename(item.filename)
+        if self.in_memory:
+            if self.config['PERSIST_UPLOADS']:
+                item.saved_filename = filename
+            return item
+        # Prefixed with the content hash, so that two uploads (from any node)
+        # sharing a name do not overwrite each other before they are verified
+        filename = f'{item.content_hash[:12]}-{filename}'
+        item.source = os.path.join(self.config['UPLOAD_FOLDER'], filename)
+        item.upload.stream.seek(0)
+        item.upload.save(item.source)
+        item.saved_filename = filename
+        if item.state != UNREADABLE:
+            self.extensions['thumbnails'].submit(item.source)
+        return item
+
+    def verify(self, item):
+        if item.state:
+            return item
+        if not self.in_memory:
+            # Any node sharing the queue may pick the file up, so the path must
+            # be valid on all of them (the upload folder is on the shared volume)
+            queue = get_node_queue(self.config)
+            batch = queue.enqueue_batch('verify_bulk_file', [(os.path.abspath(item.source), item.first_page_text)])
+            try:
+                state, result, error = queue.wait_batch(batch, timeout=self.config['JOB_QUEUE_WAIT'])[0]
+            except TimeoutError:
+                # No node finished it in time (or none is leasing); nobody will read a late result
+                message = f"Not verified by any node within {self.config['JOB_QUEUE_WAIT']:g}s"
+                queue.cancel_batch(batch, message)
+                item.result_data = isolation_failure_result(IsolatedOutcome(False, failure=TIMEOUT, message=message))
+                return item
+            item.result_data = result if state == DONE else empty_bulk_result("❌ Processing Error", error=error)
+            return item
+
+        # Each file runs in its own process under a time and memory budget, so a
+        # pathological PDF only costs its own slot while the rest keep going.
+        # Files go to the bulk lane, shared fairly with other running batches.
+        outcome = submit_isolated(self.config, LANE_BULK, self.verify_func, item.source,
+                                  item.first_page_text, batch=self.batch).result()
+        if not outcome.ok:
+            item.result_data = isolation_failure_result(outcome)
+        elif self.profile:
+            item.result_data, item.stacks = outcome.value
+        else:
+            item.result_data = outcome.value
+        return item
+
+    def persist(self, item):
+        """Write an in-memory upload to the upload folder, then free it
+
+        Its thumbnail is queued once the file is written, unless the PDF
+        could not be read.
+        """
+        if not isinstance(item.source, SharedPDF):
+            return item
+        path = os.path.join(self.config['UPLOAD_FOLDER'], item.saved_filename) if item.saved_filename else None
+        try:
+            if path and item.state not in (DUPLICATE, FAILED):
+                item.source.save(path)
+                if item.state != UNREADABLE:
+                    self.extensions['thumbnails'].submit(path)
+        except Exception as e:
+            # The verification result stands; only the report's PDF link is lost
+            print(f"Error saving upload {path}: {e}")
+            item.saved_filename = None
+        finally:
+            item.source.release()
+            item.source = None
+        return item
+
+    def run(self, uploaded_files):
+        """Yield each file's BulkFile as it leaves the last stage; the stage
+        counters are in ``stats`` once every file is through"""
+        pipeline = self.pipeline()
+        items = (BulkFile(index, upload) for index, upload in enumerate(uploaded_files))
+        # yield from passes close() on to the pipeline, which then cancels the run
+        yield from pipeline.run(items)
+        self.stats = pipeline.snapshot()
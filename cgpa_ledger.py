@@ -0,0 +1,197 @@
+"""Per-student ledger of semester figures for verifying cumulative CGPA.
+
+Every verified marksheet records its semester's reported credits and EGP
+under the student's id. The student's running totals are updated in the
+same transaction, so a new semester costs one row lookup and two writes
+however many marksheets came before it. A marksheet's printed cumulative
+credits, EGP and CGPA are then checked against the totals of semesters
+1..N without reopening any earlier PDF.
+"""
+import sqlite3
+import time
+from reconcile import STUDENT_ID_FIELDS, normalize_id
+from verification import is_values_match
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS semesters (
+    student TEXT NOT NULL,
+    semester INTEGER NOT NULL,
+    credits REAL NOT NULL,
+    egp REAL NOT NULL,
+    sgpa REAL NOT NULL,
+    source TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (student, semester)
+);
+CREATE TABLE IF NOT EXISTS students (
+    student TEXT PRIMARY KEY,
+    credits REAL NOT NULL,
+    egp REAL NOT NULL,
+    semesters INTEGER NOT NULL,
+    last_semester INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+# Cumulative check outcomes
+VERIFIED = 'verified'
+MISMATCH = 'mismatch'
+INCOMPLETE = 'incomplete'
+NOT_PRINTED = 'not_printed'
+NO_IDENTIFIER = 'no_identifier'
+
+
+def student_key(student_info):
+    """Ledger key of a marksheet's student, or None without an identifier"""
+    for field in STUDENT_ID_FIELDS:
+        if (student_info or {}).get(field):
+            return f'{field}:{normalize_id(student_info[field])}'
+    return None
+
+
+def semester_figures(result_data):
+    """(semester, credits, egp, sgpa) a bulk result reports, oldest first
+
+    A double semester marksheet also reports the semester before.
+    """
+    semester = (result_data.get('student_info') or {}).get('semester')
+    if not semester:
+        return []
+    figures = []
+    previous = result_data.get('previous_reported') or {}
+    if semester > 1 and previous.get('credits'):
+        figures.append((semester - 1, previous['credits'], previous.get('egp', 0), previous.get('sgpa', 0)))
+    current = result_data.get('reported') or {}
+    if current.get('credits'):
+        figures.append((semester, current['credits'], current.get('egp', 0), current.get('sgpa', 0)))
+    return figures
+
+
+class CGPALedger:
+    """SQLite ledger; safe to use from several threads and processes"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def record(self, student, figures, source=None):
+        """Store a student's semester figures, adjusting the running totals
+
+        Re-recording a semester (a re-issued marksheet) replaces it.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for semester, credits, egp, sgpa in figures:
+                old = conn.execute(
+                    'SELECT credits, egp FROM semesters WHERE student = ? AND semester = ?', (student, semester)
+                ).fetchone()
+                conn.execute(
+                    'INSERT OR REPLACE INTO semesters (student, semester, credits, egp, sgpa, source, updated) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (student, semester, credits, egp, sgpa, source, now)
+                )
+                old_credits, old_egp = old or (0, 0)
+                conn.execute(
+                    'INSERT INTO students (student, credits, egp, semesters, last_semester, updated) '
+                    'VALUES (?, ?, ?, 1, ?, ?) '
+                    'ON CONFLICT (student) DO UPDATE SET credits = credits + ?, egp = egp + ?, '
+                    'semesters = semesters + ?, last_semester = MAX(last_semester, ?), updated = ?',
+                    (student, credits, egp, semester, now,
+                     credits - old_credits, egp - old_egp, 0 if old else 1, semester, now)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def totals(self, student, semester):
+        """(semesters recorded, credits, egp) of semesters 1..``semester``"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT semesters, credits, egp, last_semester FROM students WHERE student = ?', (student,)
+            ).fetchone()
+            if row is None:
+                return 0, 0.0, 0.0
+            if row[3] <= semester:
+                # The usual case: the newest marksheet, read off the running totals
+                return row[0], row[1], row[2]
+            # An earlier semester's marksheet arrived after later ones
+            return conn.execute(
+                'SELECT COUNT(*), TOTAL(credits), TOTAL(egp) FROM semesters WHERE student = ? AND semester <= ?',
+                (student, semester)
+            ).fetchone()
+        finally:
+            conn.close()
+
+    def recorded_semesters(self, student):
+        conn = self._connect()
+        try:
+            return [row[0] for row in conn.execute(
+                'SELECT semester FROM semesters WHERE student = ? ORDER BY semester', (student,)
+            )]
+        finally:
+            conn.close()
+
+    def verify(self, student, semester, cumulative):
+        """Compare printed cumulative figures with the ledger's semesters 1..N"""
+        count, credits, egp = self.totals(student, semester)
+        report = {'semesters': count, 'of': semester}
+        if count < semester:
+            recorded = set(self.recorded_semesters(student))
+            report['status'] = INCOMPLETE
+            report['missing'] = [s for s in range(1, semester + 1) if s not in recorded]
+            return report
+
+        cgpa = round(egp / credits, 2) if credits else 0
+        report['credits'] = {'reported': cumulative['credits'], 'aggregated': credits,
+                             'match': is_values_match(credits, cumulative['credits'], 'credits')}
+        report['egp'] = {'reported': cumulative['egp'], 'aggregated': egp,
+                         'match': is_values_match(egp, cumulative['egp'], 'egp')}
+        report['cgpa'] = {'reported': cumulative['cgpa'], 'aggregated': cgpa,
+                          'match': is_values_match(cgpa, cumulative['cgpa'], 'sgpa')}
+        matched = all(report[key]['match'] for key in ('credits', 'egp', 'cgpa'))
+        report['status'] = VERIFIED if matched else MISMATCH
+        return report
+
+
+def check_cumulative(ledger, result_data):
+    """Cumulative verification of a bulk result already recorded in the ledger"""
+    info = result_data.get('student_info') or {}
+    student = student_key(info)
+    if student is None or not info.get('semester'):
+        return {'status': NO_IDENTIFIER}
+    cumulative = result_data.get('cumulative')
+    if not cumulative:
+        return {'status': NOT_PRINTED}
+    report = ledger.verify(student, info['semester'], cumulative)
+    # The printed CGPA should also follow from the printed totals
+    report['printed_consistent'] = is_values_match(
+        round(cumulative['egp'] / cumulative['credits'], 2), cumulative['cgpa'], 'sgpa'
+    )
+    if report['status'] == VERIFIED and not report['printed_consistent']:
+        report['status'] = MISMATCH
+    return report
+
+
+def record_results(ledger, results):
+    """Record a batch's semesters, then verify each result's cumulative figures
+
+    Recording the whole batch first lets a student's semesters arrive in
+    any order within it. Results with an error are not recorded.
+    """
+    for result_data in results:
+        student = student_key(result_data.get('student_info'))
+        figures = semester_figures(result_data)
+        if student and figures and not result_data.get('error') and not result_data.get('duplicate_of'):
+            ledger.record(student, figures, result_data.get('filename'))
+    return [check_cumulative(ledger, result_data) for result_data in results]
+
@@ -0,0 +1,271 @@
+"""Compressed cold storage for uploads that are no longer fresh.
+
+Recent uploads stay as plain files in the upload folder. When
+``ARCHIVE_AFTER_DAYS`` is set, a background pass moves PDFs older than that
+into ZIP bundles of up to ``ARCHIVE_BUNDLE_FILES`` members in the archive
+folder. A SQLite index maps
+each filename to its bundle. Reading an archived upload decompresses the
+member as it is streamed; nothing is extracted to disk.
+
+A pass writes the bundle under a temporary name, renames it into place,
+records it in the index and only then deletes the plain files. An
+interrupted pass therefore leaves every upload readable. A plain file, when
+present, always wins over the archived copy.
+
+Run a pass by hand (e.g. from cron) with:
+
+    python cold_storage.py archive --uploads uploads --older-than-days 30
+    python cold_storage.py status --uploads uploads
+"""
+import argparse
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+
+try:
+    import fcntl
+except ImportError:  # Windows; the archive lock then uses msvcrt
+    fcntl = None
+    import msvcrt
+
+def _try_lock(f):
+    """Take an exclusive lock on an open file without waiting; False if it is held"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    filename TEXT PRIMARY KEY,
+    bundle TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    compressed INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    archived REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_bundle ON files (bundle);
+"""
+
+COMPRESSION = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'lzma': zipfile.ZIP_LZMA,
+}
+CHUNK_SIZE = 64 * 1024
+
+
+class ArchivedFile:
+    def __init__(self, filename, bundle, size):
+        self.filename = filename
+        self.bundle = bundle
+        self.size = size
+
+
+class ColdStore:
+    """Plain upload folder in front of indexed, compressed archive bundles"""
+
+    def __init__(self, upload_folder, archive_folder, compression='deflated', bundle_files=500):
+        self.upload_folder = upload_folder
+        self.archive_folder = archive_folder
+        self.compression = COMPRESSION[compression]
+        self.bundle_files = bundle_files
+        os.makedirs(archive_folder, exist_ok=True)
+        self.db_path = os.path.join(archive_folder, 'index.db')
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def lookup(self, filename):
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT bundle, size FROM files WHERE filename = ?', (filename,)).fetchone()
+        finally:
+            conn.close()
+        return ArchivedFile(filename, *row) if row else None
+
+    def stream(self, archived, chunk_size=CHUNK_SIZE):
+        """Yield an archived upload's bytes, decompressing as they are read"""
+        with zipfile.ZipFile(os.path.join(self.archive_folder, archived.bundle)) as bundle:
+            with bundle.open(archived.filename) as member:
+                for chunk in iter(lambda: member.read(chunk_size), b''):
+                    yield chunk
+
+    def open_upload(self, path):
+        """Seekable binary file of an upload path, plain or archived"""
+        try:
+            return open(path, 'rb')
+        except FileNotFoundError:
+            archived = self.lookup(os.path.basename(path))
+            if archived is None:
+                raise
+        # Readers such as PyPDF2 seek around; marksheets are small enough to hold
+        return io.BytesIO(b''.join(self.stream(archived)))
+
+    def candidates(self, older_than):
+        """Plain PDFs in the upload folder last modified before ``older_than``"""
+        found = []
+        with os.scandir(self.upload_folder) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith('.pdf') or not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat()
+                if stat.st_mtime < older_than:
+                    found.append((entry.name, stat.st_size, stat.st_mtime))
+        return sorted(found, key=lambda item: item[2])
+
+    def archive(self, older_than_seconds):
+        """Move uploads older than the cutoff into bundles; returns files archived
+
+        Only one process archives at a time; others return 0 straight away.
+        """
+        lock = open(os.path.join(self.archive_folder, '.lock'), 'w')
+        try:
+            if not _try_lock(lock):
+                return 0
+            files = self.candidates(time.time() - older_than_seconds)
+            archived = 0
+            for start in range(0, len(files), self.bundle_files):
+                archived += self._archive_bundle(files[start:start + self.bundle_files])
+            return archived
+        finally:
+            lock.close()
+
+    def _archive_bundle(self, files):
+        bundle = f"bundle-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.zip"
+        path = os.path.join(self.archive_folder, bundle)
+        tmp_path = f'{path}.tmp'
+        rows = []
+        with zipfile.ZipFile(tmp_path, 'w', compression=self.compression) as archive:
+            for filename, size, mtime in files:
+                try:
+                    archive.write(os.path.join(self.upload_folder, filename), filename)
+                except OSError as e:
+                    print(f"Error archiving {filename}: {e}")
+                    continue
+                rows.append((filename, bundle, size, archive.getinfo(filename).compress_size, mtime, time.time()))
+        if not rows:
+            os.remove(tmp_path)
+            return 0
+        with open(tmp_path, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)', rows)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        for filename, _, _, _, mtime, _ in rows:
+            source = os.path.join(self.upload_folder, filename)
+            try:
+                # A file re-uploaded under the same name since it was read stays
+                if os.stat(source).st_mtime == mtime:
+                    os.remove(source)
+            except OSError:
+                pass
+        self._remove_empty_bundles()
+        return len(rows)
+
+    def _remove_empty_bundles(self):
+        """Delete bundles whose every member was archived again in a newer one"""
+        conn = self._connect()
+        try:
+            live = {row[0] for row in conn.execute('SELECT DISTINCT bundle FROM files')}
+        finally:
+            conn.close()
+        for name in os.listdir(self.archive_folder):
+            if name.startswith('bundle-') and name.endswith('.zip') and name not in live:
+                os.remove(os.path.join(self.archive_folder, name))
+
+    def status(self):
+        conn = self._connect()
+        try:
+            files, size, compressed, bundles = conn.execute(
+                'SELECT COUNT(*), TOTAL(size), TOTAL(compressed), COUNT(DISTINCT bundle) FROM files'
+            ).fetchone()
+        finally:
+            conn.close()
+        return {
+            'archived_files': files,
+            'bundles': bundles,
+            'original_bytes': int(size),
+            'compressed_bytes': int(compressed),
+            'ratio': round(compressed / size, 3) if size else None
+        }
+
+
+class Archiver:
+    """Background thread running an archive pass every ``interval`` seconds"""
+
+    def __init__(self, store, older_than_seconds, interval):
+        self.store = store
+        self.older_than_seconds = older_than_seconds
+        self.interval = interval
+
+    def _run(self):
+        while True:
+            try:
+                self.store.archive(self.older_than_seconds)
+            except Exception as e:
+                print(f"Error archiving uploads: {e}")
+            time.sleep(self.interval)
+
+    def start(self):
+        threading.Thread(target=self._run, name='upload-archiver', daemon=True).start()
+        return self
+
+
+_archiver_pid = None
+_archiver_lock = threading.Lock()
+
+
+def ensure_archiver(store, config):
+    """Start this process's archiver once, lazily, like the scheduler's workers"""
+    global _archiver_pid
+    if config['ARCHIVE_AFTER_DAYS'] <= 0 or _archiver_pid == os.getpid():
+        return
+    with _archiver_lock:
+        if _archiver_pid != os.getpid():
+            Archiver(store, config['ARCHIVE_AFTER_DAYS'] * 86400, config['ARCHIVE_INTERVAL']).start()
+            _archiver_pid = os.getpid()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['archive', 'status'])
+    parser.add_argument('--uploads', default='uploads')
+    parser.add_argument('--archive', help='archive folder (default: <uploads>/archive)')
+    parser.add_argument('--older-than-days', type=float, default=float(os.environ.get('ARCHIVE_AFTER_DAYS', 0)),
+                        help='required for archive unless ARCHIVE_AFTER_DAYS is set')
+    parser.add_argument('--compression', choices=sorted(COMPRESSION), default=os.environ.get('ARCHIVE_COMPRESSION', 'deflated'))
+    parser.add_argument('--bundle-files', type=int, default=int(os.environ.get('ARCHIVE_BUNDLE_FILES', 500)))
+    args = parser.parse_args()
+    if args.command == 'archive' and args.older_than_days <= 0:
+        parser.error('archive needs --older-than-days (or ARCHIVE_AFTER_DAYS) greater than 0')
+
+    store = ColdStore(args.uploads, args.archive or os.path.join(args.uploads, 'archive'),
+                      args.compression, args.bundle_files)
+    if args.command == 'archive':
+        print(f'archived {store.archive(args.older_than_days * 86400)} file(s)')
+    print(json.dumps(store.status(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
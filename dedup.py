@@ -0,0 +1,62 @@
+import hashlib
+import re
+
+
+class DuplicateDetector:
+    """Detect repeated marksheets inside a single bulk batch.
+
+    Two levels are checked:
+      * an exact SHA-256 of the uploaded bytes, which is known before the
+        file is saved or parsed, and
+      * a fingerprint of the first page's text layer, which catches the same
+        marksheet re-exported or re-saved under a different byte layout.
+    """
+
+    def __init__(self):
+        self.by_hash = {}
+        self.by_fingerprint = {}
+
+    @staticmethod
+    def hash_stream(stream, chunk_size=64 * 1024):
+        """Hash a file-like object and rewind it so it can still be saved"""
+        digest = hashlib.sha256()
+        stream.seek(0)
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            digest.update(chunk)
+        stream.seek(0)
+        return digest.hexdigest()
+
+    @staticmethod
+    def text_fingerprint(text):
+        """Order-insensitive fingerprint of the first page text"""
+        if not text:
+            return None
+        tokens = re.findall(r'[a-z0-9\.\+]+', text.lower())
+        # Too little text (e.g. a scanned page) would collide across students
+        if len(tokens) < 10:
+            return None
+        return hashlib.sha1(' '.join(sorted(tokens)).encode('utf-8')).hexdigest()
+
+    def find_exact(self, content_hash):
+        return self.by_hash.get(content_hash)
+
+    def find_similar(self, fingerprint):
+        if fingerprint is None:
+            return None
+        return self.by_fingerprint.get(fingerprint)
+
+    def register(self, index, content_hash, fingerprint=None):
+        """Remember that results[index] holds the result for this document"""
+        self.by_hash.setdefault(content_hash, index)
+        if fingerprint is not None:
+            self.by_fingerprint.setdefault(fingerprint, index)
+
+
+def duplicate_entry(filename, original, original_index, kind):
+    """Build a bulk result entry that points at an earlier, already processed one"""
+    entry = dict(original)
+    entry['filename'] = filename
+    entry['duplicate_of'] = original['filename']
+    entry['duplicate_index'] = original_index
+    entry['duplicate_kind'] = kind
+    return entry
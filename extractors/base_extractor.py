@@ -1,23 +1,408 @@
+import os
 import pdfplumber
+import PyPDF2
 import re
+import threading
+import time
+from .layout_templates import DEFAULT_COLUMN_LABELS, FAIL_GRADES, layout_lines, layout_page_lines
+from . import course_catalog, parse_trace, table_profiles
+from .ocr import extract_text_ocr
+from .pdf_buffer import pdf_input
+from .page_ir import (
+    LINES_OCR, LINES_PYPDF2, LINES_TEXT_LAYER, PAGE_IR_DIR,
+    PageIR, build_page_ir, file_digest, page_ir_path
+)
+
+# Extraction ladder rungs, cheapest first
+RUNG_PYPDF2 = 'pypdf2_text'
+RUNG_TEXT_LAYER = 'text_layer'
+RUNG_LAYOUT = 'layout'
+RUNG_TABLES = 'tables'
+RUNG_OCR = 'ocr'
+
+ROMAN_NUMERALS = {'I': 1, 'V': 5, 'X': 10}
+
+
+def semester_number(value):
+    """Semester as an int from "IV", "4" or "Sem-4"; None if unreadable"""
+    value = re.sub(r'[^0-9IVX]', '', str(value or '').upper())
+    if value.isdigit():
+        return int(value)
+    if not value or value.strip('IVX'):
+        return None
+    total = 0
+    for i, numeral in enumerate(value):
+        number = ROMAN_NUMERALS[numeral]
+        if i + 1 < len(value) and ROMAN_NUMERALS[value[i + 1]] > number:
+            total -= number
+        else:
+            total += number
+    return total
+
+
+class ExtractionStats:
+    """Process-wide counters of which ladder rung documents were accepted on"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.documents = 0
+        self.escalations = 0
+        self.accepted_by_rung = {}
+        self.attempts_by_rung = {}
+        self.seconds_by_rung = {}
+        self.catalog = {}
+
+    def record(self, metrics):
+        if not metrics:
+            return
+        with self.lock:
+            self.documents += 1
+            self.escalations += len(metrics['attempts']) - 1
+            for attempt in metrics['attempts']:
+                rung = attempt['rung']
+                self.attempts_by_rung[rung] = self.attempts_by_rung.get(rung, 0) + 1
+                self.seconds_by_rung[rung] = self.seconds_by_rung.get(rung, 0.0) + attempt['seconds']
+            if metrics['accepted']:
+                rung = metrics['rung']
+                self.accepted_by_rung[rung] = self.accepted_by_rung.get(rung, 0) + 1
+            for key, count in (metrics.get('catalog') or {}).items():
+                self.catalog[key] = self.catalog.get(key, 0) + count
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'documents': self.documents,
+                'escalations': self.escalations,
+                'accepted_by_rung': dict(self.accepted_by_rung),
+                'attempts_by_rung': dict(self.attempts_by_rung),
+                'seconds_by_rung': {k: round(v, 4) for k, v in self.seconds_by_rung.items()},
+                'catalog': dict(self.catalog)
+            }
+
+
+extraction_stats = ExtractionStats()
+
 
 class BaseExtractor:
+    # Tried in order until the parsed result verifies; the last rung's
+    # result is returned even when it does not. Documents without a text
+    # layer (scans) skip the layout and table rungs and go to OCR, which is
+    # never tried for documents that have one.
+    extraction_ladder = (RUNG_PYPDF2, RUNG_TEXT_LAYER, RUNG_LAYOUT, RUNG_TABLES, RUNG_OCR)
+
+    # Header words locating the course table columns for the layout rung
+    layout_labels = DEFAULT_COLUMN_LABELS
+
+    # pdfplumber table finder settings for the table rung, unless
+    # scripts/tune_tables.py wrote a profile for the format
+    table_settings = {
+        "vertical_strategy": "lines", 
+        "horizontal_strategy": "lines",
+        "snap_tolerance": 3
+    }
+
+    # Header fields identifying the student, tried in this order when joining
+    # results against a roster
+    student_id_patterns = (
+        ('prn', re.compile(r'\bPRN\s*(?:No\.?)?\s*[:\-]?\s*([A-Z0-9]{6,20})\b', re.IGNORECASE)),
+        ('roll_number', re.compile(r'\bRoll\s*(?:No\.?|Number)\s*[:\-]?\s*([A-Z0-9][A-Z0-9/\-]{0,19})', re.IGNORECASE)),
+        ('seat_number', re.compile(r'\bSeat\s*(?:No\.?|Number)\s*[:\-]?\s*([A-Z0-9]{2,20})\b', re.IGNORECASE)),
+        ('enrollment_number', re.compile(r'\bEnrol{1,2}ment\s*(?:No\.?|Number)\s*[:\-]?\s*([A-Z0-9]{4,20})\b', re.IGNORECASE)),
+    )
+    student_name_pattern = re.compile(
+        r'\b(?:Student\s*)?Name(?:\s+of\s+(?:the\s+)?Student)?\s*[:\-]\s*([A-Za-z][A-Za-z .\']*?)\s*(?:$|\s{2,}|PRN\b|Roll\b|Seat\b)',
+        re.IGNORECASE | re.MULTILINE
+    )
+    # Marksheets spell the cumulative block both ways
+    cumulative_markers = ('Cumulative Performance', 'Cummulative Performance')
+    cumulative_end_markers = ('Remarks', 'Grade Card No', 'Result', 'Date')
+    semester_pattern = re.compile(r'\bSemester\s*:\s*([IVX]+|\d{1,2})\b', re.IGNORECASE)
+
     def __init__(self):
         self.courses = []
         self.student_type = "Unknown"
+        # ParseTrace of the document being processed, or None when not tracing
+        self.trace = None
+        # Course catalog (None without one) and this document's lookup counts
+        self.catalog = course_catalog.catalog
+        self.catalog_stats = self.new_catalog_stats()
+
+    def extract_text_pypdf2(self, pdf_path):
+        """Cheapest pass: PyPDF2's text of every page"""
+        full_text = ""
+        try:
+            for page in PyPDF2.PdfReader(pdf_input(pdf_path)).pages:
+                text = page.extract_text()
+                if text:
+                    full_text += text + "\n"
+        except Exception as e:
+            print(f"Error extracting PDF text: {e}")
+        return full_text
+
+    def extract_text_layer(self, pdf_path):
+        """pdfplumber text layer only, without table detection"""
+        full_text = ""
+        try:
+            with pdfplumber.open(pdf_input(pdf_path)) as pdf:
+                for page in pdf.pages:
+                    text = page.extract_text()
+                    if text:
+                        full_text += text + "\n"
+        except Exception as e:
+            print(f"Error extracting PDF text: {e}")
+        return full_text
+
+    def extract_text_layout(self, pdf_path):
+        """Course rows read by column bounding boxes, without table detection
+
+        Returns an empty string when no page has a recognisable course table
+        header, so the ladder moves straight on to table extraction.
+        """
+        full_text = ""
+        template = None
+        try:
+            with pdfplumber.open(pdf_input(pdf_path)) as pdf:
+                for page in pdf.pages:
+                    lines, template = layout_page_lines(
+                        page, self.student_type, template, self.layout_labels, self.is_valid_course_code
+                    )
+                    full_text += '\n'.join(lines) + "\n"
+        except Exception as e:
+            print(f"Error extracting PDF layout: {e}")
+            return ""
+        return full_text if template is not None else ""
+
+    def extract_text_ocr(self, pdf_path):
+        """OCR fallback for scanned marksheets (needs pytesseract and tesseract)"""
+        try:
+            return extract_text_ocr(pdf_path)
+        except Exception as e:
+            print(f"Error running OCR: {e}")
+            return ""
+
+    def extract_text_from_ir(self, rung, ir):
+        """Rebuild a rung's text from a stored page representation"""
+        if rung == RUNG_PYPDF2:
+            return ir.text(LINES_PYPDF2)
+        if rung == RUNG_TEXT_LAYER:
+            return ir.text(LINES_TEXT_LAYER)
+        if rung == RUNG_OCR:
+            return ir.text(LINES_OCR)
+
+        full_text = ""
+        template = None
+        for page in range(ir.page_count):
+            if rung == RUNG_LAYOUT:
+                lines, template = layout_lines(
+                    ir.words(page), ir.page_size(page)[0], self.student_type, template,
+                    self.layout_labels, self.is_valid_course_code
+                )
+                full_text += '\n'.join(lines) + "\n"
+                continue
+            for table in ir.tables(page):
+                for row in table:
+                    full_text += ' | '.join(row) + "\n"
+            lines = ir.lines(page, LINES_TEXT_LAYER)
+            if lines:
+                full_text += '\n'.join(lines) + "\n"
+        if rung == RUNG_LAYOUT and template is None:
+            return ""
+        return full_text
+
+    def extract_text_for_rung(self, rung, pdf_path):
+        if isinstance(pdf_path, PageIR):
+            return self.extract_text_from_ir(rung, pdf_path)
+        if rung == RUNG_PYPDF2:
+            return self.extract_text_pypdf2(pdf_path)
+        if rung == RUNG_TEXT_LAYER:
+            return self.extract_text_layer(pdf_path)
+        if rung == RUNG_LAYOUT:
+            return self.extract_text_layout(pdf_path)
+        if rung == RUNG_OCR:
+            return self.extract_text_ocr(pdf_path)
+        return self.extract_text_from_pdf(pdf_path)
+
+    def extract_student_info(self, text):
+        """Identifiers, name and semester from the marksheet header
+
+        Only the fields that were found are returned. A double semester
+        marksheet names both semesters; the later one is reported.
+        """
+        info = {}
+        for field, pattern in self.student_id_patterns:
+            match = pattern.search(text)
+            if match:
+                info[field] = match.group(1).strip().upper()
+        match = self.student_name_pattern.search(text)
+        if match and match.group(1).strip():
+            info['name'] = ' '.join(match.group(1).split())
+        semesters = [semester_number(m) for m in self.semester_pattern.findall(text)]
+        semesters = [s for s in semesters if s]
+        if semesters:
+            info['semester'] = max(semesters)
+        return info
+
+    def extract_cumulative_performance(self, text):
+        """Printed cumulative credits, EGP and CGPA, or None if not on the marksheet
+
+        The figures are the last three numbers of the first line under the
+        cumulative heading that has at least three.
+        """
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            if not any(marker in line for marker in self.cumulative_markers):
+                continue
+            for j in range(i, min(i + 6, len(lines))):
+                data_line = lines[j].strip()
+                if j > i and any(marker in data_line for marker in self.cumulative_end_markers):
+                    break
+                numbers = re.findall(r'\d+\.?\d*', data_line)
+                if len(numbers) < 3:
+                    continue
+                credits, egp, cgpa = (float(n) for n in numbers[-3:])
+                if self.trace:
+                    self.trace.at(j, data_line)
+                    self.trace.event('cumulative_numbers', numbers=numbers)
+                if credits > 0 and 0 < cgpa <= 10:
+                    return {'credits': credits, 'egp': egp, 'cgpa': cgpa}
+            break
+        return None
+
+    def process_text(self, text):
+        """Parse and verify extracted text; implemented by each format"""
+        raise NotImplementedError
+
+    def is_result_consistent(self, result, text=''):
+        """A cheap rung is trusted only if courses were found, all totals verify
+        and no course row of its text was dropped
+
+        Earned-credit totals cannot notice a dropped failed row (it earns
+        nothing), so the course codes on the text's course rows are compared
+        with the courses parsed from it.
+        """
+        if not result.get('all_courses') or not str(result.get('status', '')).startswith('✅'):
+            return False
+        return not self.missing_course_rows(result, text)
+
+    def listed_course_codes(self, text):
+        """Codes of the lines that look like course rows: a course code and a grade"""
+        codes = set()
+        for line in text.split('\n'):
+            match = re.search(r'\b([A-Z]{2,4}\d{3,4}[A-Z]?|CC\d+)\*?', line)
+            if match and any(self.is_valid_grade(token) for token in re.split(r'[\s|]+', line)):
+                codes.add(match.group(1))
+        return codes
+
+    def missing_course_rows(self, result, text):
+        """Codes of course rows in the text that the result has no course for"""
+        parsed = {course['course_code'].rstrip('*') for course in result.get('all_courses', [])}
+        # "CS1014": a credit digit merged into the code, parsed as CS101
+        return sorted(code for code in self.listed_course_codes(text)
+                      if code not in parsed and code[:-1] not in parsed)
+
+    def active_table_settings(self):
+        """Table finder settings in use: the format's tuned profile, else the class default"""
+        return table_profiles.settings_for(self.student_type, self.table_settings)
+
+    def load_page_ir(self, pdf_path):
+        """Stored page representation of a PDF, built on first use
+
+        Building it runs every extraction pass, tables included, so a cache
+        miss costs more than the cheap-first ladder would on the PDF itself.
+        """
+        table_settings = self.active_table_settings()
+        path = page_ir_path(file_digest(pdf_path), table_settings)
+        if not os.path.exists(path):
+            build_page_ir(pdf_path, table_settings).write(path)
+        return PageIR(path)
+
+    def process_pdf(self, pdf_path):
+        """Verify a PDF, through its cached page representation when PAGE_IR_DIR is set"""
+        if PAGE_IR_DIR:
+            with self.load_page_ir(pdf_path) as ir:
+                return self.process_source(ir)
+        return self.process_source(pdf_path)
+
+    def process_ir(self, ir):
+        """Verify a document straight from its page representation, without the PDF"""
+        return self.process_source(ir)
+
+    def process_source(self, source):
+        """Run the extraction ladder, escalating only when the result looks wrong
+
+        ``source`` is a PDF path, a SharedPDF or a PageIR.
+        """
+        attempts = []
+        result = None
+        started = time.perf_counter()
+        if parse_trace.enabled:
+            document = source.digest if isinstance(source, PageIR) else file_digest(source)
+            self.trace = parse_trace.ParseTrace(document, self.student_type)
+
+        no_text_layer = False
+        self.catalog_stats = self.new_catalog_stats()
+        # Header fields from the first rung that found them; later rungs
+        # (layout, tables) often drop the header lines
+        student_info = {}
+        cumulative = None
+
+        for rung in self.extraction_ladder:
+            if rung in (RUNG_LAYOUT, RUNG_TABLES) and no_text_layer:
+                continue
+            if rung == RUNG_OCR and not no_text_layer:
+                continue
+            rung_start = time.perf_counter()
+            if self.trace:
+                self.trace.start_rung(rung)
+            text = self.extract_text_for_rung(rung, source)
+            if rung == RUNG_TEXT_LAYER and not text.strip():
+                no_text_layer = True
+            result = self.process_text(text)
+            student_info = {**self.extract_student_info(text), **student_info}
+            cumulative = cumulative or self.extract_cumulative_performance(text)
+            accepted = self.is_result_consistent(result, text)
+            attempts.append({
+                'rung': rung,
+                'seconds': round(time.perf_counter() - rung_start, 4),
+                'courses': len(result.get('all_courses', [])),
+                'accepted': accepted
+            })
+            if self.trace:
+                self.trace.at(None, None)
+                self.trace.event('rung_result', courses=attempts[-1]['courses'], accepted=accepted,
+                                 status=result.get('status'))
+            if accepted:
+                break
+
+        metrics = {
+            'rung': attempts[-1]['rung'],
+            'accepted': attempts[-1]['accepted'],
+            'seconds': round(time.perf_counter() - started, 4),
+            'attempts': attempts
+        }
+        if self.catalog is not None:
+            metrics['catalog'] = self.catalog_stats
+        result['extraction'] = metrics
+        result['student_info'] = student_info
+        result['cumulative'] = cumulative
+        extraction_stats.record(metrics)
+        if self.trace:
+            result['parse_trace'] = self.trace.to_dict()
+            self.trace = None
+        return result
 
     def extract_text_from_pdf(self, pdf_path):
         """Extract text with better table handling"""
         full_text = ""
+        table_settings = self.active_table_settings()
         try:
-            with pdfplumber.open(pdf_path) as pdf:
+            with pdfplumber.open(pdf_input(pdf_path)) as pdf:
                 for page in pdf.pages:
                     # Extract tables
-                    tables = page.extract_tables({
-                        "vertical_strategy": "lines", 
-                        "horizontal_strategy": "lines",
-                        "snap_tolerance": 3
-                    })
+                    tables = table_profiles.extract_tables(page, table_settings)
                     
                     for table in tables:
                         for row in table:
@@ -56,6 +441,8 @@ class BaseExtractor:
         if not code:
             return False
         code = code.upper().strip()
+        if self.catalog is not None and code in self.catalog:
+            return True
         patterns = [
             r'^[A-Z]{2,4}\d{3,4}[A-Z]?\*?$',
             r'^[A-Z]{2,4}-\d{3,4}[A-Z]?\*?$',
@@ -66,20 +453,32 @@ class BaseExtractor:
     def extract_course_smart(self, line):
         """Smart course extraction using multiple strategies"""
         # Strategy 1: Look for course code first
+        trace = self.trace
         code_match = re.search(r'([A-Z]{2,4}\d{3,4}[A-Z]?\*?|CC\d+)', line)
         if not code_match:
+            if trace:
+                trace.event('rejected', reason='no course code')
             return None
             
         course_code = code_match.group(1).upper()
+        entry = None
+        if self.catalog is not None:
+            course_code, line, entry = self.match_catalog_code(course_code, line)
         
         # Strategy 2: Find grade using multiple approaches
         grade = self.find_grade_in_line(line)
         if not grade:
+            if trace:
+                trace.event('rejected', reason='no grade', course_code=course_code)
             return None
         
         # Strategy 3: Extract credit numbers using robust approach
         credit_data = self.extract_credit_data(line)
+        if entry is not None:
+            credit_data = self.catalog_credit_data(entry, line, credit_data, grade)
         if not credit_data:
+            if trace:
+                trace.event('rejected', reason='no credits', course_code=course_code, grade=grade)
             return None
             
         credit, earned = credit_data
@@ -93,6 +492,9 @@ class BaseExtractor:
                 'grade': grade
             }
         
+        if trace:
+            trace.event('rejected', reason='failed validation', course_code=course_code,
+                        credit=credit, earned=earned, grade=grade)
         return None
 
     def find_grade_in_line(self, line):
@@ -148,6 +550,90 @@ class BaseExtractor:
         
         return None
 
+    @staticmethod
+    def course_grades(result):
+        """[course code, grade] pairs of a result, the part bulk analytics needs"""
+        return [[course['course_code'], course['grade']] for course in result.get('all_courses', [])]
+
+    @staticmethod
+    def new_catalog_stats():
+        return {'hits': 0, 'misses': 0, 'corrected': 0, 'recovered': 0}
+
+    @property
+    def catalog_scheme(self):
+        return 'Non-NEP' if self.student_type.startswith('Non-NEP') else 'NEP'
+
+    def catalog_entry(self, code):
+        """Catalog entry of a course code, counting the hit or miss"""
+        entry = self.catalog.lookup(code, self.catalog_scheme)
+        self.catalog_stats['hits' if entry else 'misses'] += 1
+        return entry
+
+    def match_catalog_code(self, course_code, line):
+        """Look a row's course code up, undoing a credit digit merged into it
+
+        Returns (course_code, line, entry); entry is None for unknown codes.
+        """
+        entry = self.catalog_entry(course_code)
+        if entry is None and course_code[-1:].isdigit():
+            # "CS1014 4 A": the credits cell ran into a three digit code
+            merged = self.catalog.lookup(course_code[:-1], self.catalog_scheme)
+            if merged is not None:
+                line = line.replace(course_code, f'{course_code[:-1]} {course_code[-1]}', 1)
+                self.catalog_stats['recovered'] += 1
+                if self.trace:
+                    self.trace.event('catalog_recovered', course_code=merged.code, reason='credit merged into code')
+                return course_code[:-1], line, merged
+        return course_code, line, entry
+
+    def catalog_credit_data(self, entry, line, credit_data, grade):
+        """(credit, earned) of a catalog course, taking the credits from the catalog
+
+        Earned credits are the number after the catalog credits on the line
+        (looking inside "44"-style merged cells if need be); without one they
+        follow from the grade.
+        """
+        if credit_data and credit_data[0] == entry.credits:
+            return credit_data
+        credit = entry.credits
+        earned = 0.0 if grade in FAIL_GRADES else credit
+        tokens = re.findall(r'\b\d+\.?\d*\b', line)
+        for split_merged in (False, True):
+            numbers = []
+            for token in tokens:
+                if split_merged and len(token) == 2 and int(token[0]) <= 5 and int(token[1]) <= 5:
+                    numbers.extend((float(token[0]), float(token[1])))
+                elif 0 <= float(token) <= 5:
+                    numbers.append(float(token))
+            if credit in numbers:
+                index = numbers.index(credit)
+                if index + 1 < len(numbers) and numbers[index + 1] <= credit:
+                    earned = numbers[index + 1]
+                break
+        self.catalog_stats['corrected'] += 1
+        if self.trace:
+            self.trace.event('catalog_corrected', course_code=entry.code, parsed=list(credit_data or ()),
+                             credit=credit, earned=earned)
+        return credit, earned
+
+    def recover_split_row(self, line, next_line):
+        """A catalog course whose row was split over two lines, or None
+
+        Only tried when ``line`` alone did not parse and ``next_line`` does
+        not start another course.
+        """
+        if self.catalog is None or re.search(r'[A-Z]{2,4}\d{3,4}', next_line):
+            return None
+        code_match = re.search(r'([A-Z]{2,4}\d{3,4}[A-Z]?\*?|CC\d+)', line)
+        if not code_match or code_match.group(1) not in self.catalog:
+            return None
+        course = self.extract_course_smart(f'{line} {next_line}')
+        if course:
+            self.catalog_stats['recovered'] += 1
+            if self.trace:
+                self.trace.event('catalog_recovered', course_code=course['course_code'], reason='row split over two lines')
+        return course
+
     def is_valid_course_data(self, code, credit, earned, grade):
         """Validate course data"""
         if not self.is_valid_course_code(code):
@@ -0,0 +1,112 @@
+"""Optional catalog of the college's courses: code -> credits, semester, scheme.
+
+With a catalog, a course code seen in a marksheet row is looked up in a dict
+instead of being matched against the code patterns, its credits come from the
+catalog rather than from whichever small numbers are on the line, and rows
+whose cells were merged or split by text extraction can be put back together.
+
+The catalog is a CSV with ``code`` and ``credits`` columns and optional
+``semester``, ``scheme`` (NEP / Non-NEP) and ``name`` columns, or a JSON list
+of objects with the same keys. Point COURSE_CATALOG at it; by default
+``extractors/course_catalog.csv`` is used when it exists.
+"""
+import csv
+import json
+import os
+import re
+
+CATALOG_PATH = os.environ.get(
+    'COURSE_CATALOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'course_catalog.csv')
+)
+
+
+def normalize_code(code):
+    """Catalog key of a course code: "cs-101*" and "CS101" are the same course"""
+    return re.sub(r'[\s\-*]', '', str(code or '')).upper()
+
+
+def normalize_scheme(scheme):
+    scheme = re.sub(r'[^a-z]', '', str(scheme or '').lower())
+    if not scheme:
+        return None
+    return 'Non-NEP' if scheme.startswith('non') else 'NEP'
+
+
+class CourseEntry:
+    __slots__ = ('code', 'credits', 'semester', 'scheme', 'name')
+
+    def __init__(self, code, credits, semester=None, scheme=None, name=''):
+        self.code = code
+        self.credits = credits
+        self.semester = semester
+        self.scheme = scheme
+        self.name = name
+
+    def to_dict(self):
+        return {'code': self.code, 'credits': self.credits, 'semester': self.semester,
+                'scheme': self.scheme, 'name': self.name}
+
+
+class CourseCatalog:
+    """Hash index of catalog courses
+
+    A code offered under both schemes with different credits has an entry
+    per scheme; ``lookup`` prefers the entry of the marksheet's scheme.
+    """
+
+    def __init__(self, entries=()):
+        self.by_scheme = {}
+        self.by_code = {}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self.by_code)
+
+    def __contains__(self, code):
+        return normalize_code(code) in self.by_code
+
+    def add(self, entry):
+        key = normalize_code(entry.code)
+        self.by_scheme[(key, entry.scheme)] = entry
+        self.by_code.setdefault(key, entry)
+
+    def lookup(self, code, scheme=None):
+        key = normalize_code(code)
+        return self.by_scheme.get((key, scheme)) or self.by_code.get(key)
+
+    @classmethod
+    def from_rows(cls, rows):
+        catalog = cls()
+        for row in rows:
+            row = {re.sub(r'[^a-z]', '', str(k).lower()): v for k, v in row.items()}
+            code = row.get('code') or row.get('coursecode')
+            credits = row.get('credits', row.get('credit'))
+            if not code or credits in (None, ''):
+                continue
+            try:
+                credits = float(credits)
+            except (TypeError, ValueError):
+                print(f"Error in course catalog: credits {credits!r} of {code} is not a number")
+                continue
+            catalog.add(CourseEntry(
+                normalize_code(code), credits,
+                str(row.get('semester') or '').strip().upper() or None,
+                normalize_scheme(row.get('scheme')),
+                str(row.get('name') or row.get('coursename') or '').strip()
+            ))
+        return catalog
+
+    @classmethod
+    def load(cls, path):
+        """Catalog from a CSV or JSON file, or None when there is no file"""
+        if not path or not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            if path.lower().endswith('.json'):
+                return cls.from_rows(json.load(f))
+            return cls.from_rows(csv.DictReader(f))
+
+
+# Loaded at import so forked verification workers share it
+catalog = CourseCatalog.load(CATALOG_PATH)
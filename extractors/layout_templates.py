@@ -0,0 +1,180 @@
+import json
+import os
+import re
+
+# Header words that identify the course table columns we need
+DEFAULT_COLUMN_LABELS = {
+    'course_code': ('Code',),
+    'credit': ('Credits', 'Credit'),
+    'earned': ('Earned',),
+    'grade': ('Grade',)
+}
+
+# Grades that earn no credits
+FAIL_GRADES = ('F', 'FF', 'U', 'UU')
+
+ROW_TOLERANCE = 3      # words whose tops differ by less than this share a row
+HEADER_CELL_GAP = 6    # wider gaps between header words start a new header cell
+
+
+def group_rows(words, tolerance=ROW_TOLERANCE):
+    """Group pdfplumber words into visual rows, top to bottom, left to right"""
+    rows = []
+    for word in sorted(words, key=lambda w: (round(w['top']), w['x0'])):
+        if rows and abs(word['top'] - rows[-1][0]['top']) <= tolerance:
+            rows[-1].append(word)
+        else:
+            rows.append([word])
+    return [sorted(row, key=lambda w: w['x0']) for row in rows]
+
+
+def row_text(row):
+    return ' '.join(word['text'] for word in row)
+
+
+class LayoutTemplate:
+    """Column x-ranges of the course table for one marksheet format"""
+
+    def __init__(self, name, columns):
+        self.name = name
+        # {'course_code': (x0, x1), 'credit': ..., 'earned': ..., 'grade': ...}
+        self.columns = {key: tuple(bounds) for key, bounds in columns.items()}
+
+    @classmethod
+    def learn(cls, name, header_row, labels=DEFAULT_COLUMN_LABELS, page_width=None):
+        """Derive column ranges from the words of a table header row
+
+        Header words are merged into cells, and each cell owns the space up
+        to the middle of the gap to its neighbours. Returns None when the
+        row does not name every required column.
+        """
+        cells = []
+        for word in header_row:
+            if cells and word['x0'] - cells[-1]['x1'] <= HEADER_CELL_GAP:
+                cells[-1]['x1'] = word['x1']
+                cells[-1]['words'].append(word['text'])
+            else:
+                cells.append({'x0': word['x0'], 'x1': word['x1'], 'words': [word['text']]})
+
+        bounds = []
+        for i, cell in enumerate(cells):
+            left = 0 if i == 0 else (cells[i - 1]['x1'] + cell['x0']) / 2
+            if i == len(cells) - 1:
+                right = page_width or float('inf')
+            else:
+                right = (cell['x1'] + cells[i + 1]['x0']) / 2
+            bounds.append((left, right))
+
+        columns = {}
+        for key, names in labels.items():
+            for cell, cell_bounds in zip(cells, bounds):
+                if key not in columns and any(name in cell['words'] for name in names):
+                    columns[key] = cell_bounds
+            if key not in columns:
+                return None
+        return cls(name, columns)
+
+    def is_header(self, row, labels=DEFAULT_COLUMN_LABELS):
+        words = {word['text'] for word in row}
+        return all(any(name in words for name in names) for names in labels.values())
+
+    def read_row(self, row):
+        """Split a row's words into the template columns by their x-centre"""
+        cells = {key: [] for key in self.columns}
+        for word in row:
+            centre = (word['x0'] + word['x1']) / 2
+            for key, (x0, x1) in self.columns.items():
+                if x0 <= centre < x1:
+                    cells[key].append(word['text'])
+                    break
+        return {key: ' '.join(parts) for key, parts in cells.items()}
+
+    def to_dict(self):
+        return {'columns': {key: [round(x, 1) for x in bounds] for key, bounds in self.columns.items()}}
+
+
+class LayoutTemplateRegistry:
+    """Declared templates per format, optionally loaded from a JSON file"""
+
+    def __init__(self, templates=None):
+        self.templates = dict(templates or {})
+
+    @classmethod
+    def load(cls, path):
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            data = json.load(f)
+        return cls({name: LayoutTemplate(name, spec['columns']) for name, spec in data.items()})
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({name: t.to_dict() for name, t in self.templates.items()}, f, indent=2)
+
+    def get(self, name):
+        return self.templates.get(name)
+
+    def add(self, template):
+        self.templates[template.name] = template
+
+
+TEMPLATES_PATH = os.environ.get(
+    'LAYOUT_TEMPLATES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layout_templates.json')
+)
+registry = LayoutTemplateRegistry.load(TEMPLATES_PATH)
+
+
+def layout_page_lines(page, name, template=None, labels=DEFAULT_COLUMN_LABELS, is_course_code=None):
+    """layout_lines() for a pdfplumber page"""
+    return layout_lines(page.extract_words(), page.width, name, template, labels, is_course_code)
+
+
+def layout_lines(words, page_width, name, template=None, labels=DEFAULT_COLUMN_LABELS, is_course_code=None):
+    """Text lines of a page with course rows rebuilt from their bounding boxes
+
+    Course rows are rewritten as ``CODE | credit | earned | grade`` so the
+    existing text parsers read them without guessing number positions; every
+    other row is passed through as plain words. ``template`` carries the
+    columns learned on a previous page. Returns (lines, template), template
+    being None while no course table has been recognised.
+    """
+    rows = group_rows(words)
+    declared = registry.get(name)
+    template = declared or template
+    is_course_code = is_course_code or _looks_like_code
+    lines = []
+
+    for row in rows:
+        # Without a declared template, every header row re-learns the columns
+        if declared is None and (template is None or template.is_header(row, labels)):
+            learned = LayoutTemplate.learn(name, row, labels, page_width)
+            if learned is not None:
+                template = learned
+                lines.append(row_text(row))
+                continue
+
+        if template is not None:
+            cells = template.read_row(row)
+            code = cells['course_code'].split(' ')[0] if cells['course_code'] else ''
+            if code and is_course_code(code) and re.search(r'\d', cells['credit']):
+                earned = cells['earned'] or earned_from_grade(cells['credit'], cells['grade'])
+                if earned:
+                    lines.append(' | '.join([code, cells['credit'], earned, cells['grade']]))
+                    continue
+
+        lines.append(row_text(row))
+
+    return lines, template
+
+
+def earned_from_grade(credit, grade):
+    """Earned credits of a row whose earned cell is blank: none for a failing
+    grade, the full credit for a passing one, unknown without a grade"""
+    grade = grade.strip().upper()
+    if not grade:
+        return ''
+    return '0' if grade in FAIL_GRADES else credit
+
+
+def _looks_like_code(code):
+    return bool(re.match(r'^([A-Z]{2,4}-?\d{3,4}[A-Z]?\*?|CC\d+)$', code.upper()))
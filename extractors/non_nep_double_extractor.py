@@ -1,11 +1,5 @@
 import re
-import os
-import sys
-
-# Add the current directory to path to ensure imports work
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
-from base_extractor import BaseExtractor
+from .base_extractor import BaseExtractor
 
 class MarksheetVerifier:
     def __init__(self):
@@ -47,6 +41,7 @@ class NonNEPDoubleExtractor(BaseExtractor):
         in_course_section = False
         course_section_started = False
         seen_course_codes = set()
+        trace = self.trace
         
         for i, line in enumerate(lines):
             line_clean = self.clean_text(line)
@@ -54,6 +49,8 @@ class NonNEPDoubleExtractor(BaseExtractor):
             
             if not line_clean:
                 continue
+            if trace:
+                trace.at(i, line_clean)
             
             # Detect semester headers
             semester_match = re.search(r'Semester\s*:\s*([IVXivx]+)', line_clean, re.IGNORECASE)
@@ -61,18 +58,24 @@ class NonNEPDoubleExtractor(BaseExtractor):
                 current_semester = semester_match.group(1).upper()
                 course_section_started = True
                 in_course_section = False
+                if trace:
+                    trace.event('semester_header', semester=current_semester)
                 continue
             
             # Look for course section start
             if course_section_started and not in_course_section:
                 if re.search(r'[A-Z]{2,4}\d{3,4}[A-Z]?\*?', line_clean):
                     in_course_section = True
+                    if trace:
+                        trace.event('section_start', semester=current_semester)
             
             # End of course section
             if in_course_section and any(marker in line_clean for marker in 
                 ['Previous Semester Performance', 'Remarks', 'Grade Card No', 'Cummulative Performance', 'Semester :']):
                 in_course_section = False
                 course_section_started = False
+                if trace:
+                    trace.event('section_end', semester=current_semester)
                 current_semester = None
             
             # Extract course data
@@ -84,18 +87,28 @@ class NonNEPDoubleExtractor(BaseExtractor):
                         seen_course_codes.add(course_key)
                         course['semester'] = current_semester
                         courses.append(course)
+                        if trace:
+                            trace.event('course', **course)
+                    elif trace:
+                        trace.event('duplicate', course_code=course['course_code'], semester=current_semester)
         
         return courses
 
     def extract_course_bulletproof(self, original_line, clean_line):
         """BULLETPROOF course extraction with guaranteed correct grade detection"""
         
+        trace = self.trace
         # Extract course code
         code_match = re.search(r'([A-Z]{2,4}\d{3,4}[A-Z]?\*?)', clean_line)
         if not code_match:
+            if trace:
+                trace.event('rejected', reason='no course code')
             return None
             
         course_code = code_match.group(1).upper()
+        entry = None
+        if self.catalog is not None:
+            course_code, clean_line, entry = self.match_catalog_code(course_code, clean_line)
         
         # Extract ALL numbers for credits
         all_numbers = re.findall(r'\d+\.?\d*', clean_line)
@@ -113,6 +126,8 @@ class NonNEPDoubleExtractor(BaseExtractor):
         grade = self.extract_grade_bulletproof(clean_line, course_code)
         
         if not grade:
+            if trace:
+                trace.event('rejected', reason='no grade', course_code=course_code)
             return None
         
         # Determine credits and earned credits
@@ -122,7 +137,12 @@ class NonNEPDoubleExtractor(BaseExtractor):
             credit, earned = numbers[0], numbers[1]
         elif len(numbers) == 1:
             credit = earned = numbers[0]
-        else:
+        if entry is not None:
+            # The catalog's credits win over the numbers found on the line
+            credit, earned = self.catalog_credit_data(entry, clean_line, (credit, earned) if numbers else None, grade)
+        elif not numbers:
+            if trace:
+                trace.event('rejected', reason='no credits', course_code=course_code, grade=grade)
             return None
         
         # Final validation
@@ -130,6 +150,9 @@ class NonNEPDoubleExtractor(BaseExtractor):
                 self.is_valid_grade(grade) and 
                 1 <= credit <= 5 and 
                 0 <= earned <= credit):
+            if trace:
+                trace.event('rejected', reason='failed validation', course_code=course_code,
+                            credit=credit, earned=earned, grade=grade)
             return None
         
         return {
@@ -224,6 +247,9 @@ class NonNEPDoubleExtractor(BaseExtractor):
         
         # Improved number extraction with better patterns
         numbers = re.findall(r'\d+\.?\d*', performance_text)
+        if self.trace:
+            self.trace.at(None, performance_text)
+            self.trace.event('performance_numbers', numbers=numbers)
         
         if len(numbers) >= 6:
             try:
@@ -256,10 +282,9 @@ class NonNEPDoubleExtractor(BaseExtractor):
                         except (ValueError, IndexError):
                             pass
     
-    def process_pdf(self, pdf_path):
-        """Main processing for double-semester format"""
+    def process_text(self, text):
+        """Parse and verify extracted text for double-semester format"""
         try:
-            text = self.extract_text_from_pdf(pdf_path)
             if not text.strip():
                 return {'all_courses': [], 'student_type': self.student_type, 'error': 'No text extracted'}
             
@@ -381,7 +406,10 @@ class NonNEPDoubleExtractor(BaseExtractor):
                     'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
                     'status': f"❌ {result['error']}",
                     'student_type': self.student_type,
-                    'error': result['error']
+                    'error': result['error'],
+                    'parse_trace': result.get('parse_trace'),
+                    'student_info': result.get('student_info', {}),
+                    'cumulative': result.get('cumulative')
                 }
             
             # Safely extract the main values needed for bulk display
@@ -416,7 +444,12 @@ class NonNEPDoubleExtractor(BaseExtractor):
                         'sgpa': prev_calculated.get('sgpa', 0)
                     },
                     'status': "✅ Correct" if result.get('status') == "✅ All Values Match" else "❌ Wrong",
-                    'student_type': self.student_type
+                    'student_type': self.student_type,
+                    'extraction': result.get('extraction'),
+                    'courses': self.course_grades(result),
+                    'parse_trace': result.get('parse_trace'),
+                    'student_info': result.get('student_info', {}),
+                    'cumulative': result.get('cumulative')
                 }
             else:
                 return {
@@ -425,7 +458,10 @@ class NonNEPDoubleExtractor(BaseExtractor):
                     'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
                     'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
                     'status': "❌ Data Extraction Failed",
-                    'student_type': self.student_type
+                    'student_type': self.student_type,
+                    'parse_trace': result.get('parse_trace'),
+                    'student_info': result.get('student_info', {}),
+                    'cumulative': result.get('cumulative')
                 }
                 
         except Exception as e:
@@ -39,6 +39,7 @@ class NonNEPSingleExtractor(BaseExtractor):
         
         in_course_section = False
         course_data_lines = []
+        trace = self.trace
         
         for i, line in enumerate(lines):
             line_clean = self.clean_text(line)
@@ -47,24 +48,45 @@ class NonNEPSingleExtractor(BaseExtractor):
             if not in_course_section and any(marker in line_clean for marker in 
                 ['Course Code', 'Sr.No.', 'Course Credits']):
                 in_course_section = True
+                if trace:
+                    trace.at(i, line_clean)
+                    trace.event('section_start')
                 continue
                 
             # End of course section
             if in_course_section and any(marker in line_clean for marker in 
                 ['Remarks', 'Current Semester Performance', 'Cumulative Performance', 'Grade Card No']):
                 in_course_section = False
+                if trace:
+                    trace.at(i, line_clean)
+                    trace.event('section_end')
                 break
                 
             # Collect potential course lines
             if in_course_section:
                 if not any(header in line_clean for header in ['Course Code', 'Sr.No.']):
                     course_data_lines.append((i, line_clean))
+                elif trace:
+                    trace.at(i, line_clean)
+                    trace.event('skipped', reason='repeated header')
         
         # Extract courses from collected lines
-        for line_num, line in course_data_lines:
+        recovered_line = None
+        for k, (line_num, line) in enumerate(course_data_lines):
+            if line_num == recovered_line:
+                continue
+            if trace:
+                trace.at(line_num, line)
             course = self.extract_course_smart(line)
+            if not course and k + 1 < len(course_data_lines):
+                # A catalog course whose cells ended up on the next line
+                course = self.recover_split_row(line, course_data_lines[k + 1][1])
+                if course:
+                    recovered_line = course_data_lines[k + 1][0]
             if course:
                 courses.append(course)
+                if trace:
+                    trace.event('course', **course)
         
         return courses
 
@@ -88,6 +110,9 @@ class NonNEPSingleExtractor(BaseExtractor):
                     
                     # Extract numbers from the data line
                     numbers = re.findall(r'\d+\.?\d*', data_line)
+                    if self.trace:
+                        self.trace.at(j, data_line)
+                        self.trace.event('performance_numbers', numbers=numbers)
                     if len(numbers) >= 3:
                         try:
                             # Format: Credits, EGP, SGPA
@@ -99,9 +124,8 @@ class NonNEPSingleExtractor(BaseExtractor):
         
         return credits, egp, sgpa
 
-    def process_pdf(self, pdf_path):
-        """Main processing function for single semester Non-NEP with verification"""
-        text = self.extract_text_from_pdf(pdf_path)
+    def process_text(self, text):
+        """Parse and verify extracted text for single semester Non-NEP"""
         if not text.strip():
             return {'all_courses': [], 'student_type': self.student_type}
         
@@ -0,0 +1,125 @@
+import functools
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pdfplumber
+from .pdf_buffer import pdf_input
+
+try:
+    import pytesseract
+except ImportError:  # OCR is optional; scanned marksheets then stay unparsed
+    pytesseract = None
+
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', 1))
+OCR_RESOLUTION = int(os.environ.get('OCR_RESOLUTION', 300))
+OCR_CACHE_DIR = os.environ.get('OCR_CACHE_DIR', 'ocr_cache')
+OCR_LANG = os.environ.get('OCR_LANG', 'eng')
+
+
+def _context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+# Created at import time so processes forked afterwards (preloaded gunicorn
+# workers, isolated bulk workers) share it: at most OCR_WORKERS pages are
+# OCR'd at once across all of them
+_ocr_slots = _context().BoundedSemaphore(max(1, OCR_WORKERS))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def ocr_available():
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def page_hash(page):
+    """Hash of a page's content stream and embedded images, computed without rendering"""
+    digest = hashlib.sha256()
+    for stream in page.page_obj.contents:
+        digest.update(stream.get_rawdata() or b'')
+    for image in page.images:
+        digest.update(image['stream'].get_rawdata() or b'')
+    digest.update(f"{page.width}x{page.height}@{OCR_RESOLUTION}".encode())
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(OCR_CACHE_DIR, key[:2], key + '.txt')
+
+
+def cached_text(key):
+    try:
+        with open(_cache_path(key), encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def store_text(key, text):
+    path = _cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def ocr_page(pdf_path, page_number):
+    """Rasterize one page and OCR it; runs inside the OCR pool, or inline in an isolated worker"""
+    with _ocr_slots:
+        with pdfplumber.open(pdf_input(pdf_path)) as pdf:
+            image = pdf.pages[page_number].to_image(resolution=OCR_RESOLUTION).original
+        # Keep the table layout so course rows stay on one line
+        return pytesseract.image_to_string(image, lang=OCR_LANG, config='--psm 6')
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        # A forked child must not reuse its parent's executor
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=max(1, OCR_WORKERS), mp_context=_context())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def ocr_pages(pdf_path):
+    """OCR text per page, served from the per-page cache when possible"""
+    if not ocr_available():
+        return []
+
+    with pdfplumber.open(pdf_input(pdf_path)) as pdf:
+        keys = [page_hash(page) for page in pdf.pages]
+
+    texts = [cached_text(key) for key in keys]
+    missing = [page_number for page_number, text in enumerate(texts) if text is None]
+    if multiprocessing.current_process().daemon:
+        # Isolated workers are daemonic and may not start a pool of their own;
+        # they OCR inline, still limited by the shared semaphore
+        results = ((page_number, ocr_page(pdf_path, page_number)) for page_number in missing)
+    else:
+        pending = [(page_number, _get_pool().submit(ocr_page, pdf_path, page_number)) for page_number in missing]
+        results = ((page_number, future.result()) for page_number, future in pending)
+    for page_number, text in results:
+        texts[page_number] = text
+        store_text(keys[page_number], text)
+
+    return texts
+
+
+def extract_text_ocr(pdf_path):
+    """OCR text of every page"""
+    return "\n".join(ocr_pages(pdf_path))
@@ -0,0 +1,253 @@
+"""Compact per-page intermediate representation of a marksheet PDF.
+
+Everything the extraction ladder reads from a PDF - PyPDF2 text, the
+pdfplumber text layer, words with bounding boxes, table cells and OCR text -
+is captured once and stored in a columnar little-endian binary file:
+
+    b'MSIR' | uint32 version | uint32 header length | JSON header | columns
+
+The JSON header maps every column to its byte offset and length. Numeric
+columns are packed float32/uint32 arrays and string columns are a uint32
+offset array followed by a UTF-8 blob. Files are memory-mapped and read with
+struct.unpack_from, so opening one costs nothing and each page only decodes
+the slices it needs.
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import PyPDF2
+import pdfplumber
+from .ocr import ocr_pages
+from .pdf_buffer import SharedPDF, pdf_input
+from .table_profiles import extract_tables
+
+MAGIC = b'MSIR'
+VERSION = 1
+
+# Sources of the text lines stored per page
+LINES_PYPDF2 = 0
+LINES_TEXT_LAYER = 1
+LINES_OCR = 2
+
+PAGE_IR_DIR = os.environ.get('PAGE_IR_DIR')
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+class PageIRBuilder:
+    """Collects page data in page order and writes the binary file"""
+
+    def __init__(self):
+        self.page_width = []
+        self.page_height = []
+        self.word_start = [0]
+        self.word_x0, self.word_x1, self.word_top, self.word_bottom, self.word_text = [], [], [], [], []
+        self.cell_start = [0]
+        self.cell_table, self.cell_row, self.cell_text = [], [], []
+        self.line_start = [0]
+        self.line_source, self.line_text = [], []
+
+    def add_page(self, width, height, words, tables, lines):
+        """words: pdfplumber word dicts, tables: lists of rows of cell text,
+        lines: (source, text) pairs"""
+        self.page_width.append(width)
+        self.page_height.append(height)
+        for word in words:
+            self.word_x0.append(word['x0'])
+            self.word_x1.append(word['x1'])
+            self.word_top.append(word['top'])
+            self.word_bottom.append(word['bottom'])
+            self.word_text.append(word['text'])
+        self.word_start.append(len(self.word_text))
+        for t, table in enumerate(tables):
+            for r, row in enumerate(table):
+                for cell in row:
+                    self.cell_table.append(t)
+                    self.cell_row.append(r)
+                    self.cell_text.append(cell)
+        self.cell_start.append(len(self.cell_text))
+        for source, text in lines:
+            self.line_source.append(source)
+            self.line_text.append(text)
+        self.line_start.append(len(self.line_text))
+
+    def to_bytes(self):
+        columns = {
+            'page_width': ('f', self.page_width), 'page_height': ('f', self.page_height),
+            'word_start': ('I', self.word_start),
+            'word_x0': ('f', self.word_x0), 'word_x1': ('f', self.word_x1),
+            'word_top': ('f', self.word_top), 'word_bottom': ('f', self.word_bottom),
+            'word_text': ('s', self.word_text),
+            'cell_start': ('I', self.cell_start),
+            'cell_table': ('I', self.cell_table), 'cell_row': ('I', self.cell_row),
+            'cell_text': ('s', self.cell_text),
+            'line_start': ('I', self.line_start),
+            'line_source': ('I', self.line_source), 'line_text': ('s', self.line_text)
+        }
+        blobs = []
+        layout = {}
+        offset = 0
+        for name, (kind, values) in columns.items():
+            if kind == 's':
+                encoded = [v.encode('utf-8') for v in values]
+                offsets = [0]
+                for item in encoded:
+                    offsets.append(offsets[-1] + len(item))
+                data = struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(encoded)
+            else:
+                data = struct.pack(f'<{len(values)}{kind}', *values)
+            layout[name] = {'kind': kind, 'offset': offset, 'count': len(values)}
+            padded = _align(len(data))
+            blobs.append(data + b'\0' * (padded - len(data)))
+            offset += padded
+
+        header = json.dumps({'pages': len(self.page_width), 'columns': layout}).encode('utf-8')
+        header += b' ' * (_align(12 + len(header)) - 12 - len(header))
+        return MAGIC + struct.pack('<II', VERSION, len(header)) + header + b''.join(blobs)
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.to_bytes())
+        os.replace(tmp_path, path)
+
+
+class PageIR:
+    """Read-only, memory-mapped view of a stored page representation"""
+
+    def __init__(self, path):
+        self.path = path
+        # Cache files are named <document digest>-<settings>.pir
+        self.digest = os.path.basename(path).split('-', 1)[0]
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:4] != MAGIC:
+            raise ValueError(f'{path} is not a page IR file')
+        version, header_len = struct.unpack_from('<II', self._mm, 4)
+        if version != VERSION:
+            raise ValueError(f'Unsupported page IR version {version}')
+        header = json.loads(self._mm[12:12 + header_len])
+        self._base = 12 + header_len
+        self._columns = header['columns']
+        self.page_count = header['pages']
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _numbers(self, name, start, stop):
+        column = self._columns[name]
+        kind = column['kind']
+        return list(struct.unpack_from(f'<{stop - start}{kind}', self._mm, self._base + column['offset'] + 4 * start))
+
+    def _strings(self, name, start, stop):
+        column = self._columns[name]
+        position = self._base + column['offset']
+        offsets = struct.unpack_from(f'<{stop - start + 1}I', self._mm, position + 4 * start)
+        blob = position + 4 * (column['count'] + 1)
+        return [self._mm[blob + a:blob + b].decode('utf-8') for a, b in zip(offsets, offsets[1:])]
+
+    def _range(self, name, page):
+        return self._numbers(name, page, page + 2)
+
+    def page_size(self, page):
+        return self._numbers('page_width', page, page + 1)[0], self._numbers('page_height', page, page + 1)[0]
+
+    def words(self, page):
+        """Words of a page as pdfplumber-style dicts"""
+        start, stop = self._range('word_start', page)
+        columns = zip(self._strings('word_text', start, stop), self._numbers('word_x0', start, stop),
+                      self._numbers('word_x1', start, stop), self._numbers('word_top', start, stop),
+                      self._numbers('word_bottom', start, stop))
+        return [{'text': t, 'x0': x0, 'x1': x1, 'top': top, 'bottom': bottom} for t, x0, x1, top, bottom in columns]
+
+    def tables(self, page):
+        """Tables of a page as lists of rows of cleaned cell text"""
+        start, stop = self._range('cell_start', page)
+        tables = []
+        cells = zip(self._numbers('cell_table', start, stop), self._numbers('cell_row', start, stop),
+                    self._strings('cell_text', start, stop))
+        for t, r, text in cells:
+            while t >= len(tables):
+                tables.append([])
+            while r >= len(tables[t]):
+                tables[t].append([])
+            tables[t][r].append(text)
+        return tables
+
+    def lines(self, page, source):
+        start, stop = self._range('line_start', page)
+        sources = self._numbers('line_source', start, stop)
+        return [text for s, text in zip(sources, self._strings('line_text', start, stop)) if s == source]
+
+    def text(self, source):
+        """Whole-document text from one source, one block per page"""
+        full_text = ""
+        for page in range(self.page_count):
+            lines = self.lines(page, source)
+            if lines:
+                full_text += '\n'.join(lines) + "\n"
+        return full_text
+
+
+def clean_cell(cell):
+    return re.sub(r'\s+', ' ', str(cell or '').strip())
+
+
+def build_page_ir(pdf_path, table_settings):
+    """Run every extraction pass over a PDF once and collect the results
+
+    OCR text is only captured for documents without a text layer.
+    """
+    try:
+        pypdf2_pages = [page.extract_text() or '' for page in PyPDF2.PdfReader(pdf_input(pdf_path)).pages]
+    except Exception:
+        pypdf2_pages = []
+
+    pages = []
+    with pdfplumber.open(pdf_input(pdf_path)) as pdf:
+        for page in pdf.pages:
+            tables = [[[clean_cell(cell) for cell in row] for row in table]
+                      for table in extract_tables(page, table_settings)]
+            pages.append((page.width, page.height, page.extract_words(), tables, page.extract_text() or ''))
+
+    scanned = not any(text.strip() for *_, text in pages)
+    ocr_texts = ocr_pages(pdf_path) if scanned else []
+
+    builder = PageIRBuilder()
+    for number, (width, height, words, tables, text) in enumerate(pages):
+        lines = []
+        for source, page_texts in ((LINES_PYPDF2, pypdf2_pages), (LINES_OCR, ocr_texts)):
+            if number < len(page_texts):
+                lines += [(source, line) for line in page_texts[number].split('\n') if line]
+        lines += [(LINES_TEXT_LAYER, line) for line in text.split('\n') if line]
+        builder.add_page(width, height, words, tables, lines)
+    return builder
+
+
+def file_digest(path):
+    if isinstance(path, SharedPDF):
+        with path.view() as view:
+            return hashlib.sha256(view).hexdigest()
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def page_ir_path(digest, table_settings, directory=None):
+    """Cache path for a PDF digest; the table settings are part of the key"""
+    settings = hashlib.sha1(json.dumps(table_settings, sort_keys=True).encode()).hexdigest()[:8]
+    return os.path.join(directory or PAGE_IR_DIR, digest[:2], f'{digest}-{settings}.pir')
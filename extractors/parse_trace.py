@@ -0,0 +1,103 @@
+"""Optional per-line record of the decisions an extractor makes.
+
+When tracing is on, every extractor run records section transitions, regex
+hits and rejected course rows against the line they came from. The trace
+travels back from the worker process inside the result and is kept in a
+bounded ring buffer in the server, keyed by document hash. When tracing is
+off an extractor's ``trace`` is None and each call site costs one test.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Set PARSE_TRACE=1 to trace from startup; /admin/traces toggles it at runtime
+enabled = os.environ.get('PARSE_TRACE') == '1'
+PARSE_TRACE_SIZE = int(os.environ.get('PARSE_TRACE_SIZE', 200))
+# Longer documents stop recording events rather than growing without bound
+MAX_EVENTS = 5000
+
+
+class ParseTrace:
+    """Events of one document, grouped by the ladder rung that produced them"""
+
+    def __init__(self, document, extractor):
+        self.document = document
+        self.extractor = extractor
+        self.started = time.time()
+        self.events = []
+        self.rung = None
+        self.line_no = None
+        self.line = None
+        self.truncated = False
+
+    def start_rung(self, rung):
+        self.rung = rung
+        self.line_no = self.line = None
+
+    def at(self, line_no, line):
+        """Set the line that following events refer to"""
+        self.line_no = line_no
+        self.line = line
+
+    def event(self, kind, **details):
+        if len(self.events) >= MAX_EVENTS:
+            self.truncated = True
+            return
+        self.events.append([self.rung, self.line_no, kind, self.line, details])
+
+    def to_dict(self):
+        return {
+            'document': self.document,
+            'extractor': self.extractor,
+            'started': self.started,
+            'truncated': self.truncated,
+            'events': [
+                {'rung': rung, 'line_no': line_no, 'kind': kind, 'line': line, 'details': details}
+                for rung, line_no, kind, line, details in self.events
+            ]
+        }
+
+
+class TraceBuffer:
+    """The most recent traces, one per document hash"""
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.traces = OrderedDict()
+
+    def add(self, trace, filename=None):
+        trace = dict(trace, filename=filename)
+        with self.lock:
+            self.traces.pop(trace['document'], None)
+            self.traces[trace['document']] = trace
+            while len(self.traces) > self.size:
+                self.traces.popitem(last=False)
+
+    def get(self, document):
+        with self.lock:
+            return self.traces.get(document)
+
+    def summary(self):
+        with self.lock:
+            return [
+                {'document': t['document'], 'filename': t['filename'], 'extractor': t['extractor'],
+                 'started': t['started'], 'events': len(t['events'])}
+                for t in reversed(self.traces.values())
+            ]
+
+
+trace_buffer = TraceBuffer(PARSE_TRACE_SIZE)
+
+
+def keep_trace(result, filename=None):
+    """Move a worker's trace out of its result into this process's buffer
+
+    Returns the document key the trace is stored under, or None.
+    """
+    trace = result.pop('parse_trace', None) if isinstance(result, dict) else None
+    if trace:
+        trace_buffer.add(trace, filename)
+        return trace['document']
+    return None
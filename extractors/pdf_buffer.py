@@ -0,0 +1,136 @@
+"""Uploaded PDFs kept in shared memory instead of on disk.
+
+A SharedPDF holds the bytes of one upload in a shared memory segment. Forked
+verification workers inherit the mapping, and any other process (the OCR
+pool) receives just the segment name when the object is pickled, so the
+document is never copied through a pipe or a temp file. Extractors accept a
+SharedPDF wherever they accept a file path.
+"""
+import io
+import os
+from multiprocessing import shared_memory
+
+SHM_PATH = '/dev/shm'
+# Left free for other users of /dev/shm and concurrent requests
+SHM_RESERVE = 16 * 1024 * 1024
+
+
+def shared_memory_available(size):
+    """Whether ``size`` more bytes fit in /dev/shm
+
+    tmpfs pages are allocated on first write, so an oversized segment is
+    created fine and the process is then killed with SIGBUS while copying
+    into it. Where there is no /dev/shm to check, assume it fits.
+    """
+    try:
+        stat = os.statvfs(SHM_PATH)
+    except (AttributeError, OSError):
+        return True
+    return stat.f_bavail * stat.f_frsize >= size + SHM_RESERVE
+
+
+class MemoryReader(io.RawIOBase):
+    """Seekable read-only file over the first ``size`` bytes of a buffer
+
+    Slices are only taken for the duration of a read, so the segment can be
+    closed while readers are still referenced.
+    """
+
+    def __init__(self, buf, size):
+        self._buf = buf
+        self._size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(0, offset)
+        return self._position
+
+    def readinto(self, buffer):
+        end = min(self._position + len(buffer), self._size)
+        if end <= self._position:
+            return 0
+        with self._buf[self._position:end] as chunk:
+            buffer[:end - self._position] = chunk
+        count = end - self._position
+        self._position = end
+        return count
+
+
+class SharedPDF:
+    """PDF bytes in a shared memory segment owned by the creating process"""
+
+    def __init__(self, size, name=None):
+        self.size = size
+        # Zero-sized segments are not allowed
+        self._shm = shared_memory.SharedMemory(name=name, create=name is None, size=max(1, size))
+        self.name = self._shm.name
+        self.owner = name is None
+
+    @classmethod
+    def from_bytes(cls, data):
+        buffer = cls(len(data))
+        buffer._shm.buf[:len(data)] = data
+        return buffer
+
+    @classmethod
+    def from_stream(cls, stream):
+        """Copy a file-like object (e.g. an upload) straight into a new segment"""
+        stream.seek(0, io.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+        buffer = cls(size)
+        view = buffer._shm.buf
+        received = 0
+        while received < size:
+            count = stream.readinto(view[received:size])
+            if not count:
+                break
+            received += count
+        stream.seek(0)
+        return buffer
+
+    def __getstate__(self):
+        return {'name': self.name, 'size': self.size}
+
+    def __setstate__(self, state):
+        # Attach to the creator's segment; only the creator releases it
+        self.__init__(state['size'], state['name'])
+
+    def __len__(self):
+        return self.size
+
+    def view(self):
+        return self._shm.buf[:self.size]
+
+    def open(self):
+        return MemoryReader(self._shm.buf, self.size)
+
+    def save(self, path):
+        with open(path, 'wb') as f, self.view() as view:
+            f.write(view)
+
+    def release(self):
+        """Free the segment; call once every worker is done with it"""
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+
+def pdf_input(source):
+    """Something pdfplumber.open and PyPDF2.PdfReader accept, for a path or a SharedPDF"""
+    if isinstance(source, SharedPDF):
+        return source.open()
+    return source
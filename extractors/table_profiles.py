@@ -0,0 +1,55 @@
+"""Per-format pdfplumber table finder settings.
+
+``scripts/tune_tables.py`` searches table settings against a labelled sample
+of marksheets and writes, for every format (extractor ``student_type``), the
+cheapest settings that still verify the sample correctly. The extractors use
+a format's profile for the table rung and the page representation; formats
+without one keep their class's ``table_settings``.
+
+Besides pdfplumber's own keys, a profile's settings may hold ``crop``: the
+part of the page searched for tables, as fractions (x0, top, x1, bottom) of
+its width and height.
+"""
+import json
+import os
+
+PROFILES_PATH = os.environ.get(
+    'TABLE_PROFILES', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'table_profiles.json')
+)
+
+
+def load_profiles(path):
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error loading table profiles from {path}: {e}")
+        return {}
+
+
+def save_profiles(profiles, path):
+    with open(path, 'w') as f:
+        json.dump(profiles, f, indent=2, sort_keys=True)
+
+
+profiles = load_profiles(PROFILES_PATH)
+
+
+def settings_for(student_type, default):
+    """Tuned table settings of a format, or ``default`` without a profile"""
+    profile = profiles.get(student_type)
+    return profile['table_settings'] if profile else default
+
+
+def extract_tables(page, settings):
+    """``page.extract_tables(settings)``, searching only the profile's crop box"""
+    crop = settings.get('crop')
+    if crop:
+        settings = {key: value for key, value in settings.items() if key != 'crop'}
+        x0, top, x1, bottom = crop
+        left, upper = page.bbox[0], page.bbox[1]
+        page = page.crop((left + x0 * page.width, upper + top * page.height,
+                          left + x1 * page.width, upper + bottom * page.height))
+    return page.extract_tables(settings)
@@ -0,0 +1,33 @@
+# Production serving profile: gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# PDF extraction is CPU-bound, so one synchronous worker process per core
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'sync'
+
+# Import the app (and with it pdfplumber and the extractors) once in the
+# master so forked workers start warm and share those pages copy-on-write
+preload_app = True
+
+# Recycle workers periodically to contain pdfplumber memory growth
+max_requests = int(os.environ.get('MAX_REQUESTS', 200))
+max_requests_jitter = int(os.environ.get('MAX_REQUESTS_JITTER', 50))
+
+# Large bulk uploads can take minutes
+timeout = int(os.environ.get('WORKER_TIMEOUT', 300))
+graceful_timeout = 30
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_worker_init(worker):
+    # With a shared job queue, every worker process leases jobs from the
+    # start instead of waiting for its first request
+    from app import app
+    from job_queue import get_node_queue
+    if app.config['JOB_QUEUE_DB']:
+        get_node_queue(app.config)
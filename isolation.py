@@ -0,0 +1,100 @@
+import multiprocessing
+import signal
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; memory limits are then skipped
+    resource = None
+
+# Failure kinds reported by run_isolated
+TIMEOUT = 'timeout'
+RESOURCE_LIMIT = 'resource_limit'
+CRASHED = 'crashed'
+ERROR = 'error'
+
+
+def _context():
+    # Fork is cheap and inherits the already imported extractors, the course
+    # catalog and the OCR semaphore. The parent is a multithreaded server
+    # process, and a forked child gets only the calling thread. So the child
+    # must only run the target function: it may not rely on other threads,
+    # and it must not take a lock another thread could have been holding at
+    # fork time (logging handlers, executors, the scheduler's queues).
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+class IsolatedOutcome:
+    """Result of a call made in a separate process"""
+
+    def __init__(self, ok, value=None, failure=None, message=None, elapsed=0.0):
+        self.ok = ok
+        self.value = value
+        self.failure = failure
+        self.message = message
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        if self.ok:
+            return f'IsolatedOutcome(ok, {self.elapsed:.2f}s)'
+        return f'IsolatedOutcome({self.failure}: {self.message})'
+
+
+def _child_main(conn, func, args, memory_limit):
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    try:
+        try:
+            conn.send(('ok', func(*args)))
+        except MemoryError:
+            conn.send((RESOURCE_LIMIT, f'Memory limit of {memory_limit // (1024 * 1024)} MB exceeded'))
+        except Exception as e:
+            conn.send((ERROR, str(e)))
+    finally:
+        conn.close()
+
+
+def run_isolated(func, args=(), timeout=None, memory_limit=None):
+    """Run func(*args) in a child process under a wall-clock and memory budget
+
+    func, args and the return value must be picklable. The child is killed
+    when it exceeds ``timeout`` seconds; ``memory_limit`` (bytes) caps its
+    address space. Never raises for failures inside the child - they are
+    reported through the returned IsolatedOutcome.
+    """
+    ctx = _context()
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_child_main, args=(child_conn, func, args, memory_limit), daemon=True)
+
+    start = time.monotonic()
+    process.start()
+    child_conn.close()
+
+    try:
+        if not parent_conn.poll(timeout):
+            return IsolatedOutcome(False, failure=TIMEOUT,
+                                   message=f'Processing exceeded {timeout:g}s',
+                                   elapsed=time.monotonic() - start)
+        try:
+            status, payload = parent_conn.recv()
+        except EOFError:
+            # The child died without reporting (OOM killer, segfault in a C extension, ...)
+            process.join(5)
+            code = process.exitcode
+            if code is not None and code < 0 and -code == signal.SIGKILL:
+                return IsolatedOutcome(False, failure=RESOURCE_LIMIT, message='Worker was killed (out of memory)',
+                                       elapsed=time.monotonic() - start)
+            return IsolatedOutcome(False, failure=CRASHED, message=f'Worker exited unexpectedly (code {code})',
+                                   elapsed=time.monotonic() - start)
+
+        elapsed = time.monotonic() - start
+        if status == 'ok':
+            return IsolatedOutcome(True, value=payload, elapsed=elapsed)
+        return IsolatedOutcome(False, failure=status, message=payload, elapsed=elapsed)
+    finally:
+        parent_conn.close()
+        if process.is_alive():
+            process.kill()
+        process.join()
@@ -0,0 +1,332 @@
+"""Durable bulk work queue shared by several app instances.
+
+Jobs live in a SQLite database on the shared volume. Any node's workers lease
+jobs from any batch, keep the lease alive with heartbeats while they work,
+and store the result; a lease that expires (the node died) makes the job
+available again until it has been attempted ``max_attempts`` times.
+
+Run extra nodes without the web app:
+
+    python job_queue.py worker --db /shared/jobs.db --threads 4
+    python job_queue.py status --db /shared/jobs.db
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    task TEXT NOT NULL,
+    args TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (state, position, id);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, position);
+"""
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    def __init__(self, row):
+        self.id, self.batch, self.position, self.task, args, self.attempts = row
+        self.args = json.loads(args)
+
+
+class JobQueue:
+    """SQLite-backed job queue; safe to use from several processes and threads"""
+
+    def __init__(self, db_path, lease_seconds=60, max_attempts=3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # A connection per operation keeps this usable across threads and forks
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def enqueue_batch(self, task, args_list):
+        """Queue one job per argument list and return the new batch id"""
+        batch = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT INTO jobs (batch, position, task, args, created, updated) VALUES (?, ?, ?, ?, ?, ?)',
+                [(batch, position, task, json.dumps(list(args)), now, now) for position, args in enumerate(args_list)]
+            )
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+        return batch
+
+    def lease(self, owner):
+        """Take the next available job, or return None
+
+        Ordering by position within the batch interleaves concurrent batches.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            while True:
+                row = conn.execute(
+                    "SELECT id, batch, position, task, args, attempts FROM jobs "
+                    "WHERE state = ? OR (state = ? AND lease_expires < ?) "
+                    "ORDER BY position, id LIMIT 1",
+                    (QUEUED, LEASED, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                if row[5] >= self.max_attempts:
+                    conn.execute(
+                        'UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, updated = ? WHERE id = ?',
+                        (FAILED, f'Gave up after {row[5]} attempts', now, row[0])
+                    )
+                    continue
+                conn.execute(
+                    'UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, '
+                    'updated = ? WHERE id = ?',
+                    (LEASED, owner, now + self.lease_seconds, now, row[0])
+                )
+                conn.execute('COMMIT')
+                return Job(row[:5] + (row[5] + 1,))
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, job, owner):
+        """Extend a lease; returns False if the lease was lost to another node"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND lease_owner = ? AND state = ?',
+                (time.time() + self.lease_seconds, time.time(), job.id, owner, LEASED)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job, owner, result):
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET state = ?, result = ?, updated = ? WHERE id = ? AND lease_owner = ?',
+                (DONE, json.dumps(result), time.time(), job.id, owner)
+            )
+
+    def fail(self, job, owner, error):
+        """Record a failed attempt; the job is retried until max_attempts"""
+        state = FAILED if job.attempts >= self.max_attempts else QUEUED
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, updated = ? '
+                'WHERE id = ? AND lease_owner = ?',
+                (state, error, time.time(), job.id, owner)
+            )
+
+    def batch_results(self, batch):
+        """(state, result, error) per job of a batch, in submission order"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT state, result, error FROM jobs WHERE batch = ? ORDER BY position', (batch,)
+            ).fetchall()
+        return [(state, json.loads(result) if result else None, error) for state, result, error in rows]
+
+    def wait_batch(self, batch, poll_interval=0.25, timeout=None):
+        """Block until every job of a batch is done or failed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            results = self.batch_results(batch)
+            if all(state in (DONE, FAILED) for state, _, _ in results):
+                return results
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f'Batch {batch} did not finish in {timeout}s')
+            time.sleep(poll_interval)
+
+    def cancel_batch(self, batch, error):
+        """Fail a batch's unfinished jobs, e.g. once nobody waits for them any more"""
+        with self._connect() as conn:
+            conn.execute('UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, updated = ? '
+                         'WHERE batch = ? AND state IN (?, ?)', (FAILED, error, time.time(), batch, QUEUED, LEASED))
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        return dict(rows)
+
+    def completed_by(self, batch):
+        """Number of a batch's jobs finished by each worker"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT lease_owner, COUNT(*) FROM jobs WHERE batch = ? AND state = ? '
+                                'GROUP BY lease_owner', (batch, DONE)).fetchall()
+        return dict(rows)
+
+    def purge_finished(self, older_than):
+        """Drop finished jobs last updated more than older_than seconds ago"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM jobs WHERE state IN (?, ?) AND updated < ?',
+                         (DONE, FAILED, time.time() - older_than))
+
+
+class QueueWorker:
+    """Pulls jobs from a JobQueue on a number of threads and runs them
+
+    ``execute(job)`` does the work and returns a JSON-serialisable result.
+    With ``retention`` (seconds), finished jobs older than that are deleted
+    every ``purge_interval`` seconds so the table does not grow forever.
+    """
+
+    def __init__(self, queue, execute, threads=1, idle_sleep=0.5, retention=None, purge_interval=600):
+        self.queue = queue
+        self.execute = execute
+        self.threads = max(1, threads)
+        self.idle_sleep = idle_sleep
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self.owner_prefix = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.processed = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.threads):
+            threading.Thread(target=self._run, args=(f'{self.owner_prefix}:{i}',),
+                             name=f'queue-worker-{i}', daemon=True).start()
+        if self.retention:
+            threading.Thread(target=self._purge, name='queue-purge', daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+
+    def _heartbeat(self, job, owner, done):
+        while not done.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(job, owner):
+                return
+
+    def _purge(self):
+        while not self.stopping.wait(self.purge_interval):
+            try:
+                self.queue.purge_finished(self.retention)
+            except sqlite3.OperationalError:
+                pass  # Database busy; the next pass catches up
+
+    def _run(self, owner):
+        while not self.stopping.is_set():
+            try:
+                job = self.queue.lease(owner)
+            except sqlite3.OperationalError:
+                job = None  # Database busy; try again shortly
+            if job is None:
+                self.stopping.wait(self.idle_sleep)
+                continue
+
+            done = threading.Event()
+            threading.Thread(target=self._heartbeat, args=(job, owner, done), daemon=True).start()
+            try:
+                result = self.execute(job)
+            except Exception as e:
+                self.queue.fail(job, owner, str(e))
+            else:
+                self.queue.complete(job, owner, result)
+                with self._lock:
+                    self.processed += 1
+            finally:
+                done.set()
+
+
+def run_isolated_job(job, timeout=None, memory_limit=None):
+    """Standalone executor: run the task in an isolated, budgeted process"""
+    from isolation import run_isolated
+    from verification import TASKS, isolation_failure_result
+
+    outcome = run_isolated(TASKS[job.task], tuple(job.args), timeout, memory_limit)
+    return outcome.value if outcome.ok else isolation_failure_result(outcome)
+
+
+def run_scheduled_job(config, job):
+    """App executor: run the task on this process's bulk lane
+
+    Interactive uploads on this node still take the next free slot.
+    """
+    from scheduler import LANE_BULK, submit_isolated
+    from verification import TASKS, isolation_failure_result
+
+    outcome = submit_isolated(config, LANE_BULK, TASKS[job.task], *job.args, batch=job.batch).result()
+    return outcome.value if outcome.ok else isolation_failure_result(outcome)
+
+
+_node_queue = None
+_node_pid = None
+_node_lock = threading.Lock()
+
+
+def get_node_queue(config):
+    """Per-process queue, starting this process's workers on the first call
+
+    The app calls it on every request and gunicorn right after forking a
+    worker, so a node leases jobs even if it never receives a bulk upload.
+    """
+    global _node_queue, _node_pid
+    with _node_lock:
+        if _node_queue is None or _node_pid != os.getpid():
+            _node_queue = JobQueue(config['JOB_QUEUE_DB'], config['JOB_QUEUE_LEASE'])
+            # One lease per local slot, so a node never hoards work it cannot start
+            QueueWorker(_node_queue, lambda job: run_scheduled_job(config, job), config['WORKERS'],
+                        retention=config['JOB_QUEUE_RETENTION']).start()
+            _node_pid = os.getpid()
+        return _node_queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['worker', 'status'])
+    parser.add_argument('--db', default=os.environ.get('JOB_QUEUE_DB', 'jobs.db'))
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--lease', type=float, default=float(os.environ.get('JOB_QUEUE_LEASE', 60)))
+    parser.add_argument('--timeout', type=float, default=float(os.environ.get('FILE_TIMEOUT', 60)))
+    parser.add_argument('--memory-mb', type=int, default=int(os.environ.get('FILE_MEMORY_MB', 1536)))
+    parser.add_argument('--retention', type=float, default=float(os.environ.get('JOB_QUEUE_RETENTION', 86400)),
+                        help='seconds finished jobs are kept (0 keeps them)')
+    args = parser.parse_args()
+
+    queue = JobQueue(args.db, args.lease)
+    if args.command == 'status':
+        print(json.dumps(queue.counts(), indent=2))
+        return
+
+    memory_limit = args.memory_mb * 1024 * 1024
+    worker = QueueWorker(queue, lambda job: run_isolated_job(job, args.timeout, memory_limit), args.threads,
+                         retention=args.retention)
+    worker.start()
+    print(f'{worker.owner_prefix}: {args.threads} worker thread(s) on {args.db}', flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        worker.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""Staged pipeline with bounded queues between stages.
+
+Each stage runs its function on its own threads and passes the result on to
+the next stage through a queue of at most ``queue_size`` items. A full queue
+blocks the stage before it, so no stage runs far ahead of a slower one.
+While one file is being written to disk another can be verified. I/O stages
+use a few threads. CPU-bound stages hand each item to the isolated worker
+processes and wait on it, so their thread count is the number of files
+in flight.
+
+Each stage counts the items it processed, the time its threads were busy
+and the depth of its input queue. The stage with the highest utilization
+and a full input queue is the bottleneck.
+"""
+import queue
+import threading
+import time
+
+_END = object()
+
+
+class Stage:
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+class StageCounters:
+    def __init__(self, stage):
+        self.stage = stage
+        self.lock = threading.Lock()
+        self.running = stage.workers
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.depth_total = 0
+        self.max_depth = 0
+
+    def snapshot(self, elapsed):
+        return {
+            'stage': self.stage.name,
+            'workers': self.stage.workers,
+            'processed': self.processed,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy, 4),
+            'utilization': round(self.busy / (self.stage.workers * elapsed), 3) if elapsed else 0.0,
+            'mean_queue_depth': round(self.depth_total / self.processed, 2) if self.processed else 0.0,
+            'max_queue_depth': self.max_depth
+        }
+
+
+class Pipeline:
+    """Run items through stages in turn; ``run`` yields them as they leave the last
+
+    A stage function returns the item to pass on. If it raises,
+    ``on_error(item, exc)`` decides what is passed on instead (None drops the
+    item); without it the error is printed and the item dropped.
+
+    If the consumer stops early (it raised, or closed the generator), the
+    run is cancelled. No more items are fed, items still inside skip the
+    remaining stages and are handed to ``on_discard(item)``, and the last
+    queue is drained in the background, so no stage thread stays blocked.
+    """
+
+    def __init__(self, stages, queue_size=16, on_error=None, on_discard=None):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.on_error = on_error
+        self.on_discard = on_discard
+        self.cancelled = threading.Event()
+        self.counters = [StageCounters(stage) for stage in stages]
+        self.started = None
+        self.finished = None
+
+    def _work(self, counters, inbox, outbox, downstream_workers):
+        stage = counters.stage
+        while True:
+            item = inbox.get()
+            if item is _END:
+                with counters.lock:
+                    counters.running -= 1
+                    last = counters.running == 0
+                if last:
+                    for _ in range(downstream_workers):
+                        outbox.put(_END)
+                return
+            if self.cancelled.is_set():
+                self._discard(item)
+                continue
+            depth = inbox.qsize()
+            start = time.perf_counter()
+            try:
+                item = stage.func(item)
+                failed = False
+            except Exception as e:
+                failed = True
+                if self.on_error is not None:
+                    item = self.on_error(item, e)
+                else:
+                    print(f"Error in pipeline stage {stage.name}: {e}")
+                    item = None
+            with counters.lock:
+                counters.busy += time.perf_counter() - start
+                counters.processed += 1
+                counters.errors += failed
+                counters.depth_total += depth
+                counters.max_depth = max(counters.max_depth, depth)
+            if item is not None:
+                outbox.put(item)
+
+    def _discard(self, item):
+        if self.on_discard is None:
+            return
+        try:
+            self.on_discard(item)
+        except Exception as e:
+            print(f"Error discarding pipeline item: {e}")
+
+    def _feed(self, items, inbox):
+        for item in items:
+            if self.cancelled.is_set():
+                self._discard(item)
+                break
+            inbox.put(item)
+        for _ in range(self.stages[0].workers):
+            inbox.put(_END)
+
+    def run(self, items):
+        """Feed ``items`` from a background thread and yield them in completion order"""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages] + [queue.Queue()]
+        self.started = time.perf_counter()
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), name='pipeline-feed', daemon=True)]
+        for position, counters in enumerate(self.counters):
+            downstream = self.stages[position + 1].workers if position + 1 < len(self.stages) else 1
+            for number in range(counters.stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work, args=(counters, queues[position], queues[position + 1], downstream),
+                    name=f'pipeline-{counters.stage.name}-{number}', daemon=True
+                ))
+        for thread in threads:
+            thread.start()
+
+        completed = False
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    completed = True
+                    break
+                yield item
+        finally:
+            if not completed:
+                self.cancel(queues[-1])
+            self.finished = time.perf_counter()
+
+    def cancel(self, outbox):
+        """Stop the run and drain its last queue from a background thread"""
+        self.cancelled.set()
+        threading.Thread(target=self._drain, args=(outbox,), name='pipeline-drain', daemon=True).start()
+
+    def _drain(self, outbox):
+        while True:
+            item = outbox.get()
+            if item is _END:
+                return
+            self._discard(item)
+
+    def snapshot(self):
+        """Per-stage counters of the last run"""
+        end = self.finished or time.perf_counter()
+        elapsed = end - self.started if self.started else 0.0
+        return {'elapsed_seconds': round(elapsed, 4), 'stages': [c.snapshot(elapsed) for c in self.counters]}
+
+
+class PipelineStats:
+    """Stage counters summed over every pipeline run in this process"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.runs = 0
+            self.elapsed = 0.0
+            self.stages = {}
+
+    def record(self, snapshot):
+        with self.lock:
+            self.runs += 1
+            self.elapsed += snapshot['elapsed_seconds']
+            for stage in snapshot['stages']:
+                totals = self.stages.setdefault(stage['stage'], {
+                    'workers': stage['workers'], 'processed': 0, 'errors': 0, 'busy_seconds': 0.0,
+                    'capacity_seconds': 0.0, 'max_queue_depth': 0
+                })
+                totals['workers'] = stage['workers']
+                totals['processed'] += stage['processed']
+                totals['errors'] += stage['errors']
+                totals['busy_seconds'] += stage['busy_seconds']
+                totals['capacity_seconds'] += stage['workers'] * snapshot['elapsed_seconds']
+                totals['max_queue_depth'] = max(totals['max_queue_depth'], stage['max_queue_depth'])
+
+    def snapshot(self):
+        with self.lock:
+            stages = {}
+            for name, totals in self.stages.items():
+                stage = {key: value for key, value in totals.items() if key != 'capacity_seconds'}
+                stage['busy_seconds'] = round(stage['busy_seconds'], 3)
+                stage['utilization'] = round(totals['busy_seconds'] / totals['capacity_seconds'], 3) \
+                    if totals['capacity_seconds'] else 0.0
+                stages[name] = stage
+            return {'runs': self.runs, 'elapsed_seconds': round(self.elapsed, 3), 'stages': stages}
+
+
+pipeline_stats = PipelineStats()
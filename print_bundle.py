@@ -0,0 +1,230 @@
+"""Merge uploaded marksheets into one printable PDF, streamed as it is built.
+
+Source PDFs are opened one at a time. The objects of each page are renumbered,
+written out and forgotten before the next file is opened, so memory stays
+bounded by the largest single marksheet however many are bundled. The
+optional cover page is drawn with a hand-written content stream using the
+standard Helvetica font, so nothing beyond PyPDF2 is needed.
+"""
+import io
+import zlib
+import PyPDF2
+from PyPDF2.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject
+)
+
+PAGE_WIDTH = 595   # A4, in points
+PAGE_HEIGHT = 842
+COVER_ROWS_PER_PAGE = 44
+
+# Object 1 is the catalog and object 2 the page tree; both are written last
+CATALOG_ID = 1
+PAGES_ID = 2
+
+
+def pdf_string(text):
+    """PDF literal string for WinAnsi text; unsupported characters become '?'"""
+    data = str(text).encode('cp1252', errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+def _value_pair(result, semester, key, fmt):
+    reported = result.get(f'{semester}reported', {}).get(key, 0)
+    calculated = result.get(f'{semester}calculated', {}).get(key, 0)
+    if not reported:
+        return '-'
+    return f'{fmt % reported} / {fmt % calculated}'
+
+
+def cover_page_contents(results, title):
+    """Content streams of the summary pages: one line per bundled marksheet"""
+    columns = [(40, 'File'), (215, 'Status'), (285, 'EGP'), (355, 'Credits'), (425, 'SGPA'), (490, 'Prev. SGPA')]
+    pages = []
+    chunks = [results[i:i + COVER_ROWS_PER_PAGE] for i in range(0, len(results), COVER_ROWS_PER_PAGE)] or [[]]
+    for number, chunk in enumerate(chunks, start=1):
+        ops = [b'BT /F2 14 Tf 40 800 Td ' + pdf_string(title) + b' Tj ET']
+        ops.append(b'BT /F1 8 Tf 40 784 Td ' + pdf_string(
+            f'{len(results)} marksheet(s), values shown as reported / calculated - page {number} of {len(chunks)}'
+        ) + b' Tj ET')
+        y = 760
+        for x, label in columns:
+            ops.append(b'BT /F2 9 Tf %d %d Td ' % (x, y) + pdf_string(label) + b' Tj ET')
+        ops.append(b'0.5 w 40 %d m 555 %d l S' % (y - 4, y - 4))
+        for result in chunk:
+            y -= 16
+            status = str(result.get('status', ''))
+            cells = [
+                result.get('filename', '')[:34],
+                status[2:] if status[:1] in '✅❌' else status,
+                _value_pair(result, '', 'egp', '%.1f'),
+                _value_pair(result, '', 'credits', '%.1f'),
+                _value_pair(result, '', 'sgpa', '%.2f'),
+                _value_pair(result, 'previous_', 'sgpa', '%.2f')
+            ]
+            for (x, _), cell in zip(columns, cells):
+                ops.append(b'BT /F1 8 Tf %d %d Td ' % (x, y) + pdf_string(cell) + b' Tj ET')
+        pages.append(b'\n'.join(ops))
+    return pages
+
+
+class BundleWriter:
+    """Writes a PDF incrementally; every method returns the bytes to send next"""
+
+    def __init__(self):
+        self.offsets = {}
+        self.position = 0
+        self.next_id = PAGES_ID + 1
+        self.page_ids = []
+
+    def _allocate(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def _emit(self, object_id, obj):
+        out = io.BytesIO()
+        out.write(b'%d 0 obj\n' % object_id)
+        obj.write_to_stream(out, None)
+        out.write(b'\nendobj\n')
+        self.offsets[object_id] = self.position
+        data = out.getvalue()
+        self.position += len(data)
+        return data
+
+    def header(self):
+        data = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self.position += len(data)
+        return data
+
+    def add_cover(self, contents):
+        """Cover pages from raw content streams"""
+        font_ids = []
+        chunks = []
+        for base_font in ('Helvetica', 'Helvetica-Bold'):
+            font = DictionaryObject({
+                NameObject('/Type'): NameObject('/Font'),
+                NameObject('/Subtype'): NameObject('/Type1'),
+                NameObject('/BaseFont'): NameObject('/' + base_font),
+                NameObject('/Encoding'): NameObject('/WinAnsiEncoding')
+            })
+            font_ids.append(self._allocate())
+            chunks.append(self._emit(font_ids[-1], font))
+        fonts = DictionaryObject({
+            NameObject('/F1'): IndirectObject(font_ids[0], 0, None),
+            NameObject('/F2'): IndirectObject(font_ids[1], 0, None)
+        })
+
+        for content in contents:
+            stream = StreamObject()
+            stream._data = zlib.compress(content)
+            stream[NameObject('/Filter')] = NameObject('/FlateDecode')
+            stream_id = self._allocate()
+            chunks.append(self._emit(stream_id, stream))
+            page = DictionaryObject({
+                NameObject('/Type'): NameObject('/Page'),
+                NameObject('/Parent'): IndirectObject(PAGES_ID, 0, None),
+                NameObject('/MediaBox'): ArrayObject([NumberObject(0), NumberObject(0),
+                                                      NumberObject(PAGE_WIDTH), NumberObject(PAGE_HEIGHT)]),
+                NameObject('/Resources'): DictionaryObject({NameObject('/Font'): fonts}),
+                NameObject('/Contents'): IndirectObject(stream_id, 0, None)
+            })
+            self.page_ids.append(self._allocate())
+            chunks.append(self._emit(self.page_ids[-1], page))
+        return b''.join(chunks)
+
+    def add_document(self, source):
+        """Copy every page of a PDF; yields the bytes object by object"""
+        reader = PyPDF2.PdfReader(source)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        mapping = {}
+        pending = []
+
+        def renumber(reference):
+            target = reference.get_object()
+            # Links back into the source page tree point at the bundle's tree
+            if isinstance(target, DictionaryObject) and target.get('/Type') == '/Pages':
+                return IndirectObject(PAGES_ID, 0, None)
+            if reference.idnum not in mapping:
+                mapping[reference.idnum] = self._allocate()
+                pending.append(reference)
+            return IndirectObject(mapping[reference.idnum], 0, None)
+
+        def copy(obj):
+            if isinstance(obj, IndirectObject):
+                return renumber(obj)
+            if isinstance(obj, StreamObject):
+                result = obj.__class__()
+                result._data = obj._data
+            elif isinstance(obj, DictionaryObject):
+                result = DictionaryObject()
+            elif isinstance(obj, ArrayObject):
+                return ArrayObject([copy(item) for item in obj])
+            else:
+                return obj
+            for key, value in obj.items():
+                if key != '/Parent':
+                    result[NameObject(key)] = copy(value)
+            return result
+
+        for page in reader.pages:
+            page_id = self._allocate()
+            page_copy = copy(page)
+            page_copy[NameObject('/Parent')] = IndirectObject(PAGES_ID, 0, None)
+            self.page_ids.append(page_id)
+            yield self._emit(page_id, page_copy)
+            while pending:
+                reference = pending.pop()
+                obj = copy(reference.get_object())
+                if isinstance(obj, DictionaryObject) and obj.get('/Type') == '/Page':
+                    obj[NameObject('/Parent')] = IndirectObject(PAGES_ID, 0, None)
+                yield self._emit(mapping[reference.idnum], obj)
+
+    def trailer(self):
+        pages = DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject([IndirectObject(i, 0, None) for i in self.page_ids]),
+            NameObject('/Count'): NumberObject(len(self.page_ids))
+        })
+        catalog = DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(PAGES_ID, 0, None)
+        })
+        data = self._emit(PAGES_ID, pages) + self._emit(CATALOG_ID, catalog)
+
+        xref_offset = self.position
+        lines = [b'xref', b'0 %d' % self.next_id, b'0000000000 65535 f ']
+        for object_id in range(1, self.next_id):
+            # Ids allocated for objects that were never written stay free
+            if object_id in self.offsets:
+                lines.append(b'%010d 00000 n ' % self.offsets[object_id])
+            else:
+                lines.append(b'0000000000 65535 f ')
+        lines.append(b'trailer')
+        lines.append(b'<< /Size %d /Root %d 0 R >>' % (self.next_id, CATALOG_ID))
+        lines.append(b'startxref')
+        lines.append(b'%d' % xref_offset)
+        lines.append(b'%%EOF\n')
+        return data + b'\n'.join(lines)
+
+
+def stream_bundle(entries, title='Marksheet verification summary', cover=True, open_file=None):
+    """Yield a merged PDF of (pdf path, bulk result) entries, optionally with a cover
+
+    ``open_file(path)`` returns a seekable binary file (plain ``open`` by
+    default). Files that cannot be read are left out rather than failing the
+    bundle.
+    """
+    open_file = open_file or (lambda path: open(path, 'rb'))
+    writer = BundleWriter()
+    yield writer.header()
+    if cover:
+        yield writer.add_cover(cover_page_contents([result for _, result in entries], title))
+    for path, result in entries:
+        try:
+            with open_file(path) as f:
+                for chunk in writer.add_document(f):
+                    yield chunk
+        except Exception as e:
+            print(f"Error adding {path} to print bundle: {e}")
+    yield writer.trailer()
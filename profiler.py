@@ -0,0 +1,173 @@
+"""On-demand sampling profiler and memory snapshots for a running server.
+
+Verification runs in short-lived isolated child processes, so the sampler
+runs inside the child: a background thread reads the main thread's stack
+from ``sys._current_frames()`` every few milliseconds and counts folded
+stacks. The parent merges them, prefixed with the upload's filename and
+extractor, into output that flamegraph.pl or speedscope read directly.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, interval=0.005, thread_id=None, root=None):
+        self.interval = interval
+        self.thread_id = thread_id or threading.get_ident()
+        # Frames from this code object outwards (e.g. the forking server
+        # thread a child inherited) are left out of the stacks
+        self.root = root
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None or self._stop.is_set():
+                continue
+            stack = []
+            while frame is not None and frame.f_code is not self.root:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class SampledCall:
+    """Callable wrapper that returns (value, folded stack counts) of func(*args)"""
+
+    def __init__(self, func, interval):
+        self.func = func
+        self.interval = interval
+
+    def __call__(self, *args):
+        sampler = StackSampler(self.interval, root=SampledCall.__call__.__code__).start()
+        try:
+            value = self.func(*args)
+        finally:
+            stacks = sampler.stop()
+        return value, dict(stacks)
+
+
+class RequestProfiler:
+    """Profiles the next N upload requests once armed by an admin"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.remaining = 0
+        self.interval = 0.005
+        self.stacks = Counter()
+        self.documents = []
+
+    def arm(self, requests, interval):
+        with self.lock:
+            self.remaining = requests
+            self.interval = interval
+
+    def claim(self):
+        """True if the current request should be profiled"""
+        if not self.remaining:
+            return False
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def wrap(self, func):
+        return SampledCall(func, self.interval)
+
+    def record(self, filename, extractor, stacks):
+        prefix = f"{filename or 'unknown'};{extractor or 'unknown'}".replace(' ', '_')
+        with self.lock:
+            for stack, count in stacks.items():
+                self.stacks[f'{prefix};{stack}'] += count
+            self.documents.append({
+                'filename': filename,
+                'extractor': extractor,
+                'samples': sum(stacks.values()),
+                'seconds': round(sum(stacks.values()) * self.interval, 3)
+            })
+
+    def folded(self):
+        with self.lock:
+            return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items()))
+
+    def clear(self):
+        with self.lock:
+            self.stacks.clear()
+            self.documents = []
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'remaining_requests': self.remaining,
+                'interval': self.interval,
+                'stacks': len(self.stacks),
+                'documents': list(self.documents)
+            }
+
+
+class MemoryTracker:
+    """tracemalloc snapshots of this process, each diffed against the previous one"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.previous = None
+
+    def start(self, frames=25):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.previous = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self.previous = None
+
+    @staticmethod
+    def _format(stat):
+        frame = stat.traceback[0]
+        return {'location': f'{frame.filename}:{frame.lineno}', 'size': stat.size, 'count': stat.count}
+
+    def snapshot(self, key='lineno', top=20):
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        report = {
+            'taken_at': time.time(),
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'top': [self._format(stat) for stat in snapshot.statistics(key)[:top]]
+        }
+        with self.lock:
+            if self.previous is not None:
+                report['diff'] = [
+                    dict(self._format(stat), size_diff=stat.size_diff, count_diff=stat.count_diff)
+                    for stat in snapshot.compare_to(self.previous, key)[:top]
+                ]
+            self.previous = snapshot
+        return report
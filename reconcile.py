@@ -0,0 +1,256 @@
+"""Reconcile bulk verification results against the exam section's roster.
+
+The roster CSV (roll number or PRN, semester, SGPA, credits) is loaded once
+into columns plus a dict index keyed by (student id, semester). Each bulk
+result is then looked up by the identifiers parsed from its marksheet header
+(a hash join), and the report is produced row by row so a large batch can be
+streamed to the client as it is compared.
+"""
+import csv
+import io
+import re
+from extractors.base_extractor import semester_number
+from verification import is_values_match
+
+# Roster header names (lower case, letters and digits only) for each column
+ID_COLUMNS = (
+    'prn', 'prnno', 'prnnumber', 'rollno', 'rollnumber', 'roll', 'seatno', 'seatnumber',
+    'enrollmentno', 'enrolmentno', 'enrollmentnumber', 'enrolmentnumber', 'studentid', 'id'
+)
+SEMESTER_COLUMNS = ('semester', 'sem', 'semesterno')
+SGPA_COLUMNS = ('sgpa', 'gpa')
+CREDITS_COLUMNS = ('credits', 'totalcredits', 'creditsearned', 'earnedcredits')
+NAME_COLUMNS = ('name', 'studentname', 'nameofstudent')
+
+# Header identifiers tried against the roster, in order
+STUDENT_ID_FIELDS = ('prn', 'roll_number', 'seat_number', 'enrollment_number')
+
+REPORT_FIELDS = (
+    'outcome', 'filename', 'student_id', 'semester', 'name', 'roster_line',
+    'sgpa_roster', 'sgpa_reported', 'sgpa_calculated',
+    'credits_roster', 'credits_reported', 'credits_calculated', 'problems'
+)
+
+# Outcome of a result that agrees with the roster, reported only on request
+MATCHED = 'match'
+
+
+class RosterError(ValueError):
+    pass
+
+
+ID_SEPARATORS = re.compile(r'[\s\-/]')
+
+
+def normalize_id(value):
+    """Join key for a student id: case, spaces, dashes and the leading zeros
+    spreadsheets drop from numeric ids do not matter"""
+    value = str(value or '').strip()
+    if not value.isdigit():
+        value = ID_SEPARATORS.sub('', value).upper()
+        if not value.isdigit():
+            return value
+    return value.lstrip('0') or '0'
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _column(header, names):
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+class Roster:
+    """Roster rows held column-wise with a hash index on (student id, semester)"""
+
+    def __init__(self):
+        self.ids = []
+        self.semesters = []
+        self.sgpa = []
+        self.credits = []
+        self.names = []
+        self.lines = []
+        # (student id, semester) -> row, and student id -> rows for marksheets
+        # or rosters without a semester
+        self.index = {}
+        self.by_id = {}
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_csv(cls, stream):
+        """Load a roster from a text stream of CSV with a header row"""
+        reader = csv.reader(stream)
+        try:
+            header = [re.sub(r'[^a-z0-9]', '', name.lower()) for name in next(reader)]
+        except StopIteration:
+            raise RosterError('The roster is empty')
+        id_col = _column(header, ID_COLUMNS)
+        if id_col is None:
+            raise RosterError('The roster has no roll number, PRN or seat number column')
+        semester_col = _column(header, SEMESTER_COLUMNS)
+        sgpa_col = _column(header, SGPA_COLUMNS)
+        credits_col = _column(header, CREDITS_COLUMNS)
+        if sgpa_col is None and credits_col is None:
+            raise RosterError('The roster has neither an SGPA nor a credits column')
+        name_col = _column(header, NAME_COLUMNS)
+        width = len(header)
+
+        roster = cls()
+        index = roster.index
+        by_id = roster.by_id
+        # A roster spells its few semesters the same way on every row
+        semester_numbers = {}
+        for row in reader:
+            if len(row) < width:
+                if not any(row):
+                    continue
+                row = row + [''] * (width - len(row))
+            student_id = normalize_id(row[id_col])
+            if not student_id:
+                continue
+            semester = None
+            if semester_col is not None:
+                semester = semester_numbers.get(row[semester_col], False)
+                if semester is False:
+                    semester = semester_numbers[row[semester_col]] = semester_number(row[semester_col])
+            position = len(roster.ids)
+            roster.ids.append(row[id_col].strip())
+            roster.semesters.append(semester)
+            roster.sgpa.append(_number(row[sgpa_col]) if sgpa_col is not None else None)
+            roster.credits.append(_number(row[credits_col]) if credits_col is not None else None)
+            roster.names.append(row[name_col].strip() if name_col is not None else '')
+            roster.lines.append(reader.line_num)
+            key = (student_id, semester)
+            if key in index:
+                roster.duplicates += 1
+            else:
+                index[key] = position
+            by_id.setdefault(student_id, []).append(position)
+        return roster
+
+    def find(self, student_id, semester):
+        """Row of a student's semester; ``'ambiguous'`` when the semester is
+        needed to choose between rows and is not known"""
+        student_id = normalize_id(student_id)
+        if semester is not None:
+            position = self.index.get((student_id, semester))
+            if position is not None:
+                return position
+            # Roster without a semester column
+            position = self.index.get((student_id, None))
+            if position is not None:
+                return position
+            return None
+        rows = self.by_id.get(student_id)
+        if not rows:
+            return None
+        return rows[0] if len(rows) == 1 else 'ambiguous'
+
+
+def _report_row(outcome, entry=None, info=None, roster=None, position=None, problems=()):
+    info = info or {}
+    row = dict.fromkeys(REPORT_FIELDS, '')
+    row['outcome'] = outcome
+    row['problems'] = '; '.join(problems)
+    if entry is not None:
+        row['filename'] = entry.get('filename', '')
+        row['student_id'] = next((info[f] for f in STUDENT_ID_FIELDS if info.get(f)), '')
+        row['semester'] = info.get('semester', '')
+        row['name'] = info.get('name', '')
+        for key in ('sgpa', 'credits'):
+            row[f'{key}_reported'] = entry.get('reported', {}).get(key, '')
+            row[f'{key}_calculated'] = entry.get('calculated', {}).get(key, '')
+    if position is not None:
+        row['roster_line'] = roster.lines[position]
+        row['sgpa_roster'] = '' if roster.sgpa[position] is None else roster.sgpa[position]
+        row['credits_roster'] = '' if roster.credits[position] is None else roster.credits[position]
+        if entry is None:
+            row['student_id'] = roster.ids[position]
+            row['semester'] = roster.semesters[position] or ''
+            row['name'] = roster.names[position]
+    return row
+
+
+def compare(entry, roster, position):
+    """Fields where a marksheet disagrees with its roster row"""
+    problems = []
+    for key, values in (('sgpa', roster.sgpa), ('credits', roster.credits)):
+        expected = values[position]
+        if expected is None:
+            continue
+        for side in ('reported', 'calculated'):
+            value = entry.get(side, {}).get(key, 0)
+            if not is_values_match(value, expected, key):
+                problems.append(f'{key} {side} {value} != roster {expected}')
+    return problems
+
+
+def reconcile(roster, results, include_matches=False, report_missing=True):
+    """Yield a report row for every bulk result that does not agree with the
+    roster, then one for every roster row of the batch's semesters that no
+    marksheet was found for"""
+    seen = bytearray(len(roster))
+    semesters = set()
+    for entry in results:
+        if entry.get('duplicate_of'):
+            continue
+        info = entry.get('student_info') or {}
+        semesters.add(info.get('semester'))
+        ids = [info[f] for f in STUDENT_ID_FIELDS if info.get(f)]
+        if not ids:
+            yield _report_row('no_identifier', entry, info)
+            continue
+        position = None
+        for student_id in ids:
+            position = roster.find(student_id, info.get('semester'))
+            if position is not None:
+                break
+        if position is None:
+            yield _report_row('not_in_roster', entry, info)
+            continue
+        if position == 'ambiguous':
+            yield _report_row('ambiguous', entry, info, problems=['semester not found on the marksheet'])
+            continue
+        seen[position] = 1
+        if entry.get('error'):
+            yield _report_row('unverified', entry, info, roster, position, [str(entry['error'])])
+            continue
+        problems = compare(entry, roster, position)
+        if problems:
+            yield _report_row('mismatch', entry, info, roster, position, problems)
+        elif include_matches:
+            yield _report_row(MATCHED, entry, info, roster, position)
+
+    if not report_missing:
+        return
+    # A marksheet without a readable semester could be any roster semester
+    every_semester = None in semesters
+    position = seen.find(0)
+    while position != -1:
+        if every_semester or roster.semesters[position] in semesters or roster.semesters[position] is None:
+            yield _report_row('missing_marksheet', roster=roster, position=position)
+        position = seen.find(0, position + 1)
+
+
+def report_csv(rows, chunk_size=65536):
+    """CSV text of report rows in chunks of about ``chunk_size`` characters"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=REPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,106 @@
+"""Rendered single-upload results, cached by PDF hash and code version.
+
+The first upload of a marksheet renders the ``content`` block of its result
+template once. That fragment is stored with the result's JSON payload as one
+gzip-compressed file, keyed by the PDF's SHA-256, a hash of the result
+templates and a hash of everything extraction depends on (extractor code,
+course catalog, table profiles). Uploading the same PDF again, or opening
+``/result/<sha256>``, then serves the stored fragment inside the page layout
+without reading the PDF. Changing any of those changes the version, so stale
+fragments are never served; they age out under the size budget like
+thumbnails.
+
+The cumulative CGPA check depends on the other marksheets on record, so it
+is re-run on every hit and the fragment re-rendered when it has changed.
+"""
+import glob
+import gzip
+import hashlib
+import json
+import os
+import time
+from extractors.course_catalog import CATALOG_PATH
+from extractors.table_profiles import PROFILES_PATH
+from thumbnails import ThumbnailCache
+
+RESULT_TEMPLATES = ('results.html', 'double_semester_results.html', 'cumulative_check.html')
+ROOT = os.path.dirname(os.path.abspath(__file__))
+EXTRACTION_SOURCES = ('extractors/*.py', 'extractor_factory.py', 'verification.py')
+
+
+def template_version(jinja_env, names=RESULT_TEMPLATES):
+    """Short hash of the result templates' source"""
+    digest = hashlib.sha256()
+    for name in names:
+        source, _, _ = jinja_env.loader.get_source(jinja_env, name)
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def extraction_version(sources=EXTRACTION_SOURCES, data_files=(CATALOG_PATH, PROFILES_PATH)):
+    """Short hash of the extraction code and the data files it loads"""
+    digest = hashlib.sha256()
+    paths = sorted(path for pattern in sources for path in glob.glob(os.path.join(ROOT, pattern)))
+    for path in paths + list(data_files):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b'-')  # an optional file that is not there
+    return digest.hexdigest()[:12]
+
+
+def render_fragment(app, template_name, **context):
+    """The rendered ``content`` block of a page template"""
+    template = app.jinja_env.get_template(template_name)
+    app.update_template_context(context)
+    return ''.join(template.blocks['content'](template.new_context(context)))
+
+
+def is_cacheable(result):
+    return not result.get('error')
+
+
+def same_check(check, cached):
+    """Whether a fresh cumulative check matches the one stored in an entry"""
+    return json.loads(json.dumps(check, default=str)) == cached
+
+
+class ResultCache(ThumbnailCache):
+    """Compressed result fragments on disk, kept under ``max_bytes``"""
+
+    SUFFIX = '.json.gz'
+
+    def __init__(self, directory, max_bytes, version):
+        super().__init__(directory, max_bytes)
+        self.version = version
+
+    def key(self, digest):
+        return f'{digest}-{self.version}'
+
+    def load(self, digest):
+        """Cached entry of a PDF for the current templates, or None"""
+        path = self.get(self.key(digest))
+        if path is None:
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error reading cached result {path}: {e}")
+            return None
+
+    def store(self, digest, filename, template, fragment, payload):
+        """Keep a rendered fragment, its template name and its JSON payload for later visits"""
+        entry = {'filename': filename, 'template': template, 'fragment': fragment, 'payload': payload,
+                 'created': time.time()}
+        path = self.path(self.key(digest))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        data = json.dumps(entry, ensure_ascii=False, default=str).encode('utf-8')
+        with open(tmp_path, 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=6))
+        os.replace(tmp_path, path)
+        self.added(os.path.getsize(path))
+        return entry
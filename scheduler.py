@@ -0,0 +1,144 @@
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from isolation import run_isolated
+
+LANE_INTERACTIVE = 'interactive'
+LANE_BULK = 'bulk'
+
+
+class LaneStats:
+    """Queue-wait accounting for one lane"""
+
+    def __init__(self, window=1000):
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=window)
+
+    def record_start(self, wait):
+        self.started += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.recent_waits.append(wait)
+
+    def snapshot(self, depth):
+        recent = sorted(self.recent_waits)
+        return {
+            'queued': depth,
+            'submitted': self.submitted,
+            'running': self.started - self.completed,
+            'completed': self.completed,
+            'wait_mean': round(self.total_wait / self.started, 4) if self.started else 0.0,
+            'wait_p95': round(recent[int(0.95 * (len(recent) - 1))], 4) if recent else 0.0,
+            'wait_max': round(self.max_wait, 4)
+        }
+
+
+class PriorityScheduler:
+    """Fixed worker slots shared by an interactive lane and a bulk lane
+
+    Interactive jobs always take the next free worker. Bulk jobs are queued
+    per batch and the batches are served round-robin, so one large batch
+    cannot hold back a smaller one submitted after it.
+    """
+
+    def __init__(self, workers):
+        self.workers = max(1, workers)
+        self.condition = threading.Condition()
+        self.interactive = deque()
+        self.batches = OrderedDict()
+        self.stats = {LANE_INTERACTIVE: LaneStats(), LANE_BULK: LaneStats()}
+        self.batch_ids = itertools.count(1)
+        self.threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'verify-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def new_batch(self):
+        return next(self.batch_ids)
+
+    def submit(self, lane, func, *args, batch=None):
+        """Queue func(*args) on a lane and return a Future for its result"""
+        future = Future()
+        job = (future, func, args, time.monotonic())
+        with self.condition:
+            if lane == LANE_INTERACTIVE:
+                self.interactive.append(job)
+            else:
+                self.batches.setdefault(batch, deque()).append(job)
+            self.stats[lane].submitted += 1
+            self.condition.notify()
+        return future
+
+    def _next_job(self):
+        if self.interactive:
+            return LANE_INTERACTIVE, self.interactive.popleft()
+        if self.batches:
+            batch, jobs = next(iter(self.batches.items()))
+            job = jobs.popleft()
+            # Rotate the batch to the back so batches take turns
+            del self.batches[batch]
+            if jobs:
+                self.batches[batch] = jobs
+            return LANE_BULK, job
+        return None, None
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                lane, job = self._next_job()
+                while job is None:
+                    self.condition.wait()
+                    lane, job = self._next_job()
+                future, func, args, queued_at = job
+                self.stats[lane].record_start(time.monotonic() - queued_at)
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self.condition:
+                self.stats[lane].completed += 1
+
+    def snapshot(self):
+        with self.condition:
+            return {
+                'workers': self.workers,
+                LANE_INTERACTIVE: self.stats[LANE_INTERACTIVE].snapshot(len(self.interactive)),
+                LANE_BULK: dict(self.stats[LANE_BULK].snapshot(sum(len(j) for j in self.batches.values())),
+                                batches=len(self.batches))
+            }
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(workers):
+    """Per-process scheduler, started lazily so forked servers get their own threads"""
+    global _scheduler, _scheduler_pid
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler_pid != os.getpid():
+            _scheduler = PriorityScheduler(workers)
+            _scheduler_pid = os.getpid()
+        return _scheduler
+
+
+def submit_isolated(config, lane, func, *args, batch=None):
+    """Queue func(*args) to run in an isolated, budgeted process
+
+    The returned Future resolves to an IsolatedOutcome.
+    """
+    scheduler = get_scheduler(config['WORKERS'])
+    return scheduler.submit(lane, run_isolated, func, args, config['FILE_TIMEOUT'],
+                            config['FILE_MEMORY_LIMIT'], batch=batch)
@@ -0,0 +1,111 @@
+"""Compare the space saved by archiving uploads with the cost of reading them back.
+
+The sample PDFs are archived once per compression method into a scratch
+folder. For every method the script reports the bundle size against the plain
+files and the time to first byte and to the full file when streamed back, as
+``/pdf/<filename>`` would send it. Plain files are the baseline.
+
+Usage:
+    python scripts/bench_cold_storage.py uploads/ [--methods deflated lzma] [--repeat 5]
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cold_storage import CHUNK_SIZE, COMPRESSION, ColdStore
+
+
+def collect_pdfs(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith('.pdf'):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def time_plain(path):
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        f.read(CHUNK_SIZE)
+        first = time.perf_counter() - start
+        while f.read(CHUNK_SIZE):
+            pass
+    return first, time.perf_counter() - start
+
+
+def time_archived(store, filename):
+    start = time.perf_counter()
+    first = None
+    for _ in store.stream(store.lookup(filename)):
+        if first is None:
+            first = time.perf_counter() - start
+    return first or 0.0, time.perf_counter() - start
+
+
+def measure(timer, names, repeat):
+    """Median (first byte, full read) milliseconds over every file and run"""
+    firsts, totals = [], []
+    for name in names:
+        for _ in range(repeat):
+            first, total = timer(name)
+            firsts.append(first * 1000)
+            totals.append(total * 1000)
+    return statistics.median(firsts), statistics.median(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='PDF files or directories')
+    parser.add_argument('--methods', nargs='+', choices=sorted(COMPRESSION), default=['stored', 'deflated', 'bzip2', 'lzma'])
+    parser.add_argument('--repeat', type=int, default=5, help='reads per file and method')
+    args = parser.parse_args()
+
+    pdfs = list(collect_pdfs(args.paths))
+    if not pdfs:
+        print('No PDF files found')
+        return
+
+    scratch = tempfile.mkdtemp(prefix='cold-bench-')
+    try:
+        uploads = os.path.join(scratch, 'uploads')
+        os.makedirs(uploads)
+        names = []
+        for path in pdfs:
+            name = os.path.basename(path)
+            if name not in names:
+                shutil.copyfile(path, os.path.join(uploads, name))
+                names.append(name)
+        plain_bytes = sum(os.path.getsize(os.path.join(uploads, name)) for name in names)
+
+        first, total = measure(lambda name: time_plain(os.path.join(uploads, name)), names, args.repeat)
+        print(f'{len(names)} PDFs, {plain_bytes / 1024:.0f} KiB\n')
+        print(f"{'method':10} {'KiB':>9} {'ratio':>7} {'archive s':>10} {'first ms':>9} {'full ms':>9}")
+        print(f"{'plain':10} {plain_bytes / 1024:9.0f} {1:7.3f} {'-':>10} {first:9.2f} {total:9.2f}")
+
+        for method in args.methods:
+            work = os.path.join(scratch, method)
+            shutil.copytree(uploads, work)
+            store = ColdStore(work, os.path.join(scratch, f'{method}-archive'), method)
+            start = time.perf_counter()
+            # A negative age archives everything, however recently it was copied
+            store.archive(-60)
+            elapsed = time.perf_counter() - start
+            archived = sum(entry.stat().st_size for entry in os.scandir(store.archive_folder)
+                           if entry.name.endswith('.zip'))
+            first, total = measure(lambda name: time_archived(store, name), names, args.repeat)
+            print(f'{method:10} {archived / 1024:9.0f} {archived / plain_bytes:7.3f} {elapsed:10.2f} '
+                  f'{first:9.2f} {total:9.2f}')
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark and accuracy check of layout-template extraction.
+
+Runs every PDF through the current table-based extraction and through the
+coordinate layout templates, then compares timing, extracted courses and
+verification status.
+
+Usage:
+    python scripts/bench_layout.py marksheets/ [--save-templates extractors/layout_templates.json]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber
+from extractors.layout_templates import LayoutTemplateRegistry, layout_page_lines
+from verification import select_extractor
+
+
+def course_set(result):
+    return {(c['course_code'], c.get('semester'), c['credit'], c['earned'], c['grade'])
+            for c in result.get('all_courses', [])}
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - start
+
+
+def learn_template(extractor, pdf_path):
+    template = None
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            _, template = layout_page_lines(page, extractor.student_type, template,
+                                            extractor.layout_labels, extractor.is_valid_course_code)
+            if template is not None:
+                return template
+    return None
+
+
+def collect_pdfs(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith('.pdf'):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='PDF files or directories')
+    parser.add_argument('--save-templates', metavar='PATH',
+                        help='write the first template learned for each format to PATH')
+    args = parser.parse_args()
+
+    table_times, layout_times = [], []
+    same_courses = same_status = total = 0
+    learned = LayoutTemplateRegistry()
+
+    for pdf_path in collect_pdfs(args.paths):
+        extractor = select_extractor(pdf_path)
+
+        table_text, table_extract = timed(extractor.extract_text_from_pdf, pdf_path)
+        table_result, table_parse = timed(extractor.process_text, table_text)
+        layout_text, layout_extract = timed(extractor.extract_text_layout, pdf_path)
+        layout_result, layout_parse = timed(extractor.process_text, layout_text)
+
+        table_times.append(table_extract + table_parse)
+        layout_times.append(layout_extract + layout_parse)
+        courses_match = course_set(table_result) == course_set(layout_result)
+        status_match = table_result.get('status') == layout_result.get('status')
+        same_courses += courses_match
+        same_status += status_match
+        total += 1
+
+        print(f"{os.path.basename(pdf_path):40} {extractor.student_type:36} "
+              f"tables {table_times[-1] * 1000:7.1f} ms  layout {layout_times[-1] * 1000:7.1f} ms  "
+              f"courses {'same' if courses_match else 'DIFF'}  status {'same' if status_match else 'DIFF'}")
+
+        if args.save_templates and learned.get(extractor.student_type) is None:
+            template = learn_template(extractor, pdf_path)
+            if template is not None:
+                learned.add(template)
+
+    if not total:
+        print('No PDF files found')
+        return
+
+    print()
+    print(f'documents: {total}')
+    print(f'tables: mean {statistics.mean(table_times) * 1000:.1f} ms, '
+          f'layout: mean {statistics.mean(layout_times) * 1000:.1f} ms, '
+          f'speedup x{statistics.mean(table_times) / max(statistics.mean(layout_times), 1e-9):.1f}')
+    print(f'same courses: {same_courses}/{total}, same status: {same_status}/{total}')
+
+    if args.save_templates:
+        learned.save(args.save_templates)
+        print(f'saved {len(learned.templates)} template(s) to {args.save_templates}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Measure single-upload latency percentiles at a given concurrency.
+
+Usage:
+    python scripts/loadtest.py marksheet.pdf --url http://localhost:5000/upload \
+        --requests 200 --concurrency 8
+"""
+import argparse
+import os
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+def build_multipart(field, filename, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\n'
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        'Content-Type: application/pdf\r\n\r\n'
+    ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def send_one(url, field, filename, data):
+    body, content_type = build_multipart(field, filename, data)
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as response:
+            response.read()
+            # /upload redirects back to the index page on failure
+            ok = response.status == 200 and response.geturl() == url
+    except urllib.error.URLError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', help='marksheet PDF to upload')
+    parser.add_argument('--url', default='http://localhost:5000/upload')
+    parser.add_argument('--field', default='file', help="multipart field name ('files' for the JSON API)")
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    with open(args.pdf, 'rb') as f:
+        data = f.read()
+    filename = os.path.basename(args.pdf)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        outcomes = list(pool.map(lambda _: send_one(args.url, args.field, filename, data), range(args.requests)))
+    wall = time.perf_counter() - wall_start
+
+    latencies = sorted(latency for latency, ok in outcomes if ok)
+    errors = sum(1 for _, ok in outcomes if not ok)
+
+    print(f'requests: {args.requests}  concurrency: {args.concurrency}  errors: {errors}')
+    print(f'throughput: {args.requests / wall:.2f} req/s over {wall:.1f}s')
+    if latencies:
+        print(f'mean: {statistics.mean(latencies) * 1000:.0f} ms')
+        for pct in (50, 90, 95, 99):
+            print(f'p{pct}: {percentile(latencies, pct) * 1000:.0f} ms')
+        print(f'max: {latencies[-1] * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
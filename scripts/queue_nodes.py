@@ -0,0 +1,65 @@
+"""Run several local worker processes against one job queue database.
+
+Each process stands in for a node sharing the volume. The PDFs are queued as
+one batch, and the script reports which worker finished each job. With
+--kill-one, one worker is killed mid-batch to show its leased jobs expiring
+and being picked up by the others.
+
+Usage:
+    python scripts/queue_nodes.py marksheets/*.pdf --nodes 3 --threads 2
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from job_queue import JobQueue  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdfs', nargs='+')
+    parser.add_argument('--db', help='Queue database (default: a temporary file)')
+    parser.add_argument('--nodes', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--lease', type=float, default=5)
+    parser.add_argument('--kill-one', action='store_true')
+    args = parser.parse_args()
+
+    db = args.db or os.path.join(tempfile.mkdtemp(), 'jobs.db')
+    queue = JobQueue(db, args.lease)
+    batch = queue.enqueue_batch('verify_bulk_file', [(os.path.abspath(path), None) for path in args.pdfs])
+    print(f'Queued {len(args.pdfs)} file(s) as batch {batch} in {db}')
+
+    command = [sys.executable, os.path.join(ROOT, 'job_queue.py'), 'worker', '--db', db,
+               '--threads', str(args.threads), '--lease', str(args.lease)]
+    nodes = [subprocess.Popen(command, cwd=ROOT) for _ in range(args.nodes)]
+    start = time.perf_counter()
+    try:
+        if args.kill_one:
+            time.sleep(1)
+            nodes[0].kill()
+            print(f'Killed worker pid {nodes[0].pid}')
+        results = queue.wait_batch(batch)
+    finally:
+        for node in nodes:
+            node.terminate()
+        for node in nodes:
+            node.wait()
+
+    elapsed = time.perf_counter() - start
+    print(f'Finished in {elapsed:.2f}s')
+    for owner, count in sorted(queue.completed_by(batch).items()):
+        print(f'  {owner}: {count} job(s)')
+    for path, (state, result, error) in zip(args.pdfs, results):
+        status = result['status'] if result else error
+        print(f'  {os.path.basename(path)}: {state} {status}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Re-run the extractors over stored page representations, without the PDFs.
+
+Page representations are written to PAGE_IR_DIR whenever the app (or this
+script with --build) processes a PDF with PAGE_IR_DIR set.
+
+Usage:
+    PAGE_IR_DIR=ir_cache python scripts/reparse_ir.py --build archive/
+    python scripts/reparse_ir.py ir_cache/ [--json results.jsonl]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors.base_extractor import BaseExtractor
+from extractors.page_ir import LINES_OCR, LINES_PYPDF2, LINES_TEXT_LAYER, PAGE_IR_DIR, PageIR
+from verification import select_extractor_from_text
+
+
+def walk(directory, suffix):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith(suffix):
+                yield os.path.join(root, name)
+
+
+def reparse(ir_dir, json_path=None):
+    out = open(json_path, 'w') if json_path else None
+    counts = {}
+    start = time.perf_counter()
+    total = 0
+
+    for path in walk(ir_dir, '.pir'):
+        with PageIR(path) as ir:
+            first_page_text = '\n'.join(ir.lines(0, LINES_PYPDF2)) if ir.page_count else ''
+            text = ir.text(LINES_TEXT_LAYER) or ir.text(LINES_OCR)
+            extractor = select_extractor_from_text(first_page_text, text)
+            result = extractor.process_ir(ir)
+
+        total += 1
+        status = result.get('status', result.get('error', 'Unknown'))
+        counts[status] = counts.get(status, 0) + 1
+        if out:
+            result['ir_file'] = os.path.basename(path)
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+    elapsed = time.perf_counter() - start
+    if out:
+        out.close()
+    print(f'{total} documents re-parsed in {elapsed:.2f}s')
+    for status, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f'  {count:6}  {status}')
+
+
+def build(pdf_dir):
+    if not PAGE_IR_DIR:
+        sys.exit('Set PAGE_IR_DIR to the directory the page representations should go to')
+    extractor = BaseExtractor()
+    for pdf_path in walk(pdf_dir, '.pdf'):
+        try:
+            extractor.load_page_ir(pdf_path).close()
+        except Exception as e:
+            print(f'{pdf_path}: {e}')
+    print(f'page representations written to {PAGE_IR_DIR}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help='page representation directory (or PDF directory with --build)')
+    parser.add_argument('--build', action='store_true', help='build page representations for the PDFs in directory')
+    parser.add_argument('--json', metavar='PATH', help='write every result as a JSON line to PATH')
+    args = parser.parse_args()
+
+    if args.build:
+        build(args.directory)
+    else:
+        reparse(args.directory, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Tune pdfplumber table settings per marksheet format on a labelled sample.
+
+Every PDF is run through the table rung (table extraction plus parsing) with
+each candidate setting: line/text strategies, snap and join tolerances, and
+with or without cropping to the area where the format's tables were found.
+For each format the cheapest candidate whose accuracy is within
+``--tolerance`` of the best is written to the table profile, which the
+extractors load at startup.
+
+The labels file is a CSV with ``filename`` and ``status`` (correct / wrong)
+columns and an optional ``courses`` column with the expected course count.
+Without labels, the full extraction ladder's verdict is used as the reference.
+
+Usage:
+    python scripts/tune_tables.py marksheets/ --labels labels.csv [--output extractors/table_profiles.json]
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber
+from extractors import table_profiles
+from verification import select_extractor
+
+STRATEGIES = [('lines', 'lines'), ('lines', 'text'), ('text', 'lines'), ('text', 'text')]
+SNAP_TOLERANCES = [1, 3, 5]
+JOIN_TOLERANCES = [3, 6]
+CROP_PADDING = 0.02
+
+
+def collect_pdfs(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in sorted(files):
+                    if name.lower().endswith('.pdf'):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def load_labels(path):
+    labels = {}
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+            if not row.get('filename'):
+                continue
+            courses = row.get('courses')
+            labels[os.path.basename(row['filename'])] = {
+                'correct': row.get('status', '').lower() in ('correct', 'verified', 'ok', '1', 'true'),
+                'courses': int(courses) if courses and courses.isdigit() else None
+            }
+    return labels
+
+
+def ladder_label(extractor, pdf_path):
+    result = extractor.process_pdf(pdf_path)
+    return {'correct': str(result.get('status', '')).startswith('✅'), 'courses': None}
+
+
+def is_correct(result, label):
+    """Whether a table rung result agrees with a document's label"""
+    if label['courses'] is not None and len(result.get('all_courses', [])) != label['courses']:
+        return False
+    verified = str(result.get('status', '')).startswith('✅')
+    if label['correct']:
+        return verified
+    # A wrong marksheet must still be parsed to be reported as wrong
+    return not verified and bool(result.get('all_courses'))
+
+
+def table_crop(pdf_paths, settings):
+    """Fractions of the page covering every table the settings found, padded"""
+    x0 = top = 1.0
+    x1 = bottom = 0.0
+    for pdf_path in pdf_paths:
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
+                for table in page.find_tables(settings):
+                    left, upper, right, lower = table.bbox
+                    x0 = min(x0, (left - page.bbox[0]) / page.width)
+                    top = min(top, (upper - page.bbox[1]) / page.height)
+                    x1 = max(x1, (right - page.bbox[0]) / page.width)
+                    bottom = max(bottom, (lower - page.bbox[1]) / page.height)
+    if x1 <= x0 or bottom <= top:
+        return None
+    return [round(max(0.0, x0 - CROP_PADDING), 3), round(max(0.0, top - CROP_PADDING), 3),
+            round(min(1.0, x1 + CROP_PADDING), 3), round(min(1.0, bottom + CROP_PADDING), 3)]
+
+
+def candidates(default, crop):
+    yield dict(default)
+    for (vertical, horizontal), snap, join in itertools.product(STRATEGIES, SNAP_TOLERANCES, JOIN_TOLERANCES):
+        settings = {'vertical_strategy': vertical, 'horizontal_strategy': horizontal,
+                    'snap_tolerance': snap, 'join_tolerance': join}
+        yield settings
+        if crop:
+            yield dict(settings, crop=crop)
+
+
+def evaluate(extractor, settings, documents, repeat):
+    """(accuracy, mean seconds per document) of the table rung with ``settings``"""
+    extractor.table_settings = settings
+    correct = 0
+    times = []
+    for pdf_path, label in documents:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = extractor.process_text(extractor.extract_text_from_pdf(pdf_path))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+        correct += is_correct(result, label)
+    return correct / len(documents), statistics.mean(times)
+
+
+def describe(settings):
+    text = f"{settings.get('vertical_strategy')}/{settings.get('horizontal_strategy')} " \
+           f"snap {settings.get('snap_tolerance', '-')} join {settings.get('join_tolerance', '-')}"
+    return text + (' cropped' if settings.get('crop') else '')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='PDF files or directories')
+    parser.add_argument('--labels', help='CSV of filename,status[,courses]')
+    parser.add_argument('--output', default=table_profiles.PROFILES_PATH, help='profile to write')
+    parser.add_argument('--tolerance', type=float, default=0.0,
+                        help='accuracy a cheaper setting may give up against the best one (0-1)')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per document (the fastest counts)')
+    parser.add_argument('--dry-run', action='store_true', help='report without writing the profile')
+    args = parser.parse_args()
+
+    # Candidates are compared on the class settings, not an earlier profile
+    table_profiles.profiles = {}
+    labels = load_labels(args.labels) if args.labels else None
+    if labels is None:
+        print('No labels given: using the extraction ladder verdict as the reference')
+
+    by_format = {}
+    for pdf_path in collect_pdfs(args.paths):
+        extractor = select_extractor(pdf_path)
+        label = labels.get(os.path.basename(pdf_path)) if labels is not None else ladder_label(extractor, pdf_path)
+        if label is None:
+            print(f'skipping unlabelled {pdf_path}')
+            continue
+        by_format.setdefault(extractor.student_type, (type(extractor), []))[1].append((pdf_path, label))
+
+    if not by_format:
+        print('No labelled PDF files found')
+        return
+
+    profiles = table_profiles.load_profiles(args.output)
+    for student_type, (extractor_class, documents) in sorted(by_format.items()):
+        extractor = extractor_class()
+        default = dict(extractor_class.table_settings)
+        crop = table_crop([pdf_path for pdf_path, _ in documents], default)
+        print(f'\n{student_type}: {len(documents)} documents, table area {crop or "not found"}')
+
+        results = []
+        for settings in candidates(default, crop):
+            accuracy, seconds = evaluate(extractor, settings, documents, args.repeat)
+            results.append((settings, accuracy, seconds))
+            print(f'  {describe(settings):40} accuracy {accuracy:6.1%}  {seconds * 1000:8.1f} ms/doc')
+
+        baseline = results[0]
+        best_accuracy = max(accuracy for _, accuracy, _ in results)
+        eligible = [r for r in results if r[1] >= best_accuracy - args.tolerance and r[1] >= baseline[1]]
+        settings, accuracy, seconds = min(eligible, key=lambda r: r[2])
+        print(f'  chosen: {describe(settings)} - accuracy {accuracy:.1%} (default {baseline[1]:.1%}), '
+              f'{seconds * 1000:.1f} ms/doc (default {baseline[2] * 1000:.1f})')
+        profiles[student_type] = {
+            'table_settings': settings,
+            'accuracy': round(accuracy, 4),
+            'mean_ms': round(seconds * 1000, 2),
+            'documents': len(documents),
+            'baseline': {'accuracy': round(baseline[1], 4), 'mean_ms': round(baseline[2] * 1000, 2)},
+            'tuned_at': datetime.datetime.now().isoformat(timespec='seconds')
+        }
+
+    if args.dry_run:
+        return
+    table_profiles.save_profiles(profiles, args.output)
+    print(f'\nsaved {len(profiles)} profile(s) to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors.course_catalog import CourseCatalog
+from extractors.non_nep_single_extractor import NonNEPSingleExtractor
+
+
+@pytest.fixture
+def extractor():
+    extractor = NonNEPSingleExtractor()
+    extractor.catalog = CourseCatalog.from_rows([
+        {'code': 'CS101', 'credits': '4', 'scheme': 'Non-NEP'},
+        {'code': 'CS101', 'credits': '3', 'scheme': 'NEP'},
+        {'code': 'MA102', 'credits': '3'},
+    ])
+    return extractor
+
+
+def test_from_rows_skips_rows_without_numeric_credits():
+    catalog = CourseCatalog.from_rows([
+        {'Course Code': 'cs-101*', 'Credits': '4'},
+        {'code': 'MA102', 'credits': ''},
+        {'code': 'PH103', 'credits': 'four'},
+    ])
+    assert len(catalog) == 1
+    assert catalog.lookup('CS101').credits == 4.0
+
+
+def test_lookup_prefers_the_marksheet_scheme(extractor):
+    assert extractor.catalog.lookup('CS101', 'Non-NEP').credits == 4.0
+    assert extractor.catalog.lookup('CS101', 'NEP').credits == 3.0
+
+
+def test_known_code_is_a_hit(extractor):
+    code, line, entry = extractor.match_catalog_code('MA102', 'MA102 3 3 B')
+    assert (code, line, entry.code) == ('MA102', 'MA102 3 3 B', 'MA102')
+    assert extractor.catalog_stats['hits'] == 1
+
+
+def test_credit_merged_into_code(extractor):
+    code, line, entry = extractor.match_catalog_code('CS1014', 'CS1014 4 A')
+    assert code == 'CS101'
+    assert line == 'CS101 4 4 A'
+    assert entry.credits == 4.0
+    assert extractor.catalog_stats['recovered'] == 1
+
+
+def test_unknown_code_is_left_alone(extractor):
+    code, line, entry = extractor.match_catalog_code('XY999', 'XY999 4 4 A')
+    assert (code, line, entry) == ('XY999', 'XY999 4 4 A', None)
+    assert extractor.catalog_stats['misses'] == 1
+    assert extractor.catalog_stats['recovered'] == 0
+
+
+def test_credit_data_matching_the_catalog_is_kept(extractor):
+    entry = extractor.catalog.lookup('CS101', 'Non-NEP')
+    assert extractor.catalog_credit_data(entry, 'CS101 4 0 F', (4.0, 0.0), 'F') == (4.0, 0.0)
+    assert extractor.catalog_stats['corrected'] == 0
+
+
+def test_credits_come_from_the_catalog(extractor):
+    entry = extractor.catalog.lookup('CS101', 'Non-NEP')
+    assert extractor.catalog_credit_data(entry, 'CS101 2 2 A', (2.0, 2.0), 'A') == (4.0, 4.0)
+    assert extractor.catalog_stats['corrected'] == 1
+
+
+@pytest.mark.parametrize('line, grade, expected', [
+    ('CS101 44 A', 'A', (4.0, 4.0)),
+    ('CS101 43 B', 'B', (4.0, 3.0)),
+    ('CS101 40 F', 'F', (4.0, 0.0)),
+])
+def test_earned_merged_into_credits(extractor, line, grade, expected):
+    entry = extractor.catalog.lookup('CS101', 'Non-NEP')
+    assert extractor.catalog_credit_data(entry, line, None, grade) == expected
+
+
+def test_missing_earned_follows_the_grade(extractor):
+    entry = extractor.catalog.lookup('CS101', 'Non-NEP')
+    assert extractor.catalog_credit_data(entry, 'CS101 A', None, 'A') == (4.0, 4.0)
+    assert extractor.catalog_credit_data(entry, 'CS101 F', None, 'F') == (4.0, 0.0)
+
+
+def test_row_split_over_two_lines(extractor):
+    course = extractor.recover_split_row('CS101 Programming in C', '4 4 A')
+    assert course == {'course_code': 'CS101', 'credit': 4.0, 'earned': 4.0, 'grade': 'A'}
+    assert extractor.catalog_stats['recovered'] == 1
+
+
+def test_split_row_needs_a_known_code(extractor):
+    assert extractor.recover_split_row('XY999 Unknown Course', '4 4 A') is None
+
+
+def test_split_row_does_not_swallow_the_next_course(extractor):
+    assert extractor.recover_split_row('CS101 Programming in C', 'MA102 3 3 B') is None
+
+
+def test_split_row_needs_a_catalog(extractor):
+    extractor.catalog = None
+    assert extractor.recover_split_row('CS101 Programming in C', '4 4 A') is None
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors.non_nep_single_extractor import NonNEPSingleExtractor
+
+TEXT = """Government College of Engineering, Karad
+Course Code Course Name Credits Earned Grade
+CS101 Programming in C 4 4 A
+MA102 Engineering Mathematics 3 0 F
+HS104 English 2 2 B
+SGPA 8.33
+"""
+
+
+def course(code, credit, earned, grade):
+    return {'course_code': code, 'credit': credit, 'earned': earned, 'grade': grade}
+
+
+@pytest.fixture
+def extractor():
+    return NonNEPSingleExtractor()
+
+
+def verified(courses):
+    return {'all_courses': courses, 'status': '✅ All Values Verified'}
+
+
+def test_listed_course_codes_need_a_grade(extractor):
+    assert extractor.listed_course_codes(TEXT + 'Exam held in MAY2023\n') == {'CS101', 'MA102', 'HS104'}
+
+
+def test_all_rows_parsed_is_consistent(extractor):
+    result = verified([course('CS101', 4, 4, 'A'), course('MA102', 3, 0, 'F'), course('HS104', 2, 2, 'B')])
+    assert extractor.is_result_consistent(result, TEXT)
+
+
+def test_dropped_failed_row_is_not_consistent(extractor):
+    # Totals still verify: the failed course earns no credits
+    result = verified([course('CS101', 4, 4, 'A'), course('HS104', 2, 2, 'B')])
+    assert extractor.missing_course_rows(result, TEXT) == ['MA102']
+    assert not extractor.is_result_consistent(result, TEXT)
+
+
+def test_credit_merged_into_code_counts_as_parsed(extractor):
+    text = TEXT.replace('CS101 Programming in C 4 4 A', 'CS1014 Programming in C 4 A')
+    result = verified([course('CS101', 4, 4, 'A'), course('MA102', 3, 0, 'F'), course('HS104', 2, 2, 'B')])
+    assert extractor.is_result_consistent(result, text)
+
+
+def test_unverified_totals_are_not_consistent(extractor):
+    result = {'all_courses': [course('CS101', 4, 4, 'A')], 'status': 'Verification Failed'}
+    assert not extractor.is_result_consistent(result, 'CS101 Programming in C 4 4 A')
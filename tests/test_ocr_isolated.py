@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extractors.ocr as ocr
+from scheduler import LANE_INTERACTIVE, submit_isolated
+
+CONFIG = {'WORKERS': 1, 'FILE_TIMEOUT': 60, 'FILE_MEMORY_LIMIT': None}
+
+
+class FakeTesseract:
+    @staticmethod
+    def image_to_string(image, lang, config):
+        return f'OCR {image.width}x{image.height}'
+
+
+@pytest.fixture
+def scanned_pdf(tmp_path):
+    """Image-only PDF, as a scanner would produce it"""
+    image = Image.new('RGB', (1200, 300), 'white')
+    ImageDraw.Draw(image).text((40, 100), 'GCEK MARKSHEET', fill='black', font=ImageFont.load_default(size=80))
+    path = tmp_path / 'scan.pdf'
+    image.save(path, resolution=100)
+    return str(path)
+
+
+@pytest.fixture
+def ocr_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr, 'OCR_CACHE_DIR', str(tmp_path / 'ocr_cache'))
+
+
+def test_ocr_runs_inside_isolated_worker(scanned_pdf, ocr_cache, monkeypatch):
+    # Isolated workers are forked, so they inherit the patched module
+    monkeypatch.setattr(ocr, 'pytesseract', FakeTesseract)
+    monkeypatch.setattr(ocr, 'ocr_available', lambda: True)
+
+    outcome = submit_isolated(CONFIG, LANE_INTERACTIVE, ocr.extract_text_ocr, scanned_pdf).result()
+
+    assert outcome.ok, outcome.message
+    assert outcome.value.startswith('OCR ')
+
+
+@pytest.mark.skipif(not ocr.ocr_available(), reason='tesseract is not installed')
+def test_tesseract_inside_isolated_worker(scanned_pdf, ocr_cache):
+    outcome = submit_isolated(CONFIG, LANE_INTERACTIVE, ocr.extract_text_ocr, scanned_pdf).result()
+
+    assert outcome.ok, outcome.message
+    assert 'MARKSHEET' in outcome.value.upper()
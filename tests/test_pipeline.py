@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import Pipeline, Stage
+
+
+def stage_threads():
+    return [t for t in threading.enumerate() if t.name.startswith('pipeline-')]
+
+
+def wait_for_threads(timeout=5):
+    deadline = time.monotonic() + timeout
+    while stage_threads() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return stage_threads()
+
+
+def test_items_pass_every_stage():
+    pipeline = Pipeline([Stage('double', lambda x: x * 2, 3), Stage('inc', lambda x: x + 1)], queue_size=2)
+    assert sorted(pipeline.run(range(20))) == [x * 2 + 1 for x in range(20)]
+    assert [s['processed'] for s in pipeline.snapshot()['stages']] == [20, 20]
+
+
+def test_on_error_replaces_the_item():
+    def check(x):
+        if x == 3:
+            raise ValueError('bad')
+        return x
+
+    pipeline = Pipeline([Stage('check', check)], on_error=lambda item, exc: f'{item}: {exc}')
+    assert sorted(map(str, pipeline.run(range(5)))) == ['0', '1', '2', '3: bad', '4']
+
+
+def test_consumer_error_cancels_and_discards():
+    fed, passed, discarded = [], [], []
+    lock = threading.Lock()
+
+    def slow(x):
+        time.sleep(0.01)
+        with lock:
+            passed.append(x)
+        return x
+
+    def discard(x):
+        with lock:
+            discarded.append(x)
+
+    def items():
+        for x in range(100):
+            fed.append(x)
+            yield x
+
+    pipeline = Pipeline([Stage('a', slow, 2), Stage('b', slow)], queue_size=2, on_discard=discard)
+    received = []
+    with pytest.raises(RuntimeError):
+        for item in pipeline.run(items()):
+            received.append(item)
+            raise RuntimeError('consumer failed')
+
+    assert not wait_for_threads()
+    assert len(fed) < 100
+    # Every item fed in was either handed to the consumer or discarded
+    assert sorted(received + discarded) == sorted(fed)
+
+
+def test_closing_the_generator_cancels():
+    discarded = []
+    pipeline = Pipeline([Stage('a', lambda x: x)], queue_size=1, on_discard=discarded.append)
+    run = pipeline.run(range(50))
+    first = next(run)
+    run.close()
+
+    assert not wait_for_threads()
+    assert pipeline.cancelled.is_set()
+    assert first not in discarded
@@ -0,0 +1,190 @@
+"""First-page thumbnails of uploaded marksheets, rendered in the background.
+
+Uploads are queued for rendering once they are on disk. A small process pool
+(pdfium is not thread safe) renders the first page to a JPEG. The image is
+stored under the SHA-256 of the PDF, so the same marksheet uploaded again,
+under any name, reuses it. The cache is trimmed to a size budget,
+least recently served first. Because the URL names the content hash, the
+browser may keep a thumbnail for as long as it likes.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pdfplumber
+
+THUMBNAIL_QUALITY = 70
+# Served thumbnails are marked recently used at most this often (seconds)
+TOUCH_INTERVAL = 3600
+
+
+def _context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render_thumbnail(pdf_path, directory, width):
+    """Render a PDF's first page into the cache; runs inside the thumbnail pool
+
+    Returns (digest, bytes written); nothing is written when the
+    thumbnail already exists.
+    """
+    digest = _file_digest(pdf_path)
+    path = ThumbnailCache.path_in(directory, digest)
+    if os.path.exists(path):
+        return digest, 0
+    with pdfplumber.open(pdf_path) as pdf:
+        image = pdf.pages[0].to_image(width=width).original.convert('RGB')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    image.save(tmp_path, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+    os.replace(tmp_path, path)
+    return digest, os.path.getsize(path)
+
+
+class ThumbnailCache:
+    """JPEGs on disk keyed by PDF digest, kept under ``max_bytes``"""
+
+    SUFFIX = '.jpg'
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Bytes on disk, counted once and then kept up to date as files are added
+        self.size = None
+
+    @classmethod
+    def path_in(cls, directory, digest):
+        return os.path.join(directory, digest[:2], f'{digest}{cls.SUFFIX}')
+
+    def path(self, digest):
+        return self.path_in(self.directory, digest)
+
+    def get(self, digest):
+        """Path of a cached thumbnail, marking it recently used, or None"""
+        path = self.path(digest)
+        try:
+            if time.time() - os.stat(path).st_mtime > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def _entries(self):
+        try:
+            buckets = list(os.scandir(self.directory))
+        except OSError:
+            return []
+        entries = []
+        for bucket in buckets:
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(self.SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def added(self, size):
+        """Account for a newly written thumbnail, evicting the oldest over budget"""
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, size, _ in self._entries())
+            else:
+                self.size += size
+            if self.size <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            self.size = sum(size for _, size, _ in entries)
+            # Trim to 90% so the next few thumbnails do not trigger another scan
+            target = self.max_bytes * 0.9
+            for _, size, path in entries:
+                if self.size <= target:
+                    break
+                try:
+                    os.remove(path)
+                    self.size -= size
+                except OSError:
+                    pass
+
+
+class ThumbnailService:
+    """Bounded background renderer in front of a ThumbnailCache"""
+
+    def __init__(self, cache, width=240, workers=1, max_pending=64):
+        self.cache = cache
+        self.width = width
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.pending = {}
+        self._pool = None
+        self._pool_pid = None
+
+    def _get_pool(self):
+        # A forked server process must not reuse its parent's executor
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_context())
+            self._pool_pid = os.getpid()
+            self.pending = {}
+        return self._pool
+
+    def submit(self, pdf_path):
+        """Queue a saved PDF for rendering; returns its future, or None when
+        the queue is full (the thumbnail is then rendered on first request)"""
+        with self.lock:
+            pool = self._get_pool()
+            future = self.pending.get(pdf_path)
+            if future is not None:
+                return future
+            if len(self.pending) >= self.max_pending:
+                return None
+            future = pool.submit(render_thumbnail, pdf_path, self.cache.directory, self.width)
+            self.pending[pdf_path] = future
+        future.add_done_callback(lambda f: self._done(pdf_path, f))
+        return future
+
+    def _done(self, pdf_path, future):
+        with self.lock:
+            self.pending.pop(pdf_path, None)
+        try:
+            _, size = future.result()
+        except Exception as e:
+            print(f"Error rendering thumbnail of {pdf_path}: {e}")
+            return
+        if size:
+            self.cache.added(size)
+
+    def wait(self, digest, pdf_path, timeout):
+        """Cached thumbnail of ``digest``, rendering it from ``pdf_path`` if need
+        be; None if it is not ready within ``timeout`` seconds or the file's
+        content does not match the digest
+
+        A file that is not on disk yet (a bulk upload still being written)
+        returns None at once; the page shows a placeholder instead.
+        """
+        path = self.cache.get(digest)
+        if path:
+            return path
+        if not os.path.exists(pdf_path):
+            return None
+        future = self.submit(pdf_path)
+        if future is None:
+            return None
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            return None
+        return self.cache.get(digest)
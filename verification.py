@@ -0,0 +1,234 @@
+import PyPDF2
+from extractor_factory import ExtractorFactory
+from extractors.non_nep_double_extractor import NonNEPDoubleExtractor
+from extractors.pdf_buffer import pdf_input
+from isolation import RESOURCE_LIMIT, TIMEOUT
+
+
+class MarksheetVerifier:
+    def __init__(self):
+        self.grade_points = {
+            'A+': 10, 'A': 9, 'B+': 8, 'B': 7, 'C+': 6,
+            'C': 5, 'D': 4, 'F': 0, 'FF': 0, 'P': 5, 'PP': 5, 'PASS': 5, 'COMP': 5
+        }
+
+    def calculate_egp(self, courses):
+        egp = 0
+        for course in courses:
+            grade = course['grade'].upper()
+            earned = course['earned']
+            point = self.grade_points.get(grade, 0)
+            egp += point * earned
+        return egp
+
+    def calculate_total_credits(self, courses):
+        return sum(course['earned'] for course in courses)
+
+    def calculate_sgpa(self, courses):
+        total_credits = self.calculate_total_credits(courses)
+        if total_credits == 0:
+            return 0
+        egp = self.calculate_egp(courses)
+        return round(egp / total_credits, 2)
+
+
+def is_values_match(calculated, reported, value_type='general'):
+    """Check if calculated and reported values match within tolerance"""
+    if calculated == 0 and reported == 0:
+        return False  # Both zero means no data
+
+    # Handle floating point precision issues
+    difference = abs(calculated - reported)
+
+    # Set tolerance based on value type
+    if value_type == 'sgpa':
+        tolerance = 0.01  # Tighter tolerance for SGPA
+    else:
+        tolerance = 0.1   # Regular tolerance for credits and EGP
+
+    return difference < tolerance
+
+
+def read_first_page_text(file_path):
+    """Cheap PyPDF2 text of the first page, used for format detection"""
+    pdf_reader = PyPDF2.PdfReader(pdf_input(file_path))
+    return pdf_reader.pages[0].extract_text()
+
+
+def is_double_semester(first_page_text):
+    return 'Previous Semester Performance' in first_page_text and 'Current Semester Performance' in first_page_text
+
+
+def select_extractor_from_text(first_page_text, text):
+    """Pick the extractor from the first page text and the document text"""
+    if is_double_semester(first_page_text):
+        return NonNEPDoubleExtractor()
+    return ExtractorFactory.get_extractor(text)
+
+
+def select_extractor(file_path, first_page_text=None):
+    """Pick the extractor for a marksheet the same way the upload pages do"""
+    if first_page_text is None:
+        first_page_text = read_first_page_text(file_path)
+
+    if is_double_semester(first_page_text):
+        return NonNEPDoubleExtractor()
+
+    # The format markers are plain text, so the cheap text layer is enough here
+    extractor = ExtractorFactory.get_extractor("")
+    text = extractor.extract_text_layer(file_path)
+    if not text.strip():
+        # Scanned marksheet: detect from OCR text, which is cached for the ladder
+        text = extractor.extract_text_ocr(file_path)
+    return select_extractor_from_text(first_page_text, text)
+
+
+def verify_pdf(file_path, first_page_text=None):
+    """Run the matching extractor and return (extractor, process_pdf result)
+
+    Old list-style extractor output is normalised into the dict format with
+    a self-consistent verification block.
+    """
+    extractor = select_extractor(file_path, first_page_text)
+    result = extractor.process_pdf(file_path)
+
+    if isinstance(result, dict):
+        return extractor, result
+
+    courses = result if isinstance(result, list) else []
+    if not courses:
+        return extractor, {'all_courses': [], 'student_type': extractor.student_type}
+
+    verifier = MarksheetVerifier()
+    calc_egp = verifier.calculate_egp(courses)
+    calc_cred = verifier.calculate_total_credits(courses)
+    calc_sgpa = verifier.calculate_sgpa(courses)
+
+    return extractor, {
+        'all_courses': courses,
+        'verification': {
+            'egp': {'calculated': calc_egp, 'reported': calc_egp, 'match': True, 'difference': 0},
+            'credits': {'calculated': calc_cred, 'reported': calc_cred, 'match': True, 'difference': 0},
+            'sgpa': {'calculated': calc_sgpa, 'reported': calc_sgpa, 'match': True, 'difference': 0}
+        },
+        'status': "✅ All Values Match",
+        'student_type': extractor.student_type
+    }
+
+
+def empty_bulk_result(status, student_type='Unknown', error=None):
+    """Bulk result data for a file whose values could not be extracted"""
+    result_data = {
+        'reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
+        'calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
+        'previous_reported': {'egp': 0, 'credits': 0, 'sgpa': 0},
+        'previous_calculated': {'egp': 0, 'credits': 0, 'sgpa': 0},
+        'status': status,
+        'student_type': student_type
+    }
+    if error is not None:
+        result_data['error'] = error
+    return result_data
+
+
+def verify_bulk_file(file_path, first_page_text=None):
+    """Verify one marksheet and return the values shown in the bulk report"""
+    try:
+        if first_page_text is None:
+            first_page_text = read_first_page_text(file_path)
+    except Exception as e:
+        return empty_bulk_result("❌ PDF Read Error", error=str(e))
+
+    if is_double_semester(first_page_text):
+        # Non-NEP Double Semester
+        try:
+            return NonNEPDoubleExtractor().get_bulk_data(file_path)
+        except Exception as e:
+            return empty_bulk_result("❌ Processing Error", 'Non-NEP Student (Double Semester)', str(e))
+
+    # For other types, use the factory
+    try:
+        extractor, full_result = verify_pdf(file_path, first_page_text)
+    except Exception as e:
+        return empty_bulk_result("❌ Processing Error", error=str(e))
+
+    verification = full_result.get('verification')
+    if not verification:
+        # Nothing extracted - reported with zero values
+        result_data = empty_bulk_result("✅ Correct", full_result.get('student_type', extractor.student_type))
+        result_data['parse_trace'] = full_result.get('parse_trace')
+        result_data['student_info'] = full_result.get('student_info', {})
+        result_data['cumulative'] = full_result.get('cumulative')
+        return result_data
+
+    result_data = empty_bulk_result(
+        "✅ Correct" if full_result.get('status', '').startswith('✅') else "❌ Wrong",
+        full_result.get('student_type', extractor.student_type)
+    )
+    for key in ('egp', 'credits', 'sgpa'):
+        result_data['reported'][key] = verification.get(key, {}).get('reported', 0)
+        result_data['calculated'][key] = verification.get(key, {}).get('calculated', 0)
+    result_data['extraction'] = full_result.get('extraction')
+    result_data['courses'] = extractor.course_grades(full_result)
+    result_data['parse_trace'] = full_result.get('parse_trace')
+    result_data['student_info'] = full_result.get('student_info', {})
+    result_data['cumulative'] = full_result.get('cumulative')
+    return result_data
+
+
+def build_bulk_entry(filename, result_data, pdf_url):
+    """Turn extracted bulk values into the row shown in bulk_results.html"""
+    # Previous semester match
+    prev_credits_match = is_values_match(result_data['previous_calculated']['credits'], result_data['previous_reported']['credits'], 'credits')
+    prev_egp_match = is_values_match(result_data['previous_calculated']['egp'], result_data['previous_reported']['egp'], 'egp')
+    prev_sgpa_match = is_values_match(result_data['previous_calculated']['sgpa'], result_data['previous_reported']['sgpa'], 'sgpa')
+
+    prev_match = prev_credits_match and prev_egp_match and prev_sgpa_match
+
+    # Current semester match
+    curr_credits_match = is_values_match(result_data['calculated']['credits'], result_data['reported']['credits'], 'credits')
+    curr_egp_match = is_values_match(result_data['calculated']['egp'], result_data['reported']['egp'], 'egp')
+    curr_sgpa_match = is_values_match(result_data['calculated']['sgpa'], result_data['reported']['sgpa'], 'sgpa')
+
+    curr_match = curr_credits_match and curr_egp_match and curr_sgpa_match
+
+    # Determine overall status
+    if result_data.get('status') in ['✅ Correct', '❌ Wrong'] or result_data.get('error'):
+        # Use the status from the extractor (or the failure reason) if available
+        status = result_data['status']
+    else:
+        # Determine status based on matches
+        status = "✅ Correct" if (prev_match and curr_match) else "❌ Wrong"
+
+    return {
+        'filename': filename,
+        'student_type': result_data.get('student_type', 'Unknown'),
+        'student_info': result_data.get('student_info', {}),
+        'cumulative': result_data.get('cumulative'),
+        'calculated': result_data.get('calculated', {'egp': 0, 'credits': 0, 'sgpa': 0}),
+        'reported': result_data.get('reported', {'egp': 0, 'credits': 0, 'sgpa': 0}),
+        'previous_calculated': result_data.get('previous_calculated', {'egp': 0, 'credits': 0, 'sgpa': 0}),
+        'previous_reported': result_data.get('previous_reported', {'egp': 0, 'credits': 0, 'sgpa': 0}),
+        'previous_match': prev_match,
+        'current_match': curr_match,
+        'status': status,
+        'error': result_data.get('error'),
+        'pdf_url': pdf_url  # Always include PDF URL
+    }
+
+
+def isolation_failure_result(outcome):
+    """Bulk result data for a file whose isolated worker did not finish"""
+    if outcome.failure == TIMEOUT:
+        status = "❌ Timeout"
+    elif outcome.failure == RESOURCE_LIMIT:
+        status = "❌ Resource limit"
+    else:
+        status = "❌ Processing Error"
+    return empty_bulk_result(status, error=outcome.message)
+
+
+# Functions queued jobs may name, so a job can be run on any node
+TASKS = {
+    'verify_bulk_file': verify_bulk_file
+}
@@ -0,0 +1,359 @@
+"""Watch a folder and verify marksheet PDFs as they arrive.
+
+    python watch_folder.py /srv/exam-cell/incoming --workers 4 --report results.jsonl
+
+New and changed PDFs are found with inotify (through ctypes, no extra
+package) or, where inotify is unavailable or does not see remote writes
+(NFS/SMB mounts), by polling with ``--poll``. A file is verified only once
+its size and modification time have stopped changing for ``--settle``
+seconds. The manifest (SQLite) records the hash and result of every file
+processed, so restarts, touched files and copies of already verified PDFs
+are not verified again.
+"""
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import sqlite3
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT NOT NULL,
+    processed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+"""
+
+
+def is_candidate(path):
+    name = os.path.basename(path)
+    # Editors and copy tools write to hidden or ~ temp names first
+    return name.lower().endswith('.pdf') and not name.startswith(('.', '~'))
+
+
+def walk_pdfs(root):
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            if is_candidate(path):
+                yield path
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Hash and result of every processed file"""
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(MANIFEST_SCHEMA)
+
+    def is_current(self, path, size, mtime):
+        with self.lock:
+            row = self.conn.execute('SELECT size, mtime FROM files WHERE path = ?', (path,)).fetchone()
+        return row is not None and row[0] == size and row[1] == mtime
+
+    def hash_of(self, path):
+        with self.lock:
+            row = self.conn.execute('SELECT sha256 FROM files WHERE path = ?', (path,)).fetchone()
+        return row[0] if row else None
+
+    def result_for_hash(self, sha256):
+        with self.lock:
+            row = self.conn.execute('SELECT result FROM files WHERE sha256 = ? LIMIT 1', (sha256,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record(self, path, size, mtime, sha256, result):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO files (path, size, mtime, sha256, status, result, processed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (path, size, mtime, sha256, result.get('status', ''), json.dumps(result), time.time())
+            )
+            self.conn.commit()
+
+    def touch(self, path, size, mtime):
+        with self.lock:
+            self.conn.execute('UPDATE files SET size = ?, mtime = ? WHERE path = ?', (size, mtime, path))
+            self.conn.commit()
+
+    def counts(self):
+        with self.lock:
+            return dict(self.conn.execute('SELECT status, COUNT(*) FROM files GROUP BY status').fetchall())
+
+
+class InotifyWatcher:
+    """Recursive inotify watch; reports paths that were created, written or moved in"""
+
+    def __init__(self, root):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = {}
+        self.overflowed = False
+        for directory, _, _ in os.walk(root):
+            self.watch(directory)
+
+    def watch(self, directory):
+        wd = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            print(f"Error watching {directory}: {os.strerror(ctypes.get_errno())}")
+            return
+        self.directories[wd] = directory
+
+    def changes(self, timeout):
+        """Paths with events within timeout seconds"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        paths = []
+        try:
+            data = os.read(self.fd, 256 * 1024)
+        except BlockingIOError:
+            return []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost; the daemon rescans once
+                self.overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self.directories.pop(wd, None)
+                continue
+            directory = self.directories.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land in a new directory before it is watched
+                    for sub_directory, _, _ in os.walk(path):
+                        self.watch(sub_directory)
+                    paths.extend(walk_pdfs(path))
+            elif is_candidate(path):
+                paths.append(path)
+        return paths
+
+
+class PollingWatcher:
+    """Stat-based fallback: reports files whose size or mtime changed since the last scan"""
+
+    def __init__(self, root, interval):
+        self.root = root
+        self.interval = interval
+        self.seen = {}
+        self.overflowed = False
+        self.next_scan = 0
+
+    def changes(self, timeout):
+        wait = self.next_scan - time.monotonic()
+        if wait > 0:
+            time.sleep(min(wait, timeout))
+            return []
+        self.next_scan = time.monotonic() + self.interval
+        seen = {}
+        paths = []
+        for path in walk_pdfs(self.root):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            seen[path] = (stat.st_size, stat.st_mtime)
+            if self.seen.get(path) != seen[path]:
+                paths.append(path)
+        self.seen = seen
+        return paths
+
+
+def verify_file(path, timeout, memory_limit):
+    """Bulk result data for one PDF, verified in an isolated process"""
+    from isolation import run_isolated
+    from verification import isolation_failure_result, verify_bulk_file
+
+    outcome = run_isolated(verify_bulk_file, (path,), timeout, memory_limit)
+    result = outcome.value if outcome.ok else isolation_failure_result(outcome)
+    result.pop('parse_trace', None)
+    return result
+
+
+class FolderDaemon:
+    """Debounces arrivals and verifies settled files on a bounded worker pool"""
+
+    def __init__(self, root, watcher, manifest, workers=1, settle=2.0, timeout=60, memory_limit=None,
+                 report=None):
+        self.root = root
+        self.watcher = watcher
+        self.manifest = manifest
+        self.workers = max(1, workers)
+        self.settle = settle
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.report = open(report, 'a', encoding='utf-8') if report else None
+        self.report_lock = threading.Lock()
+        # path -> (deadline, size, mtime) of files waiting to settle
+        self.pending = {}
+        self.inflight = set()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='watch-verify')
+
+    def note(self, path):
+        """An event for path: (re)start its settle timer"""
+        self.pending[path] = (time.monotonic() + self.settle, None, None)
+
+    def rescan(self):
+        """Queue every file that differs from the manifest (startup, lost events)"""
+        for path in walk_pdfs(self.root):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not self.manifest.is_current(path, stat.st_size, stat.st_mtime):
+                self.note(path)
+
+    def settled(self):
+        """Pending files whose size and mtime held still for the settle time"""
+        now = time.monotonic()
+        ready = []
+        for path, (deadline, size, mtime) in list(self.pending.items()):
+            if deadline > now:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self.pending[path]  # Deleted or moved away before it settled
+                continue
+            if (stat.st_size, stat.st_mtime) != (size, mtime) or stat.st_size == 0:
+                # Still being written; check again after another settle period
+                self.pending[path] = (now + self.settle, stat.st_size, stat.st_mtime)
+                continue
+            del self.pending[path]
+            ready.append((path, stat.st_size, stat.st_mtime))
+        return ready
+
+    def process(self, path, size, mtime):
+        try:
+            if self.manifest.is_current(path, size, mtime):
+                return
+            sha256 = file_sha256(path)
+            if self.manifest.hash_of(path) == sha256:
+                self.manifest.touch(path, size, mtime)
+                return
+            # A copy of a file that was already verified
+            result = self.manifest.result_for_hash(sha256)
+            if result is None:
+                result = verify_file(path, self.timeout, self.memory_limit)
+            self.manifest.record(path, size, mtime, sha256, result)
+            print(f"{result.get('status', '')}  {os.path.relpath(path, self.root)}", flush=True)
+            if self.report:
+                line = json.dumps({'path': path, 'sha256': sha256, **result}, ensure_ascii=False)
+                with self.report_lock:
+                    self.report.write(line + '\n')
+                    self.report.flush()
+        except Exception as e:
+            print(f"Error processing {path}: {e}", flush=True)
+        finally:
+            with self.lock:
+                self.inflight.discard(path)
+
+    def dispatch(self, ready):
+        """Hand settled files to the pool, never more than twice the workers at once"""
+        for index, (path, size, mtime) in enumerate(ready):
+            with self.lock:
+                if path in self.inflight:
+                    # Changed again while being verified: look at it once more later
+                    self.note(path)
+                    continue
+                if len(self.inflight) >= 2 * self.workers:
+                    # Already settled; they are retried on the next pass
+                    for later_path, later_size, later_mtime in ready[index:]:
+                        self.pending.setdefault(later_path, (0, later_size, later_mtime))
+                    return
+                self.inflight.add(path)
+            self.pool.submit(self.process, path, size, mtime)
+
+    def run(self, stop=None):
+        stop = stop or threading.Event()
+        self.rescan()
+        while not stop.is_set():
+            for path in self.watcher.changes(timeout=min(0.5, self.settle)):
+                self.note(path)
+            if self.watcher.overflowed:
+                self.watcher.overflowed = False
+                print('Event queue overflowed; rescanning', flush=True)
+                self.rescan()
+            self.dispatch(self.settled())
+        self.pool.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('folder')
+    parser.add_argument('--manifest', help='Manifest database (default: <folder>/.verified.db)')
+    parser.add_argument('--report', help='Append one JSON line per verified file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help='Seconds a file must stay unchanged before it is verified')
+    parser.add_argument('--poll', type=float, nargs='?', const=5.0,
+                        help='Poll every N seconds instead of using inotify (network mounts)')
+    parser.add_argument('--timeout', type=float, default=float(os.environ.get('FILE_TIMEOUT', 60)))
+    parser.add_argument('--memory-mb', type=int, default=int(os.environ.get('FILE_MEMORY_MB', 1536)))
+    args = parser.parse_args()
+
+    root = os.path.abspath(args.folder)
+    manifest = Manifest(args.manifest or os.path.join(root, '.verified.db'))
+    watcher = None
+    if args.poll is None:
+        try:
+            watcher = InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}); polling instead")
+    if watcher is None:
+        watcher = PollingWatcher(root, args.poll or 5.0)
+
+    daemon = FolderDaemon(root, watcher, manifest, args.workers, args.settle, args.timeout,
+                          args.memory_mb * 1024 * 1024, args.report)
+    print(f"Watching {root} with {type(watcher).__name__}, {args.workers} worker(s)", flush=True)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(manifest.counts(), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()